@@ -24,6 +24,7 @@ CREATE TABLE `dictionary`  (
   `unit` varchar(32) NULL COMMENT '词条单位',
   `is_score` tinyint(1) default 0 COMMENT '是否为评分词条 0-不是 1-是',
   `score_func` text NULL COMMENT '评分计算方式',
+  `pending_delete` tinyint(1) NOT NULL DEFAULT 0 COMMENT '是否已提交删除，等待后台任务清理关联数据',
   PRIMARY KEY (`id`),
   UNIQUE INDEX `uk_word_code` (`word_code`), -- 确保 word_code 的唯一性
   INDEX `name_index`(`word_name`)
@@ -36,6 +37,7 @@ CREATE TABLE `data_template`  (
   `template_name` varchar(255) NOT NULL COMMENT '模板名称',
   `template_description` text NULL COMMENT '模板描述',
   `category_id` int NOT NULL COMMENT '模板分类id',
+  `pending_delete` tinyint(1) NOT NULL DEFAULT 0 COMMENT '是否已提交删除，等待后台任务清理关联数据',
   PRIMARY KEY (`id`),
    UNIQUE INDEX `uk_template_code` (`template_code`)-- 确保唯一性
 )COMMENT='数据模板表';
@@ -44,6 +46,7 @@ CREATE TABLE `data_template`  (
 CREATE TABLE `data_template_category`  (
   `id` int NOT NULL AUTO_INCREMENT COMMENT '模板分类id',
   `name` varchar(255) NOT NULL COMMENT '模板分类名称',
+  `pending_delete` tinyint(1) NOT NULL DEFAULT 0 COMMENT '是否已提交删除，等待后台任务清理关联数据',
   PRIMARY KEY (`id`)
 )COMMENT='数据模板分类表';
 
@@ -65,7 +68,11 @@ CREATE TABLE `data_table`  (
   `value` varchar(1024) NOT NULL COMMENT '值',
   `check_time` datetime not null comment '检查时间',
   PRIMARY KEY (`id`),
-   UNIQUE INDEX `uk_data` (`case_id`, `data_template_id`,`dictionary_id`,`check_time`) -- 确保唯一性 一个病例同一模板可以录入多次(不同时间检测多次)
+   UNIQUE INDEX `uk_data` (`case_id`, `data_template_id`,`dictionary_id`,`check_time`), -- 确保唯一性 一个病例同一模板可以录入多次(不同时间检测多次)
+  INDEX `idx_data_template_id` (`data_template_id`), -- 按模板分块级联删除
+  INDEX `idx_dictionary_id` (`dictionary_id`), -- 按词条分块级联删除
+  INDEX `idx_data_case_template_time` (`case_id`, `data_template_id`, `check_time`), -- 宽表导出：按病例、模板顺序读取各次检查
+  INDEX `idx_data_case_time` (`case_id`, `check_time`) -- 病例数据流式导出：按病例、检查时间（隐含主键）顺序遍历
 )COMMENT='数据表';
 
 
@@ -84,9 +91,22 @@ CREATE TABLE `case`  (
   `main_diagnosis` varchar(1024) NULL COMMENT '主要诊断',
   `has_transplant_surgery` varchar(255) NULL DEFAULT '未填写' COMMENT  '是否行移植手术,示例 是(2025-5-27)',
   `is_in_transplant_queue` varchar(16) NULL DEFAULT '未填写' COMMENT '是否存在移植排队',
+  `transplanted` tinyint(1) NULL DEFAULT NULL COMMENT '是否行移植手术 0-否 1-是，由 has_transplant_surgery 解析',
+  `transplant_date` date NULL DEFAULT NULL COMMENT '移植手术日期，由 has_transplant_surgery 解析',
+  `in_transplant_queue` tinyint(1) NULL DEFAULT NULL COMMENT '是否在移植排队 0-否 1-是，由 is_in_transplant_queue 解析',
+  `pending_delete` tinyint(1) NOT NULL DEFAULT 0 COMMENT '是否已提交删除，等待后台任务清理关联数据',
+  `data_revision` bigint unsigned NOT NULL DEFAULT 0 COMMENT '检查数据修订号，写入该病例的检查数据时加一',
   PRIMARY KEY (`id`),
     UNIQUE INDEX `uk_case_code` (`case_code`), -- 确保唯一性
-  INDEX `idx_identity_id` (`identity_id`)-- 身份证号索引
+  INDEX `idx_identity_id` (`identity_id`),-- 身份证号索引
+  INDEX `idx_case_gender_birth` (`gender`, `birth_date`), -- 分面筛选：性别+年龄
+  INDEX `idx_case_blood_birth` (`blood_type`, `birth_date`), -- 分面筛选：血型+年龄
+  INDEX `idx_case_birth_date` (`birth_date`), -- 分面筛选：年龄
+  INDEX `idx_case_transplant` (`transplanted`, `transplant_date`), -- 移植队列：是否移植+手术日期
+  INDEX `idx_case_transplant_queue` (`in_transplant_queue`), -- 移植排队
+  INDEX `idx_case_opd_id` (`opd_id`), -- 检索：门诊号前缀
+  INDEX `idx_case_inhospital_id` (`inhospital_id`), -- 检索：住院号前缀
+  INDEX `idx_case_name` (`name`) -- 检索：姓名前缀
 )COMMENT='病例表';
 
 CREATE TABLE `archive`  (
@@ -94,6 +114,7 @@ CREATE TABLE `archive`  (
   `archive_code` varchar(255) NOT NULL COMMENT '档案编号',
   `archive_name` varchar(255) NOT NULL COMMENT '档案名称',
   `archive_description` text NULL COMMENT '档案描述',
+  `pending_delete` tinyint(1) NOT NULL DEFAULT 0 COMMENT '是否已提交删除，等待后台任务清理关联数据',
   PRIMARY KEY (`id`),
     UNIQUE INDEX `uk_data` (`archive_code`) -- 确保唯一性
 )COMMENT='档案表';
@@ -103,7 +124,8 @@ CREATE TABLE `archive_case`  (
   `archive_id` int NOT NULL COMMENT '档案id',
   `case_id` int NOT NULL COMMENT '病例id',
   PRIMARY KEY (`id`),
-  UNIQUE KEY `uk_archive_case` (`archive_id`, `case_id`) -- 唯一约束，确保一个档案中一个病例只出现一次
+  UNIQUE KEY `uk_archive_case` (`archive_id`, `case_id`), -- 唯一约束，确保一个档案中一个病例只出现一次
+  INDEX `idx_case_archive` (`case_id`, `archive_id`) -- 按病例统计所属档案
 )COMMENT='档案与病例关联表';
 
 CREATE TABLE `identity`  (
@@ -112,7 +134,8 @@ CREATE TABLE `identity`  (
   `gender` tinyint(1) NOT NULL COMMENT '性别 0-女 1-男',
   `birth_date` date NOT NULL COMMENT '出生年月日',
   PRIMARY KEY (`identity_id`),
-  UNIQUE INDEX `identity_index`(`identity_id`)
+  UNIQUE INDEX `identity_index`(`identity_id`),
+  INDEX `idx_identity_name` (`name`) -- 检索：姓名前缀
 )COMMENT='患者表';
 
 CREATE TABLE `images`  (
@@ -122,4 +145,45 @@ CREATE TABLE `images`  (
   `url` varchar(255) NOT  NULL comment '图片url',
   `remark` varchar(255) NULL comment '图片备注',
   PRIMARY KEY (`id`)
-)COMMENT='图片表';
\ No newline at end of file
+)COMMENT='图片表';
+CREATE TABLE `case_search_token`  (
+  `id` int NOT NULL AUTO_INCREMENT COMMENT '自增主键',
+  `case_id` int NOT NULL COMMENT '病例id',
+  `token` varchar(8) NOT NULL COMMENT '词元',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_case_token` (`token`, `case_id`), -- 按词元查病例的覆盖索引
+  INDEX `idx_case_id` (`case_id`)
+)COMMENT='病例检索词元表';
+
+CREATE TABLE `identity_search_token`  (
+  `id` int NOT NULL AUTO_INCREMENT COMMENT '自增主键',
+  `identity_id` varchar(255) NOT NULL COMMENT '身份证号',
+  `token` varchar(8) NOT NULL COMMENT '词元',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_identity_token` (`token`, `identity_id`), -- 按词元查患者的覆盖索引
+  INDEX `idx_identity_id` (`identity_id`)
+)COMMENT='患者检索词元表';
+
+CREATE TABLE `background_job`  (
+  `id` int NOT NULL AUTO_INCREMENT COMMENT '任务id',
+  `job_type` varchar(64) NOT NULL COMMENT '任务类型',
+  `params` json NOT NULL COMMENT '任务参数',
+  `status` varchar(16) NOT NULL DEFAULT 'pending' COMMENT '任务状态 pending/running/succeeded/failed/cancelled',
+  `progress` bigint NOT NULL DEFAULT 0 COMMENT '已处理数量',
+  `total` bigint NULL COMMENT '预计总数量',
+  `message` text NULL COMMENT '错误信息',
+  `result` json NULL COMMENT '任务结果',
+  `created_at` datetime(6) NOT NULL COMMENT '创建时间',
+  `started_at` datetime(6) NULL COMMENT '开始时间',
+  `finished_at` datetime(6) NULL COMMENT '结束时间',
+  `worker` varchar(128) NULL COMMENT '执行任务的 worker（主机名:进程号）',
+  `heartbeat_at` datetime(6) NULL COMMENT 'worker 最近一次心跳时间',
+  PRIMARY KEY (`id`),
+  INDEX `idx_job_status` (`status`, `id`) -- worker 按 id 顺序领取待执行任务
+)COMMENT='后台任务表';
+
+CREATE TABLE `code_sequence`  (
+  `name` varchar(32) NOT NULL COMMENT '计数器名称',
+  `value` bigint NOT NULL DEFAULT 0 COMMENT '已分配的最大序号',
+  PRIMARY KEY (`name`)
+)COMMENT='编号计数器表';
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class MediCoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.AutoField'
+    name = 'mediCore'
+
+    def ready(self):
+        # 注册信号处理器
+        from . import signals  # noqa: F401
+        # 注册导出任务处理函数（run_jobs 进程不加载视图）
+        from . import exports  # noqa: F401
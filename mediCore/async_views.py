@@ -0,0 +1,285 @@
+"""
+病例查询接口的异步版本（/api/async/...）
+
+请求参数和响应格式与同步版本（views 中的 CaseTemplateSummaryView 等）一致。相互独立的查询
+（如可视化数据的每个词条、模板汇总的每个病例）通过有界线程池并发执行，总耗时取决于最慢的一条查询而不是所有查询之和；
+查询结果的序列化和 JSON 编码同样在线程池中完成，不阻塞事件循环。
+
+ASGI（mediCore/asgi.py）下直接在事件循环中运行；WSGI 下 Django 为每个请求单独运行事件循环，并发查询同样有效。
+线程池大小为 CASE_QUERY_MAX_WORKERS，每个线程使用自己的数据库连接，查询完成后归还连接池；
+线程池为进程内共享，连接池的 MAX_SIZE 应不小于请求线程数与之相加（manage.py serve 启动时检查）。
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Min
+from django.http import HttpResponse
+from django.utils.dateparse import parse_datetime
+from django.views import View
+
+from utils.renderers import dumps, loads
+
+from .models import Case, DataTable, DataTemplate, Dictionary
+from .serializers import CaseVisualizationDataSerializer, DictionarySerializer
+
+NUMERIC_DATA_TYPE = '数值类型'
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CASE_QUERY_MAX_WORKERS', 8), thread_name_prefix='case-query'
+            )
+        return _executor
+
+
+def _call_and_release(func):
+    try:
+        return func()
+    finally:
+        # 线程池中的线程不经过请求结束的连接清理，用完即归还连接
+        connections.close_all()
+
+
+async def run_query(func, *args, **kwargs):
+    """在线程池中执行同步的查询函数（沿用当前上下文，读写分离等状态随之生效）"""
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), context.run, _call_and_release, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def api_response(code, msg, data=None, status=200):
+    content = await run_query(dumps, {'code': code, 'msg': msg, 'data': data})
+    return HttpResponse(content, status=status, content_type='application/json')
+
+
+def _parse_time(value):
+    try:
+        return parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+
+
+def _get_or_none(queryset, **lookup):
+    return queryset.filter(**lookup).first()
+
+
+class AsyncCaseQueryView(View):
+    """
+    异步病例查询接口基类：只接受 POST JSON 请求，不直接注册路由。
+    子类实现 async def query(self, data)，接收解析后的请求体（dict），返回 api_response 生成的响应
+    """
+    http_method_names = ['post', 'options']
+    # 只读查询，读操作可走只读副本
+    read_replica = True
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            data = loads(request.body or b'{}')
+        except ValueError:
+            return await api_response(400, '请求体需为JSON', status=400)
+        if not isinstance(data, dict):
+            return await api_response(400, '请求体需为JSON对象', status=400)
+        return await self.query(data)
+
+
+def _case_template_rows(case_id):
+    # 每个 模板 + 检查时间 一行，first_id 用于按同步版本的顺序（数据首次出现的顺序）合并各病例的结果
+    return list(
+        DataTable.objects.filter(case_id=case_id, data_template__category__isnull=False, check_time__isnull=False)
+        .values_list('data_template__category__name', 'data_template__template_name',
+                     'data_template__template_code', 'check_time')
+        .annotate(first_id=Min('id')).order_by()
+    )
+
+
+def _group_by_category(rows):
+    result = {}
+    for category, template_name, template_code, check_time, _ in sorted(rows, key=lambda row: row[4]):
+        templates = result.setdefault(category, {})
+        key = (template_code, check_time)
+        if key not in templates:
+            templates[key] = {
+                'template_name': template_name,
+                'template_code': template_code,
+                'check_time': check_time.strftime(TIME_FORMAT),
+            }
+    return [{'template_category': category, 'templates': list(templates.values())} for category, templates in result.items()]
+
+
+class AsyncCaseTemplateSummaryView(AsyncCaseQueryView):
+    """病例的模板汇总（异步版本）：每个病例的查询并发执行"""
+
+    async def query(self, data):
+        case_codes = data.get('case_codes', [])
+        if not case_codes or not isinstance(case_codes, list):
+            return await api_response(400, '请提供case_codes列表', status=400)
+        case_ids = await run_query(
+            lambda: list(Case.objects.filter(case_code__in=case_codes).values_list('id', flat=True))
+        )
+        if not case_ids:
+            return await api_response(404, '未找到相关病例', status=404)
+        row_lists = await asyncio.gather(*(run_query(_case_template_rows, case_id) for case_id in case_ids))
+        rows = [row for rows in row_lists for row in rows]
+        return await api_response(200, '操作成功', await run_query(_group_by_category, rows))
+
+
+def _detail_items(case_id, template_id, check_time):
+    data_tables = DataTable.objects.filter(
+        case_id=case_id, data_template_id=template_id, check_time=check_time
+    ).select_related('dictionary')
+    items = []
+    for dt in data_tables:
+        item = DictionarySerializer(dt.dictionary).data
+        item['value'] = dt.value
+        items.append(item)
+    return items
+
+
+class AsyncCaseTemplateDetailView(AsyncCaseQueryView):
+    """某次检查的全部词条及其值（异步版本）：病例和模板并发查询"""
+
+    async def query(self, data):
+        case_code, template_code, check_time = data.get('case_code'), data.get('template_code'), data.get('check_time')
+        if not case_code or not template_code or not check_time:
+            return await api_response(400, '请提供case_code、template_code和check_time', status=400)
+        dt_check_time = _parse_time(check_time)
+        if not dt_check_time:
+            return await api_response(400, 'check_time格式错误，需为YYYY-MM-DD HH:MM:SS', status=400)
+        case, template = await asyncio.gather(
+            run_query(_get_or_none, Case.objects.all(), case_code=case_code),
+            run_query(_get_or_none, DataTemplate.objects.all(), template_code=template_code),
+        )
+        if case is None or template is None:
+            return await api_response(404, '未找到相关病例或模板', status=404)
+        items = await run_query(_detail_items, case.id, template.id, dt_check_time)
+        if not items:
+            return await api_response(404, '未找到相关数据', status=404)
+        return await api_response(200, '操作成功', {
+            'template_name': template.template_name,
+            'check_time': check_time,
+            'items': items,
+        })
+
+
+def _data_points(case_id, dictionary_id, check_times):
+    return [
+        {'check_time': check_time.strftime(TIME_FORMAT), 'value': value}
+        for check_time, value in DataTable.objects.filter(
+            case_id=case_id, dictionary_id=dictionary_id, check_time__in=check_times
+        ).order_by('check_time').values_list('check_time', 'value')
+    ]
+
+
+def _serialize_chart(result_data):
+    return CaseVisualizationDataSerializer(result_data, many=True).data
+
+
+class AsyncCaseVisualizationDataView(AsyncCaseQueryView):
+    """图表数据（异步版本）：每个词条的数据点查询并发执行"""
+
+    async def query(self, data):
+        case_code = data.get('case_code')
+        x_axis_times = data.get('x_axis_times', [])
+        y_axis_word_codes = data.get('y_axis_word_codes', [])
+        if not case_code or not x_axis_times or not y_axis_word_codes:
+            return await api_response(400, '请提供case_code, x_axis_times和y_axis_word_codes', status=400)
+        if not isinstance(x_axis_times, list) or not isinstance(y_axis_word_codes, list) \
+                or not all(isinstance(word_code, str) for word_code in y_axis_word_codes):
+            return await api_response(400, 'x_axis_times和y_axis_word_codes需为列表，词条编号需为字符串', status=400)
+
+        case, dictionaries = await asyncio.gather(
+            run_query(_get_or_none, Case.objects.all(), case_code=case_code),
+            run_query(lambda: {
+                dictionary.word_code: dictionary
+                for dictionary in Dictionary.objects.filter(word_code__in=y_axis_word_codes, data_type=NUMERIC_DATA_TYPE)
+            }),
+        )
+        if case is None:
+            return await api_response(404, '未找到相关病例', status=404)
+
+        x_axis_datetimes = [moment for moment in map(_parse_time, x_axis_times) if moment]
+        # 每个词条一条查询并发执行，结果按请求中的顺序返回，非数值型或不存在的词条跳过
+        selected = [word_code for word_code in dict.fromkeys(y_axis_word_codes) if word_code in dictionaries]
+        point_lists = await asyncio.gather(*(
+            run_query(_data_points, case.id, dictionaries[word_code].id, x_axis_datetimes) for word_code in selected
+        ))
+        points_by_code = dict(zip(selected, point_lists))
+        result_data = [
+            {'word_code': word_code, 'word_name': dictionaries[word_code].word_name, 'data_points': points_by_code[word_code]}
+            for word_code in y_axis_word_codes if word_code in points_by_code
+        ]
+        if not result_data:
+            return await api_response(404, '未找到符合条件的图表数据', status=404)
+        return await api_response(200, '操作成功', await run_query(_serialize_chart, result_data))
+
+
+def _y_axis_options(case_id):
+    template_groups = {}
+    seen_dictionaries = set()
+    rows = (
+        DataTable.objects.filter(case_id=case_id, dictionary__data_type=NUMERIC_DATA_TYPE)
+        .values_list('data_template__template_code', 'data_template__template_name',
+                     'dictionary__word_code', 'dictionary__word_name')
+        .order_by('id')
+    )
+    for template_code, template_name, word_code, word_name in rows:
+        group = template_groups.setdefault(template_code, {
+            'template_name': template_name, 'template_code': template_code, 'dictionaries': []
+        })
+        if word_code not in seen_dictionaries:
+            seen_dictionaries.add(word_code)
+            group['dictionaries'].append({'word_code': word_code, 'word_name': word_name})
+    return list(template_groups.values())
+
+
+class AsyncCaseVisualizationYAxisTimesView(AsyncCaseQueryView):
+    """病例的数值型词条（按模板分组，异步版本）"""
+
+    async def query(self, data):
+        case_code = data.get('case_code')
+        if not case_code:
+            return await api_response(400, '请提供case_code', status=400)
+        case = await run_query(_get_or_none, Case.objects.all(), case_code=case_code)
+        if case is None:
+            return await api_response(404, '未找到相关病例', status=404)
+        return await api_response(200, '操作成功', await run_query(_y_axis_options, case.id))
+
+
+def _x_axis_options(case_id, dictionary_id):
+    check_times = (
+        DataTable.objects.filter(case_id=case_id, dictionary_id=dictionary_id)
+        .values_list('check_time', flat=True).distinct().order_by('check_time')
+    )
+    return [check_time.strftime(TIME_FORMAT) for check_time in check_times if check_time]
+
+
+class AsyncCaseVisualizationXAxisOptionsView(AsyncCaseQueryView):
+    """病例某词条有数据的检查时间（异步版本）：病例和词条并发查询"""
+
+    async def query(self, data):
+        case_code, y_axis_word_code = data.get('case_code'), data.get('y_axis_word_code')
+        if not case_code or not y_axis_word_code:
+            return await api_response(400, '请提供case_code和y_axis_word_code', status=400)
+        case, dictionary = await asyncio.gather(
+            run_query(_get_or_none, Case.objects.all(), case_code=case_code),
+            run_query(_get_or_none, Dictionary.objects.all(), word_code=y_axis_word_code, data_type=NUMERIC_DATA_TYPE),
+        )
+        if case is None or dictionary is None:
+            return await api_response(404, '未找到相关病例或词条', status=404)
+        return await api_response(200, '操作成功', {
+            'x_axis_options': await run_query(_x_axis_options, case.id, dictionary.id)
+        })
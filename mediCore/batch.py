@@ -0,0 +1,144 @@
+"""
+数据批量修改和删除
+
+单条修改/删除按 (病例编号, 模板编号, 词条编号, 检查时间) 分别查询病例、模板、词条和数据，每条至少 5 次查询。
+批量模式下：
+
+1. 三类编号各一次 IN 查询解析为主键
+2. 按主键集合一次取出候选数据，在内存中按自然键精确匹配
+3. 修改用 bulk_update（一条 UPDATE ... CASE WHEN），删除用一条 DELETE ... WHERE id IN
+
+无论多少条，总查询数固定；每条数据单独返回处理结果，无效或不存在的条目不影响其他条目。
+"""
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Case, DataTable, DataTemplate, Dictionary
+from .versions import touch_cases
+
+STATUS_UPDATED = 'updated'
+STATUS_DELETED = 'deleted'
+STATUS_NOT_FOUND = 'not_found'
+STATUS_INVALID = 'invalid'
+
+
+def _result(index, item, status, msg=None):
+    return {
+        'index': index,
+        'case_code': item.get('case_code'),
+        'template_code': item.get('template_code'),
+        'word_code': item.get('word_code'),
+        'check_time': item.get('check_time'),
+        'status': status,
+        'msg': msg,
+    }
+
+
+def resolve_items(items, defaults, require_value=False):
+    """
+    解析每条数据的自然键，病例、模板、词条编号各一次查询
+
+    :param defaults: 条目中未提供 case_code / template_code 时使用的值
+    :return: (有效条目 [(序号, 条目, (case_id, template_id, dictionary_id, check_time))], 无效条目的结果列表)
+    """
+    items = [{**defaults, **item} if isinstance(item, dict) else item for item in items]
+    codes = {'case_code': set(), 'template_code': set(), 'word_code': set()}
+    for item in items:
+        if isinstance(item, dict):
+            for field, values in codes.items():
+                if item.get(field):
+                    values.add(item[field])
+    cases = dict(Case.objects.filter(case_code__in=codes['case_code']).values_list('case_code', 'id'))
+    templates = dict(
+        DataTemplate.objects.filter(template_code__in=codes['template_code']).values_list('template_code', 'id')
+    )
+    dictionaries = dict(Dictionary.objects.filter(word_code__in=codes['word_code']).values_list('word_code', 'id'))
+
+    valid, invalid = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            invalid.append(_result(index, {}, STATUS_INVALID, '数据格式不正确'))
+            continue
+        required = ['case_code', 'template_code', 'word_code', 'check_time'] + (['value'] if require_value else [])
+        missing = [field for field in required if item.get(field) in (None, '')]
+        if missing:
+            invalid.append(_result(index, item, STATUS_INVALID, f"请提供{'、'.join(missing)}"))
+            continue
+        check_time = parse_datetime(str(item['check_time']))
+        if check_time is None:
+            invalid.append(_result(index, item, STATUS_INVALID, 'check_time格式错误，需为YYYY-MM-DD HH:MM:SS'))
+            continue
+        not_found = [
+            f'{label}{item[field]}' for field, label, found in (
+                ('case_code', '病例编号', cases), ('template_code', '模板编号', templates), ('word_code', '词条编号', dictionaries)
+            ) if item[field] not in found
+        ]
+        if not_found:
+            invalid.append(_result(index, item, STATUS_NOT_FOUND, f"未找到: {', '.join(not_found)}"))
+            continue
+        key = (cases[item['case_code']], templates[item['template_code']], dictionaries[item['word_code']], check_time)
+        valid.append((index, item, key))
+    return valid, invalid
+
+
+def _fetch_rows(keys, fields):
+    """按自然键取出数据：先按各列取值集合查出候选行，再在内存中精确匹配"""
+    if not keys:
+        return {}
+    candidates = DataTable.objects.filter(
+        case_id__in={key[0] for key in keys},
+        data_template_id__in={key[1] for key in keys},
+        dictionary_id__in={key[2] for key in keys},
+        check_time__in={key[3] for key in keys},
+    ).only(*fields)
+    keys = set(keys)
+    rows = {}
+    for row in candidates:
+        key = (row.case_id, row.data_template_id, row.dictionary_id, row.check_time)
+        if key in keys:
+            rows[key] = row
+    return rows
+
+
+def bulk_update_values(items, defaults=None, batch_size=500):
+    """批量修改数据值，返回每条的处理结果（按提交顺序）"""
+    valid, results = resolve_items(items, defaults or {}, require_value=True)
+    with transaction.atomic():
+        rows = _fetch_rows(
+            [key for _, _, key in valid],
+            ['id', 'case_id', 'data_template_id', 'dictionary_id', 'check_time', 'value']
+        )
+        changed = {}
+        for index, item, key in valid:
+            row = rows.get(key)
+            if row is None:
+                results.append(_result(index, item, STATUS_NOT_FOUND, '未找到相关数据'))
+                continue
+            # 同一数据出现多次时以最后一次为准
+            row.value = item['value']
+            changed[row.id] = row
+            results.append(_result(index, item, STATUS_UPDATED))
+        if changed:
+            DataTable.objects.bulk_update(list(changed.values()), ['value'], batch_size=batch_size)
+            touch_cases(row.case_id for row in changed.values())
+    return sorted(results, key=lambda result: result['index'])
+
+
+def bulk_delete(items, defaults=None):
+    """批量删除数据，返回每条的处理结果（按提交顺序）"""
+    valid, results = resolve_items(items, defaults or {})
+    with transaction.atomic():
+        rows = _fetch_rows(
+            [key for _, _, key in valid], ['id', 'case_id', 'data_template_id', 'dictionary_id', 'check_time']
+        )
+        for index, item, key in valid:
+            if key in rows:
+                results.append(_result(index, item, STATUS_DELETED))
+            else:
+                results.append(_result(index, item, STATUS_NOT_FOUND, '未找到相关数据'))
+        ids = [row.id for row in rows.values()]
+        if ids:
+            # DataTable 无级联和信号，delete() 直接执行一条 DELETE ... WHERE id IN
+            DataTable.objects.filter(pk__in=ids).delete()
+            touch_cases(row.case_id for row in rows.values())
+    return sorted(results, key=lambda result: result['index'])
@@ -0,0 +1,429 @@
+"""
+临床数据导出
+
+患者的全部检查数据可能有几十万行，不再构造模型实例并一次性序列化，
+而是用键集遍历 values_list 元组（见 utils/keyset.py），模板、分类、词条名称从内存映射中查找，
+逐行编码后以流式响应输出，进程内存与数据量无关。
+
+档案宽表导出：按 (病例, 检查时间) 顺序遍历某个模板的数据，相邻的同一 (病例, 检查时间) 的数据
+合并为一行、每个词条一列（列来自模板的词条关系），逐行写出 CSV 或按行组写出 Parquet，
+内存中最多只保留一批原始数据和一个 Parquet 行组。Parquet 需写完整个文件才能读取，只通过后台导出任务生成。
+
+后台导出（export 任务）：数据量大的导出提交为后台任务，由 run_jobs 的 worker 执行，
+边查询边写入 EXPORT_ROOT 下的临时文件，完成后改名为正式文件，通过任务下载接口（支持 Range 断点续传）获取。
+同时执行的导出任务数受 EXPORT_MAX_CONCURRENT_JOBS 限制。
+"""
+import csv
+import json
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+
+from utils.keyset import iter_keyset
+from .jobs import register_job, update_progress
+from .models import Archive, Case, DataTable, DataTemplate, DataTemplateDictionary, Dictionary
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时不支持 Parquet 导出
+    pa = pq = None
+
+PIVOT_FILE_FORMATS = ('csv', 'parquet')
+PIVOT_FIXED_COLUMNS = ['case_code', 'name', 'check_time']
+
+# 与 DataTableDetailSerializer 的字段一致
+CASE_DATA_FIELDS = ['id', 'case_code', 'template_category', 'template_name', 'word_name', 'value', 'check_time']
+
+_datetime_field = serializers.DateTimeField()
+
+
+def _parse_time(params, name, end=False):
+    value = params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise serializers.ValidationError({name: '时间格式错误，请使用 YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS'})
+        # 只给日期时，结束时间包含当天
+        parsed = parse_datetime(f'{day} 23:59:59.999999' if end else f'{day} 00:00:00')
+    return parsed
+
+
+def filter_case_data(queryset, params):
+    """按检查时间范围（start_time / end_time）和模板编号（template_code，多个用逗号分隔）过滤"""
+    start_time = _parse_time(params, 'start_time')
+    end_time = _parse_time(params, 'end_time', end=True)
+    if start_time:
+        queryset = queryset.filter(check_time__gte=start_time)
+    if end_time:
+        queryset = queryset.filter(check_time__lte=end_time)
+    template_codes = [code.strip() for code in params.get('template_code', '').split(',') if code.strip()]
+    if template_codes:
+        queryset = queryset.filter(
+            data_template_id__in=list(
+                DataTemplate.objects.filter(template_code__in=template_codes).values_list('id', flat=True)
+            )
+        )
+    return queryset
+
+
+class NameMap:
+    """按需加载并缓存 id -> 名称，只查询遍历中实际出现的模板和词条"""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.names = {}
+
+    def __getitem__(self, key):
+        if key not in self.names:
+            self.names.update(self.loader(key))
+        return self.names.get(key)
+
+
+def _template_loader(template_id):
+    return {
+        row[0]: (row[1], row[2])
+        for row in DataTemplate.all_objects.filter(pk=template_id).values_list('id', 'template_name', 'category__name')
+    }
+
+
+def _dictionary_loader(dictionary_id):
+    return dict(Dictionary.all_objects.filter(pk=dictionary_id).values_list('id', 'word_name'))
+
+
+def iter_case_data(case_ids, params, chunk_size=2000):
+    """按病例、检查时间顺序逐行产出病例数据（字段同 CASE_DATA_FIELDS），键集顺序与索引 idx_data_case_time 一致"""
+    case_codes = dict(Case.objects.filter(pk__in=case_ids).values_list('id', 'case_code'))
+    templates = NameMap(_template_loader)
+    dictionaries = NameMap(_dictionary_loader)
+    queryset = filter_case_data(DataTable.objects.filter(case_id__in=list(case_codes)), params)
+    rows = iter_keyset(
+        queryset,
+        ['id', 'case_id', 'data_template_id', 'dictionary_id', 'value', 'check_time'],
+        ordering=['case_id', 'check_time', 'id'],
+        chunk_size=chunk_size
+    )
+    for pk, case_id, template_id, dictionary_id, value, check_time in rows:
+        template_name, category_name = templates[template_id] or (None, None)
+        yield {
+            'id': pk,
+            'case_code': case_codes[case_id],
+            'template_category': category_name,
+            'template_name': template_name,
+            'word_name': dictionaries[dictionary_id],
+            'value': value,
+            'check_time': _datetime_field.to_representation(check_time),
+        }
+
+
+def _dumps(row):
+    return json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder)
+
+
+def _buffered(parts, size=64 * 1024):
+    """合并小字符串后再输出，避免每行一次 write"""
+    buffer = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def ndjson_stream(rows):
+    """每行一个 JSON 对象"""
+    return _buffered(_dumps(row) + '\n' for row in rows)
+
+
+def json_array_stream(rows):
+    """分块输出一个 JSON 数组"""
+    def parts():
+        yield '['
+        for index, row in enumerate(rows):
+            yield (',' if index else '') + _dumps(row)
+        yield ']'
+    return _buffered(parts())
+
+
+# ---------------------------------------------------------------------------
+# 档案宽表导出
+# ---------------------------------------------------------------------------
+
+def pivot_columns(template):
+    """模板的词条列：[(词条id, 列名)]，按加入模板的顺序；词条名称重复时列名附加词条编号"""
+    terms = list(
+        DataTemplateDictionary.objects.filter(data_template=template)
+        .order_by('id').values_list('dictionary_id', 'dictionary__word_name', 'dictionary__word_code')
+    )
+    names = [name for _, name, _ in terms]
+    return [
+        (dictionary_id, f'{name}({code})' if names.count(name) > 1 else name)
+        for dictionary_id, name, code in terms
+    ]
+
+
+def iter_pivot_rows(archive, template, columns, case_chunk_size=500, chunk_size=5000):
+    """
+    逐行产出宽表数据 [case_code, name, check_time, 词条1, 词条2, ...]，
+    按病例 id 分批，每批病例内按 (case_id, check_time, id) 键集遍历数据
+    """
+    positions = {dictionary_id: len(PIVOT_FIXED_COLUMNS) + index for index, (dictionary_id, _) in enumerate(columns)}
+    cases = iter_keyset(Case.objects.filter(archives=archive), ['id', 'case_code', 'name'], chunk_size=case_chunk_size)
+    while True:
+        case_chunk = {case_id: (case_code, name) for case_id, case_code, name in _take(cases, case_chunk_size)}
+        if not case_chunk:
+            return
+        rows = iter_keyset(
+            DataTable.objects.filter(case_id__in=list(case_chunk), data_template=template),
+            ['case_id', 'check_time', 'dictionary_id', 'value'],
+            ordering=['case_id', 'check_time', 'id'],
+            chunk_size=chunk_size
+        )
+        current_key = record = None
+        for case_id, check_time, dictionary_id, value in rows:
+            if (case_id, check_time) != current_key:
+                if record is not None:
+                    yield record
+                current_key = (case_id, check_time)
+                record = list(case_chunk[case_id]) + [check_time] + [None] * len(columns)
+            position = positions.get(dictionary_id)
+            if position is not None:
+                record[position] = value
+        if record is not None:
+            yield record
+
+
+def _take(iterator, count):
+    items = []
+    for item in iterator:
+        items.append(item)
+        if len(items) >= count:
+            break
+    return items
+
+
+def _cell(value):
+    """数据值转为单元格文本：字符串原样输出，列表/字典等输出 JSON"""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, cls=DjangoJSONEncoder)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_stream(columns, records):
+    """逐行输出 CSV（带 BOM，便于 Excel 识别 UTF-8）"""
+    writer = csv.writer(_Echo())
+
+    def parts():
+        yield '\ufeff' + writer.writerow(PIVOT_FIXED_COLUMNS + [name for _, name in columns])
+        for record in records:
+            yield writer.writerow(
+                record[:2] + [record[2].strftime('%Y-%m-%d %H:%M:%S')] + [_cell(value) for value in record[3:]]
+            )
+    return _buffered(parts())
+
+
+def write_parquet(columns, records, file, row_group_size=50000):
+    """按行组写出 Parquet，内存中最多保留一个行组，返回写出的行数"""
+    if pq is None:
+        raise RuntimeError('服务器未安装 pyarrow，不支持 Parquet 导出')
+    names = PIVOT_FIXED_COLUMNS + [name for _, name in columns]
+    schema = pa.schema(
+        [pa.field('case_code', pa.string()), pa.field('name', pa.string()), pa.field('check_time', pa.timestamp('us'))]
+        + [pa.field(name, pa.string()) for _, name in columns]
+    )
+    batch = [[] for _ in names]
+    written = 0
+    with pq.ParquetWriter(file, schema) as writer:
+        for record in records:
+            for index, value in enumerate(record):
+                batch[index].append(value if index < len(PIVOT_FIXED_COLUMNS) else _cell(value))
+            if len(batch[0]) >= row_group_size:
+                writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+                written += len(batch[0])
+                batch = [[] for _ in names]
+        # 没有数据时也写出一个空行组，保证文件带有列定义
+        if batch[0] or not written:
+            writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+            written += len(batch[0])
+    return written
+
+
+# ---------------------------------------------------------------------------
+# 后台导出
+# ---------------------------------------------------------------------------
+
+EXPORT_ARCHIVE = 'archive'
+EXPORT_PATIENT_CASE_DATA = 'patient_case_data'
+EXPORT_DICTIONARY = 'dictionary'
+EXPORT_TYPES = [
+    (EXPORT_ARCHIVE, '档案数据宽表（csv / parquet）'),
+    (EXPORT_PATIENT_CASE_DATA, '患者全部病例数据（ndjson / json）'),
+    (EXPORT_DICTIONARY, '词条字典（csv / ndjson）'),
+]
+EXPORT_FILE_FORMATS = {
+    EXPORT_ARCHIVE: PIVOT_FILE_FORMATS,
+    EXPORT_PATIENT_CASE_DATA: ('ndjson', 'json'),
+    EXPORT_DICTIONARY: ('csv', 'ndjson'),
+}
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+}
+DICTIONARY_EXPORT_FIELDS = [
+    'word_code', 'word_name', 'word_eng', 'word_short', 'word_class', 'word_apply', 'word_belong',
+    'data_type', 'input_type', 'options', 'followup_options', 'has_unit', 'unit', 'is_score', 'score_func',
+]
+
+# 每处理多少条汇报一次进度（同时检查任务是否已被取消）
+EXPORT_PROGRESS_STEP = 5000
+
+
+def export_root():
+    return Path(getattr(settings, 'EXPORT_ROOT', settings.BASE_DIR / 'exports'))
+
+
+def export_file_path(job):
+    """已完成导出任务的结果文件路径，文件不存在时返回 None"""
+    name = (job.result or {}).get('file')
+    if not name:
+        return None
+    path = export_root() / name
+    return path if path.is_file() else None
+
+
+def _tracked(job, items, total, counter=None):
+    """遍历时定期汇报进度；counter(item) 返回该条计入进度的数量，默认每条计 1"""
+    progress = reported = 0
+    update_progress(job, 0, total)
+    for item in items:
+        yield item
+        progress += counter(item) if counter else 1
+        if progress - reported >= EXPORT_PROGRESS_STEP:
+            update_progress(job, progress)
+            reported = progress
+
+
+def _write_text(path, parts):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        for part in parts:
+            file.write(part)
+
+
+def _export_archive(job, path, archive_code, template_code, file_format='csv'):
+    archive = Archive.objects.get(archive_code=archive_code)
+    template = DataTemplate.objects.get(template_code=template_code)
+    columns = pivot_columns(template)
+
+    # 进度按病例计，没有数据的病例不产出行，结束时统一补齐
+    last_case = [None]
+
+    def new_case(record):
+        changed = record[0] != last_case[0]
+        last_case[0] = record[0]
+        return int(changed)
+
+    total = Case.objects.filter(archives=archive).count()
+    records = _tracked(job, iter_pivot_rows(archive, template, columns), total, counter=new_case)
+    if file_format == 'parquet':
+        rows = write_parquet(columns, records, path)
+    else:
+        rows = 0
+
+        def counted():
+            nonlocal rows
+            for record in records:
+                rows += 1
+                yield record
+        _write_text(path, csv_stream(columns, counted()))
+    return f'{archive.archive_code}_{template.template_code}.{file_format}', rows, total
+
+
+def _export_patient_case_data(job, path, identity_id, file_format='ndjson', **filters):
+    case_ids = list(Case.objects.filter(identity_id=identity_id).values_list('id', flat=True))
+    total = filter_case_data(DataTable.objects.filter(case_id__in=case_ids), filters).count()
+    rows = _tracked(job, iter_case_data(case_ids, filters), total)
+    _write_text(path, json_array_stream(rows) if file_format == 'json' else ndjson_stream(rows))
+    return f'{identity_id}_case_data.{file_format}', total, total
+
+
+def _export_dictionary(job, path, file_format='csv'):
+    queryset = Dictionary.objects.all()
+    total = queryset.count()
+    values = iter_keyset(queryset, DICTIONARY_EXPORT_FIELDS)
+    rows = _tracked(job, (dict(zip(DICTIONARY_EXPORT_FIELDS, row)) for row in values), total)
+    if file_format == 'ndjson':
+        _write_text(path, ndjson_stream(rows))
+    else:
+        writer = csv.writer(_Echo())
+
+        def parts():
+            yield '\ufeff' + writer.writerow(DICTIONARY_EXPORT_FIELDS)
+            for row in rows:
+                yield writer.writerow([_cell(row[field]) for field in DICTIONARY_EXPORT_FIELDS])
+        _write_text(path, _buffered(parts()))
+    return f'dictionary.{file_format}', total, total
+
+
+EXPORTERS = {
+    EXPORT_ARCHIVE: _export_archive,
+    EXPORT_PATIENT_CASE_DATA: _export_patient_case_data,
+    EXPORT_DICTIONARY: _export_dictionary,
+}
+
+
+@register_job('export', concurrency_setting='EXPORT_MAX_CONCURRENT_JOBS', cancellable=True)
+def run_export(job, export_type, **params):
+    """执行导出并写入结果文件；失败或取消时删除未完成的文件"""
+    file_format = params.get('file_format') or EXPORT_FILE_FORMATS[export_type][0]
+    root = export_root()
+    root.mkdir(parents=True, exist_ok=True)
+    name = f'job_{job.id}.{file_format}'
+    partial = root / f'{name}.part'
+    try:
+        filename, rows, total = EXPORTERS[export_type](job, partial, **params)
+        os.replace(partial, root / name)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    update_progress(job, total, total)
+    return {
+        'file': name,
+        'filename': filename,
+        'content_type': EXPORT_CONTENT_TYPES[file_format],
+        'size': (root / name).stat().st_size,
+        'rows': rows,
+    }
+
+
+def remove_expired_exports():
+    """删除超过保留天数（EXPORT_RETENTION_DAYS）的导出文件，返回删除的文件数"""
+    root = export_root()
+    if not root.is_dir():
+        return 0
+    expire_before = time.time() - getattr(settings, 'EXPORT_RETENTION_DAYS', 7) * 86400
+    removed = 0
+    for path in root.iterdir():
+        if path.is_file() and path.stat().st_mtime < expire_before:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
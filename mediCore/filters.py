@@ -0,0 +1,191 @@
+"""
+病例列表的多维筛选与分面统计
+
+筛选参数（均可选，多个值用英文逗号分隔）：
+- gender: 性别 0/1
+- blood_type: 血型
+- age_min / age_max: 年龄范围（按 birth_date 换算为日期范围，可走索引）
+- archive_code: 档案编号
+- diagnosis: 主要诊断关键词，多个关键词需同时包含
+- transplanted / in_transplant_queue: 是否行移植手术 / 是否在移植排队，0 或 1
+- transplant_date_from / transplant_date_to: 移植手术日期范围（YYYY-MM-DD，含两端）
+
+分面统计对每个维度单独执行一次分组查询，统计时不应用该维度自身的筛选条件，
+便于前端展示“切换到其他取值后的数量”；结果按筛选参数及表的缓存版本号短期缓存。
+"""
+import hashlib
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField, Count, Value, When
+from django.db.models import Case as CaseWhen
+from rest_framework import serializers
+
+from utils.cache import versioned_key
+from .models import ArchiveCase
+
+TRANSPLANT_FILTER_PARAMS = ['transplanted', 'in_transplant_queue', 'transplant_date_from', 'transplant_date_to']
+FILTER_PARAMS = ['gender', 'blood_type', 'age_min', 'age_max', 'archive_code', 'diagnosis'] + TRANSPLANT_FILTER_PARAMS
+
+# 分面统计缓存依赖的表，这些表批量变更后 bump_cache_version 即可使统计缓存失效
+FACET_CACHE_TABLES = ['case', 'archive_case']
+
+# 年龄分组：(名称, 最小年龄, 最大年龄)
+AGE_GROUPS = [
+    ('0-17', 0, 17),
+    ('18-39', 18, 39),
+    ('40-59', 40, 59),
+    ('60+', 60, None),
+]
+
+
+def _split(value):
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+
+def _parse_int(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise serializers.ValidationError({name: '请输入整数'})
+
+
+def _parse_bool(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    if str(value).lower() in ('1', 'true'):
+        return True
+    if str(value).lower() in ('0', 'false'):
+        return False
+    raise serializers.ValidationError({name: '只能为 0 或 1'})
+
+
+def _parse_date(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise serializers.ValidationError({name: '日期格式错误，请使用YYYY-MM-DD格式'})
+
+
+def _years_ago(today, years):
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:  # 2月29日
+        return today.replace(year=today.year - years, day=28)
+
+
+def birth_date_range(age_min=None, age_max=None, today=None):
+    """年龄范围换算为出生日期范围 (birth_date__lte, birth_date__gt)"""
+    today = today or date.today()
+    latest = _years_ago(today, age_min) if age_min is not None else None
+    earliest = _years_ago(today, age_max + 1) if age_max is not None else None
+    return latest, earliest
+
+
+def filter_transplant(queryset, params):
+    """按结构化移植字段过滤病例查询集，可走 idx_case_transplant 索引范围扫描"""
+    transplanted = _parse_bool(params, 'transplanted')
+    date_from = _parse_date(params, 'transplant_date_from')
+    date_to = _parse_date(params, 'transplant_date_to')
+    # 指定手术日期范围即意味着已移植
+    if transplanted is None and (date_from or date_to):
+        transplanted = True
+    if transplanted is not None:
+        queryset = queryset.filter(transplanted=transplanted)
+    if date_from:
+        queryset = queryset.filter(transplant_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(transplant_date__lte=date_to)
+
+    in_queue = _parse_bool(params, 'in_transplant_queue')
+    if in_queue is not None:
+        queryset = queryset.filter(in_transplant_queue=in_queue)
+    return queryset
+
+
+def filter_cases(queryset, params, exclude=()):
+    """按筛选参数过滤病例查询集，exclude 中的参数不参与过滤"""
+    if 'gender' not in exclude and params.get('gender'):
+        genders = []
+        for value in _split(params['gender']):
+            if value not in ('0', '1'):
+                raise serializers.ValidationError({'gender': '性别只能为 0 或 1'})
+            genders.append(int(value))
+        queryset = queryset.filter(gender__in=genders)
+
+    if 'blood_type' not in exclude and params.get('blood_type'):
+        queryset = queryset.filter(blood_type__in=_split(params['blood_type']))
+
+    if 'age' not in exclude:
+        latest, earliest = birth_date_range(_parse_int(params, 'age_min'), _parse_int(params, 'age_max'))
+        if latest is not None:
+            queryset = queryset.filter(birth_date__lte=latest)
+        if earliest is not None:
+            queryset = queryset.filter(birth_date__gt=earliest)
+
+    if 'archive_code' not in exclude and params.get('archive_code'):
+        queryset = queryset.filter(pk__in=ArchiveCase.objects.filter(
+            archive__archive_code__in=_split(params['archive_code'])
+        ).values('case_id'))
+
+    if 'diagnosis' not in exclude and params.get('diagnosis'):
+        for keyword in str(params['diagnosis']).replace('，', ',').replace(' ', ',').split(','):
+            if keyword.strip():
+                queryset = queryset.filter(main_diagnosis__icontains=keyword.strip())
+
+    return filter_transplant(queryset, params)
+
+
+def _age_group_expression(today=None):
+    whens = []
+    for name, age_min, age_max in AGE_GROUPS:
+        latest, earliest = birth_date_range(age_min, age_max, today)
+        condition = {'birth_date__lte': latest}
+        if earliest is not None:
+            condition['birth_date__gt'] = earliest
+        whens.append(When(**condition, then=Value(name)))
+    return CaseWhen(*whens, default=Value(None), output_field=CharField())
+
+
+def _group_counts(queryset, field):
+    rows = queryset.order_by().values(field).annotate(count=Count('pk')).order_by('-count')
+    return [{'value': row[field], 'count': row['count']} for row in rows]
+
+
+def case_facets(queryset, params):
+    """计算各维度的分面统计，每个维度一次分组查询"""
+    cache_key = versioned_key('case_facets', FACET_CACHE_TABLES, hashlib.md5(repr(sorted(
+        (name, params.get(name)) for name in FILTER_PARAMS + ['search'] if params.get(name)
+    )).encode('utf-8')).hexdigest())
+    facets = cache.get(cache_key)
+    if facets is not None:
+        return facets
+
+    facets = {
+        'total': filter_cases(queryset, params).order_by().count(),
+        'gender': _group_counts(filter_cases(queryset, params, exclude={'gender'}), 'gender'),
+        'blood_type': _group_counts(filter_cases(queryset, params, exclude={'blood_type'}), 'blood_type'),
+        'age_group': _group_counts(
+            filter_cases(queryset, params, exclude={'age'}).annotate(age_group=_age_group_expression()),
+            'age_group'
+        ),
+    }
+    archive_cases = ArchiveCase.objects.filter(
+        case_id__in=filter_cases(queryset, params, exclude={'archive_code'}).order_by().values('pk')
+    )
+    facets['archive'] = [
+        {'value': row['archive__archive_code'], 'name': row['archive__archive_name'], 'count': row['count']}
+        for row in archive_cases.values('archive__archive_code', 'archive__archive_name')
+        .annotate(count=Count('pk')).order_by('-count')
+    ]
+
+    cache.set(cache_key, facets, getattr(settings, 'CASE_FACET_CACHE_TIMEOUT', 60))
+    return facets
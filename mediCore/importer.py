@@ -0,0 +1,253 @@
+"""
+病例批量导入
+
+逐条调用 CaseSerializer.create 时每个病例约需 8 次查询（查/建患者、扫描最大病例编号、设置档案等），
+批量导入改为：
+
+1. 先在内存中一次性校验全部行（身份证号格式、出生日期、性别、档案编号），收集逐行错误
+2. 按批 upsert 患者（bulk_create + update_conflicts）
+3. 一次预留整段病例编号，按批 bulk_create 病例，再按病例编号取回主键
+4. 按批 bulk_create 档案关联（忽略已存在的关联），并显式重建检索词元
+
+支持 CSV（首行为列名）和 NDJSON（每行一个 JSON 对象）两种格式，文件须为 UTF-8 编码，列名与 CaseSerializer 字段一致，
+档案编号列 archive_codes 多个用逗号分隔。
+"""
+import csv
+import codecs
+import json
+import re
+from datetime import date, datetime
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from utils.cache import bump_cache_version
+from . import search
+from .models import Archive, ArchiveCase, Case, CodeSequence, Identity
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+CASE_CODE_PREFIX = 'C'
+CASE_CODE_DIGITS = 6
+CASE_CODE_SEQUENCE = 'case_code'
+
+IDENTITY_PATTERN = re.compile(r'^\d{17}[\dXx]$')
+
+CASE_IMPORT_FIELDS = [
+    'opd_id', 'inhospital_id', 'phone_number', 'home_address', 'blood_type',
+    'main_diagnosis', 'has_transplant_surgery', 'is_in_transplant_queue',
+]
+GENDER_VALUES = {'0': 0, '1': 1, '女': 0, '男': 1}
+
+
+def is_utf8(file):
+    """逐块检查上传文件是否为 UTF-8 编码（可带 BOM），检查后回到文件开头"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        for chunk in file.chunks():
+            decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    finally:
+        file.seek(0)
+    return True
+
+
+def read_rows(file, file_format):
+    """读取上传文件，返回 (行号, 行数据) 迭代器"""
+    lines = codecs.iterdecode(file, 'utf-8-sig')
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(lines, start=1):
+            if line.strip():
+                try:
+                    yield line_num, json.loads(line)
+                except ValueError:
+                    yield line_num, None
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _birth_date_from_identity(identity_id):
+    try:
+        return date(int(identity_id[6:10]), int(identity_id[10:12]), int(identity_id[12:14]))
+    except ValueError:
+        return None
+
+
+def validate_row(row, archive_map):
+    """校验并整理一行数据，返回 (病例字段, 档案编号列表, 错误列表)"""
+    if not isinstance(row, dict):
+        return None, [], ['行格式不正确']
+    row = {key.strip(): _clean(value) for key, value in row.items() if key}
+    errors = []
+
+    identity_id = row.get('identity') or row.get('identity_id')
+    birth_date = None
+    if not identity_id or not IDENTITY_PATTERN.match(identity_id):
+        errors.append('请提供有效的18位身份证号')
+    else:
+        identity_id = identity_id.upper()
+        birth_date = _birth_date_from_identity(identity_id)
+        if birth_date is None:
+            errors.append('身份证号格式不正确')
+
+    if row.get('birth_date') and birth_date:
+        try:
+            if datetime.strptime(row['birth_date'], '%Y-%m-%d').date() != birth_date:
+                errors.append('出生日期与身份证号中的日期不符')
+        except ValueError:
+            errors.append('日期格式错误，请使用YYYY-MM-DD格式')
+
+    if not row.get('name'):
+        errors.append('姓名不能为空')
+
+    # 未填写性别时按身份证号第17位推断
+    if row.get('gender') is not None:
+        gender = GENDER_VALUES.get(row['gender'])
+        if gender is None:
+            errors.append('性别只能为 0 或 1')
+    elif identity_id and IDENTITY_PATTERN.match(identity_id):
+        gender = int(identity_id[16]) % 2
+    else:
+        gender = None
+
+    archive_codes = [code.strip() for code in (row.get('archive_codes') or '').split(',') if code.strip()]
+    missing = [code for code in archive_codes if code not in archive_map]
+    if missing:
+        errors.append(f"以下档案编号不存在: {', '.join(missing)}")
+
+    if errors:
+        return None, [], errors
+
+    data = {field: row.get(field) for field in CASE_IMPORT_FIELDS if row.get(field) is not None}
+    data.update(identity_id=identity_id, name=row['name'], gender=gender, birth_date=birth_date)
+    return data, archive_codes, []
+
+
+def _max_case_number():
+    # 包含等待后台删除的病例
+    last_case = (
+        Case.all_objects.filter(case_code__startswith=CASE_CODE_PREFIX)
+        .order_by('-case_code').only('case_code').first()
+    )
+    if last_case:
+        numeric_part = last_case.case_code[len(CASE_CODE_PREFIX):]
+        if numeric_part.isdigit():
+            return int(numeric_part)
+    return 0
+
+
+def reserve_case_codes(count):
+    """
+    预留一段连续的病例编号：C + 6位数字，须在事务内调用。
+    单条创建（CaseSerializer）和批量导入共用计数器行 code_sequence.case_code：锁住该行后分配，
+    其他分配者等待本事务结束，不会分到相同的编号；事务回滚时计数器一并回滚。
+    计数器不存在时按现有最大编号初始化。
+    """
+    CodeSequence.objects.get_or_create(name=CASE_CODE_SEQUENCE, defaults={'value': _max_case_number})
+    sequence = CodeSequence.objects.select_for_update().get(name=CASE_CODE_SEQUENCE)
+    CodeSequence.objects.filter(name=CASE_CODE_SEQUENCE).update(value=F('value') + count)
+    start = sequence.value + 1
+    return [f"{CASE_CODE_PREFIX}{number:0{CASE_CODE_DIGITS}d}" for number in range(start, start + count)]
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _upsert_identities(identities, batch_size):
+    """按批插入或更新患者，已存在的患者更新姓名、性别、出生日期"""
+    options = {'update_conflicts': True, 'update_fields': ['name', 'gender', 'birth_date']}
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不支持指定冲突字段
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['identity_id']
+    for batch in _chunks(identities, batch_size):
+        Identity.objects.bulk_create(batch, **options)
+    search.index_identities(identities)
+
+
+def import_cases(rows, archive_codes=None, batch_size=1000):
+    """
+    批量导入病例
+
+    :param rows: (行号, 行数据) 可迭代对象，见 read_rows
+    :param archive_codes: 所有病例都要关联的档案编号
+    :return: {'success_count', 'error_count', 'errors': [{'line', 'errors'}], 'case_codes'}
+    """
+    archive_map = dict(Archive.objects.values_list('archive_code', 'id'))
+    common_archive_ids = []
+    for code in archive_codes or []:
+        if code not in archive_map:
+            raise ValueError(f'未找到档案编号为 {code} 的档案')
+        common_archive_ids.append(archive_map[code])
+
+    valid_rows = []
+    errors = []
+    for line_num, row in rows:
+        data, row_archive_codes, row_errors = validate_row(row, archive_map)
+        if row_errors:
+            errors.append({'line': line_num, 'errors': row_errors})
+        else:
+            archive_ids = set(common_archive_ids) | {archive_map[code] for code in row_archive_codes}
+            valid_rows.append((data, archive_ids))
+
+    if not valid_rows:
+        return {'success_count': 0, 'error_count': len(errors), 'errors': errors, 'case_codes': []}
+
+    # 同一患者出现多行时以最后一行的姓名、性别为准
+    identities = {}
+    for data, _ in valid_rows:
+        identities[data['identity_id']] = Identity(
+            identity_id=data['identity_id'], name=data['name'],
+            gender=data['gender'], birth_date=data['birth_date']
+        )
+
+    with transaction.atomic():
+        _upsert_identities(list(identities.values()), batch_size)
+
+        case_codes = reserve_case_codes(len(valid_rows))
+        cases = []
+        for case_code, (data, _) in zip(case_codes, valid_rows):
+            case = Case(case_code=case_code, **data)
+            case.sync_transplant_status()
+            cases.append(case)
+        for batch in _chunks(cases, batch_size):
+            Case.objects.bulk_create(batch)
+
+        # MySQL 的 bulk_create 不回填主键，按病例编号取回
+        case_ids = {}
+        for batch in _chunks(case_codes, batch_size):
+            case_ids.update(Case.objects.filter(case_code__in=batch).values_list('case_code', 'id'))
+        for case in cases:
+            case.id = case_ids[case.case_code]
+
+        links = [
+            ArchiveCase(archive_id=archive_id, case_id=case.id)
+            for case, (_, archive_ids) in zip(cases, valid_rows)
+            for archive_id in archive_ids
+        ]
+        for batch in _chunks(links, batch_size):
+            ArchiveCase.objects.bulk_create(batch, ignore_conflicts=True)
+
+        for batch in _chunks(cases, batch_size):
+            search.index_cases(batch)
+
+    # 分页总数、分面统计等缓存整体失效一次
+    bump_cache_version('case', 'identity', 'archive_case')
+    return {
+        'success_count': len(cases),
+        'error_count': len(errors),
+        'errors': errors,
+        'case_codes': case_codes,
+    }
@@ -0,0 +1,395 @@
+"""
+后台任务
+
+任务记录保存在 background_job 表中，由 manage.py run_jobs 轮询领取并执行。
+任务处理函数通过 register_job 注册，签名为 handler(job, **params)，
+执行过程中调用 update_progress 汇报进度；任务被取消时 update_progress 抛出 JobCancelled。
+注册时可指定并发上限的配置项（如导出任务的 EXPORT_MAX_CONCURRENT_JOBS），
+同类任务执行中的数量达到上限时 worker 跳过该类任务，避免大量并发查询压垮数据库。
+只有注册时声明 cancellable 的任务可以取消：取消后不会留下无法恢复的中间状态（导出），
+或者重新提交即可从剩余数据继续（词条合并）。级联删除中途停止会使对象一直处于隐藏状态，不允许取消。
+
+执行中的任务记录 worker（主机名:进程号），worker 在后台线程中定期更新心跳时间（heartbeat_at）。
+worker 进程被强制结束（OOM、SIGKILL）时来不及把任务放回队列，run_jobs 的主进程发现 worker 退出或心跳超过
+BACKGROUND_JOB_HEARTBEAT_TIMEOUT 秒未更新时把任务放回队列；原 worker 若仍在运行，下一次汇报进度时即停止。
+
+级联删除（cascade_delete）：
+删除被大量数据引用的对象（病例、词条、模板、模板分类、档案）时，ORM 的级联删除会把所有关联的
+DataTable / ArchiveCase / Images 等行收集到内存中，并在一个长事务里删除，期间长时间锁住 data_table。
+这里改为先把对象标记为 pending_delete（默认管理器立即隐藏该对象），再由后台任务从叶子表开始
+按块删除关联数据，每块一个短事务，最后删除对象本身。已删除的数据不会恢复，任务失败后再次删除同一对象即重新提交任务，
+从剩余数据继续。
+
+词条合并（merge_dictionary）：
+把源词条的 DataTable / DataTemplateDictionary 数据按块改指向目标词条，每块一个短事务，
+唯一键 (case, data_template, dictionary, check_time) 冲突时按策略保留其中一条，最后删除源词条。
+每块处理完的数据不再属于源词条，任务失败或取消后重新提交即从剩余数据继续。
+"""
+import contextlib
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from utils.cache import bump_cache_version
+from .versions import bump_on_commit, touch_cases
+from .models import BackgroundJob, Case, DataTable, DataTemplateDictionary, Dictionary, Identity
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+# 任务类型 -> 并发上限配置项
+JOB_CONCURRENCY_SETTINGS = {}
+# 允许取消的任务类型
+CANCELLABLE_JOB_TYPES = set()
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+def register_job(job_type, concurrency_setting=None, cancellable=False):
+    """注册任务处理函数；concurrency_setting 为限制同时执行数量的配置项名称，cancellable 表示任务允许取消"""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        if concurrency_setting:
+            JOB_CONCURRENCY_SETTINGS[job_type] = concurrency_setting
+        if cancellable:
+            CANCELLABLE_JOB_TYPES.add(job_type)
+        return func
+    return decorator
+
+
+def enqueue_job(job_type, params=None):
+    """创建待执行任务；BACKGROUND_JOBS_EAGER 为 True 时（如本地开发无 worker）在事务提交后立即执行"""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f'未知的任务类型: {job_type}')
+    job = BackgroundJob.objects.create(job_type=job_type, params=params or {})
+    if getattr(settings, 'BACKGROUND_JOBS_EAGER', False):
+        transaction.on_commit(lambda: claim_job(job.id) and run_job(BackgroundJob.objects.get(pk=job.id)))
+    return job
+
+
+def worker_name(pid=None):
+    """worker 标识：主机名:进程号"""
+    return f'{socket.gethostname()}:{pid or os.getpid()}'
+
+
+def claim_job(job_id):
+    """把待执行任务标记为执行中，多个 worker 同时领取时只有一个成功"""
+    now = timezone.now()
+    return BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.STATUS_PENDING).update(
+        status=BackgroundJob.STATUS_RUNNING, started_at=now, worker=worker_name(), heartbeat_at=now
+    ) == 1
+
+
+def _concurrency_limit(job_type):
+    setting = JOB_CONCURRENCY_SETTINGS.get(job_type)
+    return getattr(settings, setting) if setting else None
+
+
+def _running_count(job_type):
+    return BackgroundJob.objects.filter(job_type=job_type, status=BackgroundJob.STATUS_RUNNING).count()
+
+
+def claim_next_job():
+    """领取下一个待执行任务（跳过已达到并发上限的任务类型），没有则返回 None"""
+    full_types = {
+        job_type for job_type in JOB_CONCURRENCY_SETTINGS
+        if _running_count(job_type) >= _concurrency_limit(job_type)
+    }
+    while True:
+        job_id, job_type = (
+            BackgroundJob.objects.filter(status=BackgroundJob.STATUS_PENDING)
+            .exclude(job_type__in=full_types)
+            .order_by('id').values_list('id', 'job_type').first()
+        ) or (None, None)
+        if job_id is None:
+            return None
+        if not claim_job(job_id):
+            continue
+        # 多个 worker 同时领取同类任务时可能超过上限，领取后复查，超出则放回队列
+        limit = _concurrency_limit(job_type)
+        if limit is not None and _running_count(job_type) > limit:
+            BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.STATUS_RUNNING).update(
+                status=BackgroundJob.STATUS_PENDING, started_at=None, worker=None, heartbeat_at=None
+            )
+            full_types.add(job_type)
+            continue
+        return BackgroundJob.objects.get(pk=job_id)
+
+
+def _owned(job):
+    # 只更新仍由本 worker 执行的任务：任务被当作丢失放回队列、由其他 worker 领取后，原 worker 的更新不再生效
+    return BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.STATUS_RUNNING, worker=job.worker)
+
+
+def requeue_job(job):
+    """worker 退出时把执行中的任务放回队列，由其他 worker 重新执行"""
+    return _owned(job).update(
+        status=BackgroundJob.STATUS_PENDING, started_at=None, worker=None, heartbeat_at=None
+    ) == 1
+
+
+def requeue_lost_jobs(dead_workers=()):
+    """把 worker 已退出（dead_workers 为 worker_name 列表）或心跳超时的执行中任务放回队列，返回任务数"""
+    timeout = getattr(settings, 'BACKGROUND_JOB_HEARTBEAT_TIMEOUT', 60)
+    deadline = timezone.now() - timedelta(seconds=timeout)
+    # 没有心跳时间的是升级前领取的任务，按开始时间判断
+    lost = models.Q(heartbeat_at__lt=deadline) | models.Q(heartbeat_at__isnull=True, started_at__lt=deadline)
+    if dead_workers:
+        lost |= models.Q(worker__in=list(dead_workers))
+    return BackgroundJob.objects.filter(lost, status=BackgroundJob.STATUS_RUNNING).update(
+        status=BackgroundJob.STATUS_PENDING, started_at=None, worker=None, heartbeat_at=None
+    )
+
+
+@contextlib.contextmanager
+def heartbeat(job):
+    """任务执行期间在后台线程中定期更新心跳时间"""
+    interval = getattr(settings, 'BACKGROUND_JOB_HEARTBEAT_INTERVAL', 10)
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(interval):
+                if not _owned(job).update(heartbeat_at=timezone.now()):
+                    break
+        finally:
+            # 线程自己的数据库连接
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def is_cancellable(job):
+    return job.job_type in CANCELLABLE_JOB_TYPES
+
+
+def cancel_job(job):
+    """取消待执行或执行中的任务，执行中的任务在下一次汇报进度时停止；返回是否取消成功"""
+    if not is_cancellable(job):
+        return False
+    return BackgroundJob.objects.filter(
+        pk=job.pk, status__in=[BackgroundJob.STATUS_PENDING, BackgroundJob.STATUS_RUNNING]
+    ).update(status=BackgroundJob.STATUS_CANCELLED, finished_at=timezone.now()) == 1
+
+
+def update_progress(job, progress, total=None):
+    """更新任务进度；任务已不处于执行中（被取消）时抛出 JobCancelled"""
+    job.progress = progress
+    fields = {'progress': progress}
+    if total is not None:
+        job.total = fields['total'] = total
+    updated = _owned(job).update(heartbeat_at=timezone.now(), **fields)
+    if not updated:
+        raise JobCancelled()
+
+
+def _finish(job, status, **fields):
+    _owned(job).update(
+        status=status, finished_at=timezone.now(), **fields
+    )
+
+
+def run_job(job):
+    """执行已领取的任务"""
+    handler = JOB_HANDLERS.get(job.job_type)
+    if handler is None:
+        _finish(job, BackgroundJob.STATUS_FAILED, message=f'未知的任务类型: {job.job_type}')
+        return
+    try:
+        result = handler(job, **job.params)
+    except JobCancelled:
+        logger.info("任务 %s 已取消", job.id)
+    except Exception as e:
+        logger.exception("任务 %s 执行失败", job.id)
+        _finish(job, BackgroundJob.STATUS_FAILED, message=str(e))
+    else:
+        _finish(job, BackgroundJob.STATUS_SUCCEEDED, result=result)
+
+
+# ---------------------------------------------------------------------------
+# 级联删除
+# ---------------------------------------------------------------------------
+
+def _cascade_plan(model, lookup='', seen=()):
+    """
+    按“叶子表在前”的顺序列出需要级联删除的 (模型, 过滤路径)，
+    如删除模板分类：DataTable(data_template__category) ... DataTemplate(category)
+    """
+    plan = []
+    for rel in model._meta.related_objects:
+        if rel.many_to_many or rel.on_delete is not models.CASCADE or rel.related_model in seen:
+            continue
+        path = f'{rel.field.name}__{lookup}' if lookup else rel.field.name
+        plan.extend(_cascade_plan(rel.related_model, path, seen + (model,)))
+        plan.append((rel.related_model, path))
+    return plan
+
+
+def schedule_delete(instance, **params):
+    """隐藏对象并提交后台级联删除任务"""
+    model = type(instance)
+    with transaction.atomic():
+        model.all_objects.filter(pk=instance.pk).update(pending_delete=True)
+        # 对象立即从查询结果中隐藏，相关缓存随之失效
+        bump_on_commit(model._meta.db_table)
+        return enqueue_job('cascade_delete', {'model': model._meta.label, 'pk': instance.pk, **params})
+
+
+def find_resumable_delete(instance):
+    """对象上次失败的级联删除任务；删除任务仍在等待或执行中时返回 None"""
+    job = (
+        BackgroundJob.objects.filter(
+            job_type='cascade_delete', params__model=type(instance)._meta.label, params__pk=instance.pk
+        ).order_by('-id').first()
+    )
+    if job and job.status in (BackgroundJob.STATUS_FAILED, BackgroundJob.STATUS_CANCELLED):
+        return job
+    return None
+
+
+@register_job('cascade_delete')
+def cascade_delete(job, model, pk, orphan_identity_id=None):
+    """
+    分块删除对象的全部关联数据，再删除对象本身。
+    orphan_identity_id：删除病例后，若该患者已没有其他病例则一并删除患者
+    """
+    model = apps.get_model(model)
+    chunk_size = getattr(settings, 'BACKGROUND_DELETE_CHUNK_SIZE', 1000)
+    plan = _cascade_plan(model)
+
+    total = 1 + sum(rel_model._base_manager.filter(**{path: pk}).count() for rel_model, path in plan)
+    deleted = 0
+    update_progress(job, deleted, total)
+
+    for rel_model, path in plan:
+        queryset = rel_model._base_manager.filter(**{path: pk})
+        while True:
+            ids = list(queryset.order_by().values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            # 每块一个短事务，其他写入者不会被长时间阻塞
+            with transaction.atomic():
+                deleted += rel_model._base_manager.filter(pk__in=ids).delete()[0]
+            update_progress(job, deleted)
+
+    with transaction.atomic():
+        # 此时关联数据已清空，级联收集只会处理任务执行期间新写入的少量数据
+        deleted += model._base_manager.filter(pk=pk).delete()[0]
+        if orphan_identity_id and not Case.all_objects.filter(identity_id=orphan_identity_id).exists():
+            deleted += Identity.objects.filter(identity_id=orphan_identity_id).delete()[0]
+    # 总数是预估值（不含孤立患者及执行期间新写入的数据）
+    update_progress(job, deleted, max(total, deleted))
+
+    bump_cache_version(model._meta.db_table, *{rel_model._meta.db_table for rel_model, _ in plan})
+    return {'deleted': deleted}
+
+
+# ---------------------------------------------------------------------------
+# 词条合并
+# ---------------------------------------------------------------------------
+
+MERGE_KEEP_TARGET = 'keep_target'
+MERGE_KEEP_SOURCE = 'keep_source'
+MERGE_POLICIES = [
+    (MERGE_KEEP_TARGET, '冲突时保留目标词条的数据'),
+    (MERGE_KEEP_SOURCE, '冲突时保留源词条的数据'),
+]
+
+
+def schedule_merge(source, target, policy):
+    """隐藏源词条（不再接受新数据）并提交合并任务"""
+    with transaction.atomic():
+        Dictionary.all_objects.filter(pk=source.pk).update(pending_delete=True)
+        bump_on_commit(Dictionary._meta.db_table)
+        return enqueue_job('merge_dictionary', {'source_id': source.pk, 'target_id': target.pk, 'policy': policy})
+
+
+def find_resumable_merge(source):
+    """源词条上次失败或被取消的合并任务"""
+    job = (
+        BackgroundJob.objects.filter(job_type='merge_dictionary', params__source_id=source.pk)
+        .order_by('-id').first()
+    )
+    if job and job.status in (BackgroundJob.STATUS_FAILED, BackgroundJob.STATUS_CANCELLED):
+        return job
+    return None
+
+
+def _merge_chunk(source_id, target_id, policy, rows):
+    """合并一块源词条数据，返回 (改指向的行数, 因冲突删除的行数)"""
+    keys = {(case_id, template_id, check_time): pk for pk, case_id, template_id, check_time in rows}
+    conflicts = {
+        (case_id, template_id, check_time): pk
+        for pk, case_id, template_id, check_time in DataTable.objects.filter(
+            dictionary_id=target_id,
+            case_id__in={key[0] for key in keys},
+            data_template_id__in={key[1] for key in keys},
+            check_time__in={key[2] for key in keys},
+        ).values_list('id', 'case_id', 'data_template_id', 'check_time')
+        if (case_id, template_id, check_time) in keys
+    }
+    if policy == MERGE_KEEP_SOURCE:
+        drop_ids = list(conflicts.values())
+        move_ids = list(keys.values())
+    else:
+        drop_ids = [keys[key] for key in conflicts]
+        move_ids = [pk for key, pk in keys.items() if key not in conflicts]
+
+    with transaction.atomic():
+        dropped = DataTable.objects.filter(pk__in=drop_ids).delete()[0] if drop_ids else 0
+        moved = DataTable.objects.filter(pk__in=move_ids).update(dictionary_id=target_id) if move_ids else 0
+        touch_cases(key[0] for key in keys)
+    return moved, dropped
+
+
+@register_job('merge_dictionary', cancellable=True)
+def merge_dictionary(job, source_id, target_id, policy=MERGE_KEEP_TARGET):
+    """把源词条的数据按块合并到目标词条，最后删除源词条"""
+    chunk_size = getattr(settings, 'BACKGROUND_DELETE_CHUNK_SIZE', 1000)
+    source_rows = DataTable.objects.filter(dictionary_id=source_id)
+
+    total = source_rows.count()
+    moved = dropped = 0
+    update_progress(job, 0, total)
+
+    while True:
+        rows = list(
+            source_rows.order_by('id')
+            .values_list('id', 'case_id', 'data_template_id', 'check_time')[:chunk_size]
+        )
+        if not rows:
+            break
+        chunk_moved, chunk_dropped = _merge_chunk(source_id, target_id, policy, rows)
+        moved += chunk_moved
+        dropped += chunk_dropped
+        update_progress(job, moved + dropped)
+
+    with transaction.atomic():
+        # 模板词条关系：模板已包含目标词条时删除源词条关系，否则改指向目标词条
+        # 先取出 id 列表：MySQL 不允许 DELETE 的子查询读取同一张表
+        template_ids = list(
+            DataTemplateDictionary.objects.filter(dictionary_id=target_id).values_list('data_template_id', flat=True)
+        )
+        DataTemplateDictionary.objects.filter(dictionary_id=source_id, data_template_id__in=template_ids).delete()
+        DataTemplateDictionary.objects.filter(dictionary_id=source_id).update(dictionary_id=target_id)
+        # 此时源词条已没有关联数据
+        Dictionary.all_objects.filter(pk=source_id).delete()
+    update_progress(job, moved + dropped, max(total, moved + dropped))
+
+    bump_cache_version('data_table', 'data_template_dictionary', 'dictionary')
+    return {'moved': moved, 'dropped': dropped}
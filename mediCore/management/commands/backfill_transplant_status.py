@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from mediCore.models import Case
+
+TRANSPLANT_FIELDS = ['transplanted', 'transplant_date', 'in_transplant_queue']
+
+
+class Command(BaseCommand):
+    help = '分批解析 has_transplant_surgery / is_in_transplant_queue 文本，回填结构化移植字段'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批处理的记录数')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        total = updated = 0
+        unparsed = []
+        last_id = 0
+        while True:
+            cases = list(
+                Case.objects.filter(id__gt=last_id).order_by('id')
+                .only('id', 'case_code', 'has_transplant_surgery', 'is_in_transplant_queue', *TRANSPLANT_FIELDS)
+                [:chunk_size]
+            )
+            if not cases:
+                break
+            changed = []
+            for case in cases:
+                if case.sync_transplant_status():
+                    changed.append(case)
+                # 填写了内容却无法识别的文本，供人工核对
+                if case.transplanted is None and case.has_transplant_surgery not in (None, '', '未填写'):
+                    unparsed.append(f'{case.case_code}: {case.has_transplant_surgery}')
+            Case.objects.bulk_update(changed, TRANSPLANT_FIELDS)
+            last_id = cases[-1].id
+            total += len(cases)
+            updated += len(changed)
+
+        for line in unparsed:
+            self.stdout.write(self.style.WARNING(f'无法解析的移植手术文本 {line}'))
+        self.stdout.write(self.style.SUCCESS(f'已处理 {total} 个病例，更新 {updated} 个'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mediCore.importer import IMPORT_FORMATS, read_rows, import_cases
+
+
+class Command(BaseCommand):
+    help = '从 CSV 或 NDJSON 文件批量导入病例'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='导入文件路径')
+        parser.add_argument('--format', dest='file_format', choices=IMPORT_FORMATS, help='文件格式，默认按扩展名判断')
+        parser.add_argument('--archive-code', action='append', default=[], help='所有病例都要关联的档案编号，可重复')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写入的记录数')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or path.rsplit('.', 1)[-1].lower().replace('jsonl', 'ndjson')
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError('只支持CSV或NDJSON文件格式，请通过 --format 指定')
+
+        started = time.monotonic()
+        with open(path, 'rb') as file:
+            try:
+                result = import_cases(
+                    read_rows(file, file_format),
+                    archive_codes=options['archive_code'],
+                    batch_size=options['batch_size']
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"第{error['line']}行导入失败: {'；'.join(error['errors'])}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"成功导入{result['success_count']}条病例，失败{result['error_count']}条，"
+            f"耗时 {time.monotonic() - started:.1f} 秒"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from mediCore.models import Case, Identity
+from mediCore import search
+
+
+class Command(BaseCommand):
+    help = '分批重建病例和患者的检索词元索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批处理的记录数')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        total = 0
+        last_id = 0
+        while True:
+            cases = list(Case.objects.filter(id__gt=last_id).order_by('id')[:chunk_size])
+            if not cases:
+                break
+            search.index_cases(cases)
+            last_id = cases[-1].id
+            total += len(cases)
+        self.stdout.write(f'已重建 {total} 个病例的检索词元')
+
+        total = 0
+        last_id = ''
+        while True:
+            identities = list(Identity.objects.filter(identity_id__gt=last_id).order_by('identity_id')[:chunk_size])
+            if not identities:
+                break
+            search.index_identities(identities)
+            last_id = identities[-1].identity_id
+            total += len(identities)
+        self.stdout.write(self.style.SUCCESS(f'已重建 {total} 个患者的检索词元'))
@@ -0,0 +1,102 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from mediCore.exports import remove_expired_exports
+from mediCore.jobs import claim_next_job, heartbeat, requeue_job, requeue_lost_jobs, run_job, worker_name
+
+# 主进程清理过期导出文件的间隔（秒）
+CLEANUP_INTERVAL = 3600
+
+
+def _raise_exit(signum, frame):
+    raise SystemExit(0)
+
+
+class Command(BaseCommand):
+    help = '执行后台任务（级联删除、导出等），启动多个 worker 进程并在进程退出后自动重启'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='在当前进程中执行完所有待执行任务后退出')
+        parser.add_argument('--interval', type=float, default=None, help='无任务时的轮询间隔（秒）')
+        parser.add_argument('--processes', type=int, default=None, help='worker 进程数')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'BACKGROUND_JOB_POLL_INTERVAL', 2)
+        if options['once']:
+            self.work(interval, once=True)
+            return
+        processes = options['processes'] or getattr(settings, 'BACKGROUND_JOB_PROCESSES', 2)
+        self.supervise(processes, interval)
+
+    def work(self, interval, once=False):
+        """轮询领取并执行任务；收到 SIGTERM 时把正在执行的任务放回队列后退出"""
+        signal.signal(signal.SIGTERM, _raise_exit)
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(interval)
+                continue
+            self.stdout.write(f'开始执行任务 {job.id} {job.job_type}')
+            try:
+                with heartbeat(job):
+                    run_job(job)
+            except BaseException:
+                requeue_job(job)
+                raise
+            job.refresh_from_db()
+            self.stdout.write(f'任务 {job.id} 结束: {job.get_status_display()}')
+
+    def supervise(self, processes, interval):
+        """
+        启动 worker 进程池，进程意外退出时重启并把其执行中的任务放回队列，
+        定期把心跳超时（其他主机上的 worker 丢失）的任务放回队列，并清理过期的导出文件
+        """
+        context = multiprocessing.get_context('fork')
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+        signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+        def start():
+            # 子进程不能复用父进程的数据库连接
+            connections.close_all()
+            process = context.Process(target=self.work, args=(interval,), daemon=True)
+            process.start()
+            return process
+
+        workers = [start() for _ in range(processes)]
+        self.stdout.write(f'已启动 {processes} 个 worker 进程')
+        heartbeat_timeout = getattr(settings, 'BACKGROUND_JOB_HEARTBEAT_TIMEOUT', 60)
+        last_cleanup = last_lost_check = None
+        while not stopping:
+            dead_workers = []
+            for index, process in enumerate(workers):
+                if not process.is_alive():
+                    self.stderr.write(f'worker 进程 {process.pid} 已退出（{process.exitcode}），重新启动')
+                    dead_workers.append(worker_name(process.pid))
+                    workers[index] = start()
+            if dead_workers or last_lost_check is None or time.monotonic() - last_lost_check >= heartbeat_timeout / 2:
+                close_old_connections()
+                requeued = requeue_lost_jobs(dead_workers)
+                if requeued:
+                    self.stderr.write(f'已把 {requeued} 个 worker 丢失的任务放回队列')
+                last_lost_check = time.monotonic()
+            if last_cleanup is None or time.monotonic() - last_cleanup >= CLEANUP_INTERVAL:
+                removed = remove_expired_exports()
+                if removed:
+                    self.stdout.write(f'已清理 {removed} 个过期导出文件')
+                last_cleanup = time.monotonic()
+            time.sleep(1)
+
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
+        self.stdout.write('worker 进程已全部退出')
@@ -0,0 +1,143 @@
+import gc
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from utils.cache import is_process_local
+from utils.mysql_pool.pool import close_pools, fill_pools
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # 未安装 gunicorn 时只能使用 runserver
+    BaseApplication = None
+
+
+def _default_workers():
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def _post_worker_init(worker):
+    # worker 启动后即打开连接池的最小连接数，首批请求无需等待建立连接
+    fill_pools()
+
+
+class Command(BaseCommand):
+    help = (
+        '生产模式启动：gunicorn 多进程（预加载应用并预热后 fork worker），'
+        'worker 处理一定数量请求后自动重启；kill -HUP 主进程平滑重启 worker，'
+        '代码更新后需重启主进程（预加载的代码不会随 HUP 重新加载）。数据库迁移请单独执行 migrate。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default=None, help='监听地址，默认 SERVE_BIND')
+        parser.add_argument('--workers', type=int, default=None, help='worker 进程数，默认 SERVE_WORKERS（CPU 核数 * 2 + 1）')
+        parser.add_argument('--threads', type=int, default=None, help='每个 worker 的线程数，默认 SERVE_THREADS')
+        parser.add_argument('--max-requests', type=int, default=None, help='worker 处理多少请求后重启，默认 SERVE_MAX_REQUESTS')
+        parser.add_argument('--pidfile', default=None, help='主进程 pid 文件，便于发送 HUP 等信号')
+
+    def handle(self, *args, **options):
+        if BaseApplication is None:
+            raise CommandError('未安装 gunicorn，请先执行 poetry install')
+        if settings.DEBUG:
+            self.stderr.write('警告：DEBUG 已开启（每个请求的 SQL 都会保存在内存中），生产环境请设置 DJANGO_DEBUG=0')
+
+        max_requests = options['max_requests'] or getattr(settings, 'SERVE_MAX_REQUESTS', 1000)
+        workers = options['workers'] or getattr(settings, 'SERVE_WORKERS', None) or _default_workers()
+        threads = options['threads'] or getattr(settings, 'SERVE_THREADS', 4)
+        self.check_shared_cache(workers)
+        self.check_pool_size(threads)
+        config = {
+            'bind': options['bind'] or getattr(settings, 'SERVE_BIND', '0.0.0.0:8000'),
+            'workers': workers,
+            'worker_class': 'gthread',
+            'threads': threads,
+            'preload_app': True,
+            'max_requests': max_requests,
+            # 随机抖动，避免所有 worker 同时重启
+            'max_requests_jitter': max(max_requests // 10, 1) if max_requests else 0,
+            'timeout': getattr(settings, 'SERVE_TIMEOUT', 120),
+            'graceful_timeout': getattr(settings, 'SERVE_GRACEFUL_TIMEOUT', 30),
+            'keepalive': 5,
+            'accesslog': '-',
+            'errorlog': '-',
+            'pidfile': options['pidfile'],
+            'post_worker_init': _post_worker_init,
+        }
+        self.stdout.write(
+            f"启动 gunicorn：{config['bind']}，{config['workers']} 个 worker × {config['threads']} 线程，"
+            f"每个 worker 处理 {max_requests} 个请求后重启"
+        )
+        DjangoApplication({key: value for key, value in config.items() if value is not None}).run()
+
+    def check_shared_cache(self, workers):
+        """
+        缓存版本号和响应缓存需为各进程共享的后端：进程内缓存（locmem）下，一个 worker（或 run_jobs）
+        更换版本号后，其他 worker 仍按旧版本号返回缓存的响应和 ETag，直到兜底过期时间。
+        多个 worker 或后台任务在其他进程执行时，关闭响应缓存和 ETag
+        """
+        aliases = {
+            'default', getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default'), getattr(settings, 'CACHE_VERSION_ALIAS', 'default')
+        }
+        if workers == 1 and getattr(settings, 'BACKGROUND_JOBS_EAGER', False):
+            return
+        if not any(is_process_local(alias) for alias in aliases):
+            return
+        if getattr(settings, 'RESPONSE_CACHE_ENABLED', True) or getattr(settings, 'CONDITIONAL_GET_ENABLED', True):
+            self.stderr.write(
+                '警告：缓存为进程内缓存（locmem），多个进程之间无法同步缓存版本号，已关闭响应缓存和 ETag；'
+                '请设置 DJANGO_CACHE_DIR 或配置 Redis / Memcached'
+            )
+        # 预加载应用前修改，fork 出的 worker 继承
+        settings.RESPONSE_CACHE_ENABLED = False
+        settings.CONDITIONAL_GET_ENABLED = False
+
+    def check_pool_size(self, threads):
+        """
+        每个 worker 最多同时占用 请求线程数 + CASE_QUERY_MAX_WORKERS（异步查询线程池，进程内共享）个连接，
+        连接池 MAX_SIZE 小于该值时调大，避免并发查询等待连接超时
+        """
+        query_workers = getattr(settings, 'CASE_QUERY_MAX_WORKERS', 8)
+        required = threads + query_workers
+        for alias, settings_dict in connections.settings.items():
+            pool = settings_dict.get('POOL')
+            if pool is None or pool.get('MAX_SIZE', 10) >= required:
+                continue
+            self.stderr.write(
+                f"警告：数据库 {alias} 的连接池 MAX_SIZE={pool.get('MAX_SIZE', 10)} 小于 "
+                f"线程数 {threads} + CASE_QUERY_MAX_WORKERS {query_workers}，已调整为 {required}"
+            )
+            # 连接池在预加载应用时才创建，fork 出的 worker 继承
+            settings_dict['POOL'] = {**pool, 'MAX_SIZE': required}
+
+
+if BaseApplication is not None:
+    class DjangoApplication(BaseApplication):
+        """在主进程中加载并预热 Django 应用，再 fork worker"""
+
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from django.core.wsgi import get_wsgi_application
+            from mediCore.warmup import warm_up
+
+            # 预热期间产生的对象移入永久代，fork 后垃圾回收不再扫描（写入）它们，
+            # worker 与主进程共享的内存页不会因此被复制
+            gc.disable()
+            try:
+                application = get_wsgi_application()
+                warm_up()
+                # 连接池中的空闲连接不能被 worker 继承
+                close_pools()
+                gc.freeze()
+            finally:
+                # 加载或预热失败时同样恢复垃圾回收
+                gc.enable()
+            return application
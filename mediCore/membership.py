@@ -0,0 +1,97 @@
+"""
+档案病例关联的批量维护
+
+按块处理病例：每块一条 INSERT IGNORE ... SELECT（已存在的关联直接忽略）或一条 DELETE ... IN，
+每块单独提交，不在一个长事务中锁住整个档案；全部完成后统一使相关统计缓存失效一次。
+"""
+from django.conf import settings
+from django.db import connections, router
+from django.db.models.constants import OnConflict
+
+from utils.cache import bump_cache_version
+from .filters import filter_cases
+from .models import ArchiveCase, Case
+from .search import search_cases
+
+# 关联变更后需要失效的缓存（分页总数、分面统计等按表名维护版本号）
+MEMBERSHIP_CACHE_TABLES = ['archive_case']
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _chunk_size():
+    return getattr(settings, 'ARCHIVE_MEMBERSHIP_CHUNK_SIZE', 1000)
+
+
+def iter_case_code_chunks(case_codes, not_found):
+    """按块把病例编号解析为病例 id，找不到的编号追加到 not_found"""
+    case_codes = list(dict.fromkeys(case_codes))
+    for chunk in _chunks(case_codes, _chunk_size()):
+        found = dict(Case.objects.filter(case_code__in=chunk).values_list('case_code', 'id'))
+        not_found.extend(code for code in chunk if code not in found)
+        if found:
+            yield list(found.values())
+
+
+def iter_filtered_case_chunks(params):
+    """按筛选条件（与病例列表参数相同）分块取病例 id，按主键键集翻页"""
+    queryset = filter_cases(Case.objects.all(), params)
+    if params.get('search'):
+        # 检索结果本身有条数上限，直接取出
+        ids = list(search_cases(queryset, params['search']).values_list('id', flat=True))
+        yield from _chunks(ids, _chunk_size())
+        return
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:_chunk_size()]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def _insert_links(connection, archive_id, case_ids):
+    """INSERT IGNORE 一块关联，返回实际新增的行数"""
+    ops = connection.ops
+    fields = [ArchiveCase._meta.get_field('archive'), ArchiveCase._meta.get_field('case')]
+    suffix = ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)
+    sql = '{} {} ({}, {}) SELECT %s, {} FROM {} WHERE {} IN ({}) {}'.format(
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        ops.quote_name(ArchiveCase._meta.db_table),
+        ops.quote_name('archive_id'), ops.quote_name('case_id'),
+        ops.quote_name('id'), ops.quote_name(Case._meta.db_table), ops.quote_name('id'),
+        ', '.join(['%s'] * len(case_ids)),
+        suffix,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [archive_id] + list(case_ids))
+        return cursor.rowcount
+
+
+def add_archive_cases(archive, case_id_chunks):
+    """批量把病例加入档案，返回新增的关联数"""
+    connection = connections[router.db_for_write(ArchiveCase)]
+    added = 0
+    try:
+        for case_ids in case_id_chunks:
+            added += _insert_links(connection, archive.id, case_ids)
+    finally:
+        bump_cache_version(*MEMBERSHIP_CACHE_TABLES)
+    return added
+
+
+def remove_archive_cases(archive, case_id_chunks):
+    """批量把病例移出档案，返回删除的关联数"""
+    removed = 0
+    try:
+        for case_ids in case_id_chunks:
+            # ArchiveCase 无级联和信号，delete() 直接执行一条 DELETE ... IN
+            removed += ArchiveCase.objects.filter(archive=archive, case_id__in=case_ids).delete()[0]
+    finally:
+        bump_cache_version(*MEMBERSHIP_CACHE_TABLES)
+    return removed
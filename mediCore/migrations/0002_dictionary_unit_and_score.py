@@ -0,0 +1,43 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dictionary',
+            name='has_unit',
+            field=models.BooleanField(default=False, help_text='是否有单位 0-无 1-有'),
+        ),
+        migrations.AddField(
+            model_name='dictionary',
+            name='is_score',
+            field=models.BooleanField(default=False, help_text='是否为评分词条 0-不是 1-是'),
+        ),
+        migrations.AddField(
+            model_name='dictionary',
+            name='score_func',
+            field=models.TextField(blank=True, help_text='评分计算方式', null=True),
+        ),
+        migrations.AddField(
+            model_name='dictionary',
+            name='unit',
+            field=models.CharField(blank=True, help_text='词条单位', max_length=32, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dictionary',
+            name='input_type',
+            field=models.CharField(blank=True, choices=[('single', '单选'), ('multi', '多选'), ('text', '填空'), ('date', '日期'), ('single_with_other', '单选+其他项'), ('single_with_date', '单选+日期'), ('multi_with_date', '多选+日期'), ('multi_with_text', '多选+填空'), ('hierarchical_select', '多级选择')], default='text', max_length=32, null=True, verbose_name='填写方式'),
+        ),
+        migrations.AlterField(
+            model_name='dictionary',
+            name='word_apply',
+            field=models.CharField(blank=True, help_text='词条应用', max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0002_dictionary_unit_and_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseSearchToken',
+            fields=[
+                ('id', models.AutoField(help_text='自增主键', primary_key=True, serialize=False)),
+                ('token', models.CharField(help_text='词元', max_length=8)),
+                ('case', models.ForeignKey(db_column='case_id', help_text='病例id', on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='mediCore.case')),
+            ],
+            options={
+                'verbose_name': '病例检索词元',
+                'verbose_name_plural': '病例检索词元表',
+                'db_table': 'case_search_token',
+                'unique_together': {('token', 'case')},
+            },
+        ),
+        migrations.CreateModel(
+            name='IdentitySearchToken',
+            fields=[
+                ('id', models.AutoField(help_text='自增主键', primary_key=True, serialize=False)),
+                ('token', models.CharField(help_text='词元', max_length=8)),
+                ('identity', models.ForeignKey(db_column='identity_id', help_text='身份证号', on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='mediCore.identity')),
+            ],
+            options={
+                'verbose_name': '患者检索词元',
+                'verbose_name_plural': '患者检索词元表',
+                'db_table': 'identity_search_token',
+                'unique_together': {('token', 'identity')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0003_search_tokens'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivecase',
+            index=models.Index(fields=['case', 'archive'], name='idx_case_archive'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['gender', 'birth_date'], name='idx_case_gender_birth'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['blood_type', 'birth_date'], name='idx_case_blood_birth'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['birth_date'], name='idx_case_birth_date'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0004_case_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='case',
+            name='in_transplant_queue',
+            field=models.BooleanField(blank=True, help_text='是否在移植排队 0-否 1-是', null=True),
+        ),
+        migrations.AddField(
+            model_name='case',
+            name='transplant_date',
+            field=models.DateField(blank=True, help_text='移植手术日期', null=True),
+        ),
+        migrations.AddField(
+            model_name='case',
+            name='transplanted',
+            field=models.BooleanField(blank=True, help_text='是否行移植手术 0-否 1-是', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['transplanted', 'transplant_date'], name='idx_case_transplant'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['in_transplant_queue'], name='idx_case_transplant_queue'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0005_case_transplant_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archive',
+            name='pending_delete',
+            field=models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据'),
+        ),
+        migrations.AddField(
+            model_name='case',
+            name='pending_delete',
+            field=models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据'),
+        ),
+        migrations.AddField(
+            model_name='datatemplate',
+            name='pending_delete',
+            field=models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据'),
+        ),
+        migrations.AddField(
+            model_name='datatemplatecategory',
+            name='pending_delete',
+            field=models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据'),
+        ),
+        migrations.AddField(
+            model_name='dictionary',
+            name='pending_delete',
+            field=models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据'),
+        ),
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.AutoField(help_text='任务id', primary_key=True, serialize=False)),
+                ('job_type', models.CharField(help_text='任务类型', max_length=64)),
+                ('params', models.JSONField(default=dict, help_text='任务参数')),
+                ('status', models.CharField(choices=[('pending', '等待执行'), ('running', '执行中'), ('succeeded', '已完成'), ('failed', '失败'), ('cancelled', '已取消')], default='pending', help_text='任务状态', max_length=16)),
+                ('progress', models.BigIntegerField(default=0, help_text='已处理数量')),
+                ('total', models.BigIntegerField(blank=True, help_text='预计总数量', null=True)),
+                ('message', models.TextField(blank=True, help_text='错误信息', null=True)),
+                ('result', models.JSONField(blank=True, help_text='任务结果', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, help_text='开始时间', null=True)),
+                ('finished_at', models.DateTimeField(blank=True, help_text='结束时间', null=True)),
+            ],
+            options={
+                'verbose_name': '后台任务',
+                'verbose_name_plural': '后台任务表',
+                'db_table': 'background_job',
+                'indexes': [models.Index(fields=['status', 'id'], name='idx_job_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0006_background_jobs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datatable',
+            index=models.Index(fields=['case', 'data_template', 'check_time'], name='idx_data_case_template_time'),
+        ),
+    ]
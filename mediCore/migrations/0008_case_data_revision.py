@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0007_data_table_case_template_time_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='case',
+            name='data_revision',
+            field=models.PositiveBigIntegerField(default=0, help_text='检查数据修订号'),
+        ),
+    ]
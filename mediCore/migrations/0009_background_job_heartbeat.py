@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0008_case_data_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='worker',
+            field=models.CharField(blank=True, help_text='执行任务的 worker（主机名:进程号）', max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='worker 最近一次心跳时间', null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-19 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0009_background_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeSequence',
+            fields=[
+                ('name', models.CharField(help_text='计数器名称', max_length=32, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0, help_text='已分配的最大序号')),
+            ],
+            options={
+                'verbose_name': '编号计数器',
+                'verbose_name_plural': '编号计数器表',
+                'db_table': 'code_sequence',
+            },
+        ),
+    ]
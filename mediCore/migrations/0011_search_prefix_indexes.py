@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-20 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0010_code_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['opd_id'], name='idx_case_opd_id'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['inhospital_id'], name='idx_case_inhospital_id'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['name'], name='idx_case_name'),
+        ),
+        migrations.AddIndex(
+            model_name='identity',
+            index=models.Index(fields=['name'], name='idx_identity_name'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-20 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0011_search_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datatable',
+            index=models.Index(fields=['case', 'check_time'], name='idx_data_case_time'),
+        ),
+    ]
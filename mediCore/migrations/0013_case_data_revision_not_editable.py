@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-20 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediCore', '0012_data_table_case_time_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='case',
+            name='data_revision',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='检查数据修订号'),
+        ),
+    ]
@@ -1,3 +1,6 @@
+import re
+from datetime import date
+
 from django.db import models
 
 # 性别映射
@@ -5,6 +8,54 @@ GENDER_CHOICES = [
     (0, '女'),
     (1, '男'),
 ]
+
+# 移植状态文本解析，如 是(2025-5-27)、是（2025年5月27日）、否、未填写
+# 取去掉日期后的第一个词整词匹配，如 "有待确认"、"10"、"n/a" 等无法确定的文本解析为 None
+TRANSPLANT_UNKNOWN_TEXTS = ('', '未填写', '未知', '不详', '-')
+TRANSPLANT_YES_TOKENS = frozenset({'是', '有', '已', '已移植', '已手术', 'y', 'yes', 'true', '1'})
+TRANSPLANT_NO_TOKENS = frozenset({'否', '无', '未', '未移植', '未手术', 'n', 'no', 'false', '0'})
+TRANSPLANT_DATE_PATTERN = re.compile(r'(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?')
+TRANSPLANT_TOKEN_SEPARATOR = re.compile(r'[\s()（）\[\]【】,，、;；:：。]+')
+
+
+def parse_yes_no(text):
+    """是/否文本转为布尔值，无法识别或未填写返回 None"""
+    text = str(text).strip().lower() if text is not None else ''
+    if text in TRANSPLANT_UNKNOWN_TEXTS:
+        return None
+    words = TRANSPLANT_TOKEN_SEPARATOR.split(TRANSPLANT_DATE_PATTERN.sub(' ', text))
+    token = next((word for word in words if word), '')
+    if token in TRANSPLANT_YES_TOKENS:
+        return True
+    if token in TRANSPLANT_NO_TOKENS:
+        return False
+    return None
+
+
+def parse_transplant_surgery(text):
+    """解析移植手术文本，返回 (是否移植, 手术日期)，如 是(2025-5-27) -> (True, date(2025, 5, 27))"""
+    transplanted = parse_yes_no(text)
+    surgery_date = None
+    match = TRANSPLANT_DATE_PATTERN.search(str(text)) if text else None
+    if match:
+        try:
+            surgery_date = date(*map(int, match.groups()))
+        except ValueError:
+            surgery_date = None
+        # 只写了日期也视为已移植
+        if transplanted is None and surgery_date:
+            transplanted = True
+    if not transplanted:
+        surgery_date = None
+    return transplanted, surgery_date
+
+class PendingDeleteManager(models.Manager):
+    """默认管理器：排除已提交删除、等待后台任务清理的对象（pending_delete=True）"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(pending_delete=False)
+
+
 # 系统词条
 class Dictionary(models.Model):
     id = models.AutoField(primary_key=True, help_text='词条id')
@@ -41,6 +92,11 @@ class Dictionary(models.Model):
     is_score = models.BooleanField(default=False, help_text='是否为评分词条 0-不是 1-是')
     score_func = models.TextField(null=True, blank=True, help_text='评分计算方式')
 
+    pending_delete = models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据')
+
+    objects = PendingDeleteManager()
+    all_objects = models.Manager()
+
     class Meta:
         db_table = 'dictionary'
         verbose_name = '系统词条'
@@ -54,6 +110,11 @@ class DataTemplateCategory(models.Model):
     id = models.AutoField(primary_key=True, help_text='模板分类id')
     name = models.CharField(max_length=255, help_text='模板分类名称')
 
+    pending_delete = models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据')
+
+    objects = PendingDeleteManager()
+    all_objects = models.Manager()
+
     class Meta:
         db_table = 'data_template_category'
         verbose_name = '数据模板分类'
@@ -81,6 +142,11 @@ class DataTemplate(models.Model):
         related_name='data_templates'
     )
 
+    pending_delete = models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据')
+
+    objects = PendingDeleteManager()
+    all_objects = models.Manager()
+
     class Meta:
         db_table = 'data_template'
         verbose_name = '数据模板'
@@ -128,6 +194,10 @@ class Identity(models.Model):
         db_table = 'identity'
         verbose_name = '患者身份'
         verbose_name_plural = '患者表'
+        indexes = [
+            # 检索：姓名前缀匹配（见 mediCore/search.py）
+            models.Index(fields=['name'], name='idx_identity_name'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.identity_id})"
@@ -166,6 +236,10 @@ class Case(models.Model):
         default='未填写',
         help_text='是否存在移植排队'
     )
+    # 由上面两个文本字段解析得到的结构化字段，用于按移植状态/手术日期筛选，NULL 表示未填写
+    transplanted = models.BooleanField(null=True, blank=True, help_text='是否行移植手术 0-否 1-是')
+    transplant_date = models.DateField(null=True, blank=True, help_text='移植手术日期')
+    in_transplant_queue = models.BooleanField(null=True, blank=True, help_text='是否在移植排队 0-否 1-是')
 
     # ManyToMany relationship with Archive through ArchiveCase
     archives = models.ManyToManyField(
@@ -174,17 +248,50 @@ class Case(models.Model):
         related_name='cases'
     )
 
+    pending_delete = models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据')
+    # 每次写入该病例的检查数据（DataTable）时在同一事务中加一，病例查询接口据此生成 ETag 和缓存键。
+    # 只由 versions.touch_cases 以 UPDATE ... SET data_revision = data_revision + 1 修改；
+    # 更新病例时应显式传入 update_fields，避免把内存中可能已过期的值写回导致修订号倒退
+    data_revision = models.PositiveBigIntegerField(default=0, editable=False, help_text='检查数据修订号')
+
+    objects = PendingDeleteManager()
+    all_objects = models.Manager()
+
     class Meta:
         db_table = 'case' # Explicitly set table name because 'case' is a reserved word in some SQL dbs
         verbose_name = '病例'
         verbose_name_plural = '病例表'
         indexes = [
             models.Index(fields=['identity'], name='idx_identity_id_on_case'), # Corresponds to INDEX `idx_identity_id`
+            # 分面筛选：等值条件在前，年龄（出生日期）范围在后
+            models.Index(fields=['gender', 'birth_date'], name='idx_case_gender_birth'),
+            models.Index(fields=['blood_type', 'birth_date'], name='idx_case_blood_birth'),
+            models.Index(fields=['birth_date'], name='idx_case_birth_date'),
+            # 移植队列：按是否移植 + 手术日期范围扫描
+            models.Index(fields=['transplanted', 'transplant_date'], name='idx_case_transplant'),
+            models.Index(fields=['in_transplant_queue'], name='idx_case_transplant_queue'),
+            # 检索：门诊号、住院号、姓名前缀匹配（见 mediCore/search.py）
+            models.Index(fields=['opd_id'], name='idx_case_opd_id'),
+            models.Index(fields=['inhospital_id'], name='idx_case_inhospital_id'),
+            models.Index(fields=['name'], name='idx_case_name'),
         ]
 
     def __str__(self):
         return f"病例: {self.case_code} - {self.name}"
 
+    def sync_transplant_status(self):
+        """根据移植文本字段刷新结构化字段，返回发生变化的字段名列表"""
+        transplanted, transplant_date = parse_transplant_surgery(self.has_transplant_surgery)
+        values = {
+            'transplanted': transplanted,
+            'transplant_date': transplant_date,
+            'in_transplant_queue': parse_yes_no(self.is_in_transplant_queue),
+        }
+        changed = [field for field, value in values.items() if getattr(self, field) != value]
+        for field in changed:
+            setattr(self, field, values[field])
+        return changed
+
 class DataTable(models.Model):
     id = models.AutoField(primary_key=True, help_text='自增id')
     case = models.ForeignKey(
@@ -211,6 +318,12 @@ class DataTable(models.Model):
     class Meta:
         db_table = 'data_table'
         unique_together = (('case', 'data_template', 'dictionary', 'check_time'),)
+        indexes = [
+            # 宽表导出：按病例、模板顺序读取各次检查
+            models.Index(fields=['case', 'data_template', 'check_time'], name='idx_data_case_template_time'),
+            # 病例数据流式导出：按 (case_id, check_time, id) 键集遍历（InnoDB 二级索引隐含主键）
+            models.Index(fields=['case', 'check_time'], name='idx_data_case_time'),
+        ]
         verbose_name = '数据'
         verbose_name_plural = '数据表'
 
@@ -223,6 +336,11 @@ class Archive(models.Model):
     archive_name = models.CharField(max_length=255, help_text='档案名称')
     archive_description = models.TextField(null=True, blank=True, help_text='档案描述')
 
+    pending_delete = models.BooleanField(default=False, help_text='是否已提交删除，等待后台任务清理关联数据')
+
+    objects = PendingDeleteManager()
+    all_objects = models.Manager()
+
     class Meta:
         db_table = 'archive'
         verbose_name = '专病档案'
@@ -254,6 +372,9 @@ class ArchiveCase(models.Model):
     class Meta:
         db_table = 'archive_case'
         unique_together = ('archive', 'case')
+        indexes = [
+            models.Index(fields=['case', 'archive'], name='idx_case_archive'),  # 按病例统计所属档案
+        ]
         verbose_name = '档案病例关联'
         verbose_name_plural = '档案与病例关联表'
 
@@ -288,4 +409,102 @@ class Images(models.Model): # Singular model name
         verbose_name_plural = '图片表'
 
     def __str__(self):
-        return f"Image for Case {self.case_id} - Template {self.data_template_id} ({self.url})"
\ No newline at end of file
+        return f"Image for Case {self.case_id} - Template {self.data_template_id} ({self.url})"
+
+# 检索词元（n-gram 倒排索引），由 signals 维护，见 mediCore/search.py
+class CaseSearchToken(models.Model):
+    id = models.AutoField(primary_key=True, help_text='自增主键')
+    case = models.ForeignKey(
+        Case,
+        on_delete=models.CASCADE,
+        db_column='case_id',
+        related_name='search_tokens',
+        help_text='病例id'
+    )
+    token = models.CharField(max_length=8, help_text='词元')
+
+    class Meta:
+        db_table = 'case_search_token'
+        unique_together = ('token', 'case')  # 同时作为按词元查病例的覆盖索引
+        verbose_name = '病例检索词元'
+        verbose_name_plural = '病例检索词元表'
+
+    def __str__(self):
+        return f"{self.token} -> Case {self.case_id}"
+
+
+class IdentitySearchToken(models.Model):
+    id = models.AutoField(primary_key=True, help_text='自增主键')
+    identity = models.ForeignKey(
+        Identity,
+        on_delete=models.CASCADE,
+        db_column='identity_id',
+        to_field='identity_id',
+        related_name='search_tokens',
+        help_text='身份证号'
+    )
+    token = models.CharField(max_length=8, help_text='词元')
+
+    class Meta:
+        db_table = 'identity_search_token'
+        unique_together = ('token', 'identity')
+        verbose_name = '患者检索词元'
+        verbose_name_plural = '患者检索词元表'
+
+    def __str__(self):
+        return f"{self.token} -> Identity {self.identity_id}"
+
+
+# 编号计数器：保存已分配的最大序号，分配编号时锁住计数器行，见 mediCore/importer.py 的 reserve_case_codes
+class CodeSequence(models.Model):
+    name = models.CharField(primary_key=True, max_length=32, help_text='计数器名称')
+    value = models.BigIntegerField(default=0, help_text='已分配的最大序号')
+
+    class Meta:
+        db_table = 'code_sequence'
+        verbose_name = '编号计数器'
+        verbose_name_plural = '编号计数器表'
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+# 后台任务，由 manage.py run_jobs 执行，见 mediCore/jobs.py
+class BackgroundJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '等待执行'),
+        (STATUS_RUNNING, '执行中'),
+        (STATUS_SUCCEEDED, '已完成'),
+        (STATUS_FAILED, '失败'),
+        (STATUS_CANCELLED, '已取消'),
+    ]
+
+    id = models.AutoField(primary_key=True, help_text='任务id')
+    job_type = models.CharField(max_length=64, help_text='任务类型')
+    params = models.JSONField(default=dict, help_text='任务参数')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, help_text='任务状态')
+    progress = models.BigIntegerField(default=0, help_text='已处理数量')
+    total = models.BigIntegerField(null=True, blank=True, help_text='预计总数量')
+    message = models.TextField(null=True, blank=True, help_text='错误信息')
+    result = models.JSONField(null=True, blank=True, help_text='任务结果')
+    created_at = models.DateTimeField(auto_now_add=True, help_text='创建时间')
+    started_at = models.DateTimeField(null=True, blank=True, help_text='开始时间')
+    finished_at = models.DateTimeField(null=True, blank=True, help_text='结束时间')
+    worker = models.CharField(max_length=128, null=True, blank=True, help_text='执行任务的 worker（主机名:进程号）')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text='worker 最近一次心跳时间')
+
+    class Meta:
+        db_table = 'background_job'
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务表'
+        indexes = [
+            models.Index(fields=['status', 'id'], name='idx_job_status'),  # worker 按 id 顺序领取待执行任务
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} {self.job_type} ({self.status})"
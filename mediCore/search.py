@@ -0,0 +1,273 @@
+"""
+病例/患者检索索引
+
+对身份证号、门诊号、住院号、姓名建立 n-gram 倒排索引（case_search_token / identity_search_token），
+检索分几路进行，每一路都是带 LIMIT 的索引范围扫描，取出主键后在 Python 中合并，最后按主键取回结果，
+不在大表上做 OR 子查询和逐行计算排名：
+
+1. 前缀（含完全相等）：各字段的索引上 LIKE 'q%'，每个字段最多 SEARCH_RESULT_LIMIT 条
+2. 身份证号后缀：倒序后的前 1~SUFFIX_MAX_LENGTH 个字符加 SUFFIX_PREFIX 前缀作为词元，按词元命中
+3. 包含：查询串的所有词元同时命中的候选集（最多 SEARCH_CANDIDATE_LIMIT 个）上逐行校验包含查询串；
+   词元为含非数字字符的相邻两字，纯数字按 NUMERIC_GRAM_LENGTH 位切分（两位数字几乎命中所有身份证号），
+   因此单字和不足 4 位的纯数字查询只按前缀、后缀命中
+4. 姓名拼音首字母（需安装 pypinyin），词元加 PINYIN_PREFIX 前缀以免与原文混淆；病例另外匹配档案编号
+
+排序：完全相等 > 身份证号后缀匹配 > 前缀匹配 > 包含（含拼音、档案），同档次按编号排序，最多 SEARCH_RESULT_LIMIT 条。
+前几档各自从索引上取数，不会因包含一档的候选集被截断而漏掉。
+
+索引词元的规则变化后需执行 manage.py rebuild_search_index 重建索引。
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, IntegerField, Q, Value, When
+from django.db.models import Case as CaseWhen
+
+from .models import Archive, ArchiveCase, Case, CaseSearchToken, Identity, IdentitySearchToken
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # 未安装 pypinyin 时不索引拼音首字母
+    lazy_pinyin = None
+
+PINYIN_PREFIX = '#'
+SUFFIX_PREFIX = '$'
+# 词元字段长 8，后缀词元最多 7 个字符
+SUFFIX_MAX_LENGTH = 7
+# 纯数字按 4 位切分词元
+NUMERIC_GRAM_LENGTH = 4
+
+CASE_INDEXED_FIELDS = ['identity_id', 'opd_id', 'inhospital_id', 'name']
+IDENTITY_INDEXED_FIELDS = ['identity_id', 'name']
+# 病例表上检索的列：身份证号经外键的 to_field 取值，Django 直接使用病例表的 identity_id 列，不关联患者表
+CASE_SEARCH_FIELDS = ['identity__identity_id', 'opd_id', 'inhospital_id', 'name']
+
+
+def normalize(text):
+    return str(text).strip().lower() if text else ''
+
+
+def tokenize(text):
+    """
+    n-gram 词元：含非数字字符的相邻两字，以及连续 NUMERIC_GRAM_LENGTH 位数字。
+    纯数字的两字组合只有 100 种，几乎每个身份证号都包含，不作为词元
+    """
+    text = normalize(text)
+    tokens = {text[i:i + 2] for i in range(len(text) - 1) if not _is_number(text[i:i + 2])}
+    size = NUMERIC_GRAM_LENGTH
+    tokens |= {text[i:i + size] for i in range(len(text) - size + 1) if _is_number(text[i:i + size])}
+    return tokens
+
+
+def _is_number(text):
+    return text.isascii() and text.isdigit()
+
+
+def pinyin_initials(name):
+    """姓名的拼音首字母，如 张三 -> zs"""
+    if lazy_pinyin is None or not name:
+        return ''
+    return ''.join(lazy_pinyin(str(name), style=Style.FIRST_LETTER, errors='ignore')).lower()
+
+
+def suffix_tokens(text):
+    """后缀词元：倒序后的前 1~SUFFIX_MAX_LENGTH 个字符，如 ...123x -> $x、$x3、$x32 ..."""
+    reversed_text = normalize(text)[::-1]
+    return {SUFFIX_PREFIX + reversed_text[:length] for length in range(1, min(len(reversed_text), SUFFIX_MAX_LENGTH) + 1)}
+
+
+def build_tokens(values, name=None, suffix=None):
+    tokens = set()
+    for value in values:
+        tokens |= tokenize(value)
+    for token in tokenize(pinyin_initials(name)):
+        tokens.add(PINYIN_PREFIX + token)
+    return tokens | suffix_tokens(suffix)
+
+
+def case_tokens(case):
+    return build_tokens(
+        [getattr(case, field) for field in CASE_INDEXED_FIELDS], name=case.name, suffix=case.identity_id
+    )
+
+
+def identity_tokens(identity):
+    return build_tokens(
+        [getattr(identity, field) for field in IDENTITY_INDEXED_FIELDS], name=identity.name, suffix=identity.identity_id
+    )
+
+
+def _insert_tokens(token_model, key_column, rows, batch_size=5000):
+    """
+    批量写入词元。每个对象约有 20 个词元，批量导入时可达数十万行，
+    直接 executemany 而不构造模型实例（MySQL 驱动会合并为多值 INSERT）
+    """
+    using = router.db_for_write(token_model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}, {}) VALUES (%s, %s)'.format(
+        quote(token_model._meta.db_table), quote(key_column), quote('token')
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+
+
+def index_cases(cases):
+    """重建一批病例的词元（先删后插）"""
+    cases = list(cases)
+    if not cases:
+        return
+    with transaction.atomic(using=router.db_for_write(CaseSearchToken)):
+        CaseSearchToken.objects.filter(case_id__in=[case.id for case in cases]).delete()
+        _insert_tokens(
+            CaseSearchToken, 'case_id',
+            [(case.id, token) for case in cases for token in case_tokens(case)]
+        )
+
+
+def index_identities(identities):
+    """重建一批患者的词元（先删后插）"""
+    identities = list(identities)
+    if not identities:
+        return
+    with transaction.atomic(using=router.db_for_write(IdentitySearchToken)):
+        for start in range(0, len(identities), 1000):
+            IdentitySearchToken.objects.filter(
+                identity_id__in=[identity.identity_id for identity in identities[start:start + 1000]]
+            ).delete()
+        _insert_tokens(
+            IdentitySearchToken, 'identity_id',
+            [(identity.identity_id, token) for identity in identities for token in identity_tokens(identity)]
+        )
+
+
+def _prefix_hits(model, fields, query, limit):
+    """
+    各字段以查询串开头的对象（含完全相等），按字段索引顺序每个字段最多取 limit 个：
+    返回 (完全相等的主键, 前缀命中的主键)
+    """
+    exact, prefix = [], []
+    for field in fields:
+        rows = (
+            model.objects.filter(**{f'{field}__istartswith': query})
+            .order_by(field).values_list('pk', field)[:limit]
+        )
+        for pk, value in rows:
+            (exact if normalize(value) == query else prefix).append(pk)
+    return exact, prefix
+
+
+def _suffix_hits(model, token_model, key, field, query, limit):
+    """身份证号以查询串结尾：按后缀词元命中，查询串超过后缀词元长度时再比较结尾"""
+    token = SUFFIX_PREFIX + query[::-1][:SUFFIX_MAX_LENGTH]
+    ids = list(token_model.objects.filter(token=token).order_by(key).values_list(key, flat=True)[:limit])
+    if ids and len(query) > SUFFIX_MAX_LENGTH:
+        ids = list(model.objects.filter(pk__in=ids, **{f'{field}__iendswith': query}).values_list('pk', flat=True))
+    return ids
+
+
+def _gram_hits(token_model, key, grams, limit):
+    """所有词元同时命中的对象主键，最多 limit 个（取出后再查询，不作为子查询）"""
+    if not grams:
+        return []
+    return list(
+        token_model.objects.filter(token__in=grams)
+        .values(key)
+        .annotate(hits=Count('token'))
+        .filter(hits=len(grams))
+        .order_by(key)
+        .values_list(key, flat=True)[:limit]
+    )
+
+
+def _contains_hits(model, token_model, key, fields, query, limit):
+    """原文包含查询串：n-gram 命中的候选集上逐行校验"""
+    candidates = _gram_hits(token_model, key, tokenize(query), _candidate_limit())
+    if not candidates:
+        return []
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': query})
+    return list(model.objects.filter(condition, pk__in=candidates).values_list('pk', flat=True)[:limit])
+
+
+def _pinyin_hits(token_model, key, query, limit):
+    if not _is_pinyin_query(query):
+        return []
+    return _gram_hits(token_model, key, {PINYIN_PREFIX + token for token in tokenize(query)}, limit)
+
+
+def _candidate_limit():
+    return getattr(settings, 'SEARCH_CANDIDATE_LIMIT', 2000)
+
+
+def _merge(tiers, limit):
+    """按档次合并各路命中结果 {主键: 档次}，同一对象取最高档次，最多 limit 个"""
+    ranks = {}
+    for rank, ids in enumerate(tiers):
+        for pk in ids:
+            if pk not in ranks:
+                if len(ranks) >= limit:
+                    return ranks
+                ranks[pk] = rank
+    return ranks
+
+
+def _ranked(queryset, ranks, order_field):
+    """按检索档次排序，同档次按 order_field；search_rank + order_field 唯一，可直接用于游标分页"""
+    if not ranks:
+        return queryset.none()
+    groups = defaultdict(list)
+    for pk, rank in ranks.items():
+        groups[rank].append(pk)
+    whens = [When(pk__in=ids, then=Value(rank)) for rank, ids in sorted(groups.items())]
+    return queryset.filter(pk__in=list(ranks)).annotate(
+        search_rank=CaseWhen(*whens, output_field=IntegerField())
+    ).order_by('search_rank', order_field)
+
+
+def _is_pinyin_query(query):
+    return lazy_pinyin is not None and query.isascii() and query.isalpha()
+
+
+def search_cases(queryset, query):
+    """
+    检索病例：身份证号、门诊号、住院号、姓名（含拼音首字母）以及档案编号，
+    返回按相关度排序的查询集，最多 SEARCH_RESULT_LIMIT 条
+    """
+    query = normalize(query)
+    if not query:
+        return queryset
+    limit = getattr(settings, 'SEARCH_RESULT_LIMIT', 500)
+
+    exact, prefix = _prefix_hits(Case, CASE_SEARCH_FIELDS, query, limit)
+    suffix = _suffix_hits(Case, CaseSearchToken, 'case_id', 'identity__identity_id', query, limit)
+    contains = _contains_hits(Case, CaseSearchToken, 'case_id', CASE_SEARCH_FIELDS, query, limit)
+    pinyin = _pinyin_hits(CaseSearchToken, 'case_id', query, limit)
+    # 档案表很小，直接匹配档案编号；按 (archive_id, case_id) 唯一索引取病例
+    archive_ids = list(Archive.objects.filter(archive_code__icontains=query).values_list('id', flat=True)[:limit])
+    archive = list(
+        ArchiveCase.objects.filter(archive_id__in=archive_ids)
+        .order_by('archive_id', 'case_id').values_list('case_id', flat=True)[:limit]
+    ) if archive_ids else []
+
+    ranks = _merge([exact, suffix, prefix, contains + pinyin + archive], limit)
+    return _ranked(queryset, ranks, 'case_code')
+
+
+def search_identities(queryset, query):
+    """检索患者：身份证号、姓名（含拼音首字母），返回按相关度排序的查询集"""
+    query = normalize(query)
+    if not query:
+        return queryset
+    limit = getattr(settings, 'SEARCH_RESULT_LIMIT', 500)
+
+    exact, prefix = _prefix_hits(Identity, IDENTITY_INDEXED_FIELDS, query, limit)
+    suffix = _suffix_hits(Identity, IdentitySearchToken, 'identity_id', 'identity_id', query, limit)
+    contains = _contains_hits(Identity, IdentitySearchToken, 'identity_id', IDENTITY_INDEXED_FIELDS, query, limit)
+    pinyin = _pinyin_hits(IdentitySearchToken, 'identity_id', query, limit)
+
+    ranks = _merge([exact, suffix, prefix, contains + pinyin], limit)
+    return _ranked(queryset, ranks, 'identity_id')
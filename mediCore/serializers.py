@@ -1,9 +1,17 @@
 from .models import (
     Dictionary, DataTemplateCategory, DataTemplate, DataTemplateDictionary,
-    Identity, Case, Archive, DataTable
+    Identity, Case, Archive, DataTable, BackgroundJob
 )
 from rest_framework import serializers
 from django.db import IntegrityError
+from utils.pagination import StandardCursorPagination
+from utils.cache import bump_cache_version
+from .importer import IMPORT_FORMATS, is_utf8, read_rows, import_cases, reserve_case_codes
+from .filters import FILTER_PARAMS
+from .jobs import MERGE_POLICIES, MERGE_KEEP_TARGET
+from . import exports
+from .sessions import latest_check_time
+from django.conf import settings
 from datetime import datetime
 import re
 import logging
@@ -38,7 +46,8 @@ class DictionarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Dictionary
         fields = '__all__'  # 确保input_type、options、followup_options被序列化
-        read_only_fields = ['word_code']  # 只将word_code设为只读，允许id在更新时传入
+        # 只将word_code设为只读，允许id在更新时传入；pending_delete 只能通过删除接口设置
+        read_only_fields = ['word_code', 'pending_delete']
 
     def validate_word_class(self, value):
         """
@@ -76,7 +85,7 @@ class DictionarySerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"word_class": "无法根据词条类型生成编号前缀."})
 
         # 取所有以 prefix 开头且后面跟6位数字的 word_code
-        all_codes = Dictionary.objects.filter(word_code__startswith=prefix).values_list('word_code', flat=True)
+        all_codes = Dictionary.all_objects.filter(word_code__startswith=prefix).values_list('word_code', flat=True)
         max_num = 0
         for code in all_codes:
             m = re.match(rf'^{prefix}(\d{{6}})$', code)
@@ -168,7 +177,8 @@ class DataTemplateSerializer(serializers.ModelSerializer):
         """
         prefix = 'T'
         NUM_DIGITS = 6
-        last_template = DataTemplate.objects.filter(
+        # 包含等待后台删除的模板，避免生成重复编号
+        last_template = DataTemplate.all_objects.filter(
             template_code__startswith=prefix
         ).order_by('-template_code').first()
 
@@ -192,6 +202,7 @@ class DataTemplateSerializer(serializers.ModelSerializer):
                     for dictionary in dictionaries_data
                 ]
                 DataTemplateDictionary.objects.bulk_create(data_template_dictionaries)
+                bump_cache_version(DataTemplateDictionary._meta.db_table)
 
             return template
         except IntegrityError:
@@ -215,6 +226,7 @@ class DataTemplateSerializer(serializers.ModelSerializer):
                 for dictionary in dictionaries_data
             ]
             DataTemplateDictionary.objects.bulk_create(data_template_dictionaries)
+            bump_cache_version(DataTemplateDictionary._meta.db_table)
 
         return instance
 
@@ -235,8 +247,14 @@ class BaseCaseSerializer(serializers.ModelSerializer):
     archive_codes = serializers.SerializerMethodField(help_text='关联的档案编号列表')
     age = serializers.SerializerMethodField(help_text='年龄')
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """预加载序列化所需的关联数据，使每页的查询次数与页大小无关"""
+        return queryset.select_related('identity').prefetch_related('archives')
+
     def get_archive_codes(self, obj):
-        return list(obj.archives.values_list('archive_code', flat=True))
+        # 使用 archives.all() 以便命中 prefetch_related 的缓存
+        return [archive.archive_code for archive in obj.archives.all()]
 
     def get_age(self, obj):
         from datetime import date
@@ -254,8 +272,11 @@ class CaseListSerializer(BaseCaseSerializer):
             'id', 'case_code', 'identity', 'identity_name', 'opd_id', 'inhospital_id',
             'name', 'gender', 'birth_date', 'phone_number', 'home_address',
             'blood_type', 'main_diagnosis', 'has_transplant_surgery',
-            'is_in_transplant_queue', 'archive_codes', 'age'
+            'is_in_transplant_queue', 'transplanted', 'transplant_date',
+            'in_transplant_queue', 'archive_codes', 'age'
         ]
+        # 结构化移植字段由 has_transplant_surgery / is_in_transplant_queue 解析得到
+        read_only_fields = ['transplanted', 'transplant_date', 'in_transplant_queue']
         ref_name = 'CaseList'
 
 
@@ -274,8 +295,11 @@ class CaseDetailSerializer(BaseCaseSerializer):
             'id', 'case_code', 'identity', 'identity_name', 'opd_id', 'inhospital_id',
             'name', 'gender', 'birth_date', 'phone_number', 'home_address',
             'blood_type', 'main_diagnosis', 'has_transplant_surgery',
-            'is_in_transplant_queue', 'archive_codes', 'archives', 'age'
+            'is_in_transplant_queue', 'transplanted', 'transplant_date',
+            'in_transplant_queue', 'archive_codes', 'archives', 'age'
         ]
+        # 结构化移植字段由 has_transplant_surgery / is_in_transplant_queue 解析得到
+        read_only_fields = ['transplanted', 'transplant_date', 'in_transplant_queue']
         ref_name = 'CaseDetail'
 
 
@@ -311,7 +335,7 @@ class CaseSerializer(CaseDetailSerializer):
             raise serializers.ValidationError({'identity': '身份证号格式不正确'})
 
     def validate(self, data):
-        logger.info(f"开始验证数据: {data}")
+        logger.debug("开始验证数据: %s", data)
 
         # 从身份证号获取出生日期
         identity_id = data.get('identity')
@@ -320,29 +344,29 @@ class CaseSerializer(CaseDetailSerializer):
 
             # 如果前端传了出生日期，验证是否一致
             if 'birth_date' in data:
-                logger.info(f"比较出生日期: 传入={data['birth_date']}, 身份证号中={birth_date_from_id}")
+                logger.debug("比较出生日期: 传入=%s, 身份证号中=%s", data['birth_date'], birth_date_from_id)
                 if data['birth_date'] != birth_date_from_id:
                     raise serializers.ValidationError({'birth_date': '出生日期与身份证号中的日期不符'})
 
             # 使用身份证中的出生日期
             data['birth_date'] = birth_date_from_id
-            logger.info(f"使用身份证号中的出生日期: {birth_date_from_id}")
+            logger.debug("使用身份证号中的出生日期: %s", birth_date_from_id)
 
-        logger.info(f"数据验证完成: {data}")
+        logger.debug("数据验证完成: %s", data)
         return super().validate(data)
 
     def validate_identity(self, value):
         """验证身份证号格式"""
-        logger.info(f"验证身份证号: {value}")
+        logger.debug("验证身份证号: %s", value)
 
         if not value or len(value) != 18:
-            logger.error(f"无效的身份证号长度: {len(value) if value else 'None'}")
+            logger.info("无效的身份证号长度: %s", len(value) if value else None)
             raise serializers.ValidationError("请提供有效的18位身份证号")
         return value
 
     def validate_archive_codes(self, value):
         """验证档案编号列表"""
-        logger.info(f"验证档案编号列表: {value}")
+        logger.debug("验证档案编号列表: %s", value)
 
         if not value:
             return value
@@ -350,32 +374,20 @@ class CaseSerializer(CaseDetailSerializer):
         invalid_codes = []
         for archive_code in value:
             if not Archive.objects.filter(archive_code=archive_code).exists():
-                logger.error(f"未找到档案: {archive_code}")
+                logger.info("未找到档案: %s", archive_code)
                 invalid_codes.append(archive_code)
 
         if invalid_codes:
             error_msg = f"以下档案编号不存在: {', '.join(invalid_codes)}"
-            logger.error(error_msg)
+            logger.info("%s", error_msg)
             raise serializers.ValidationError(error_msg)
 
-        logger.info(f"档案编号验证完成: {value}")
+        logger.debug("档案编号验证完成: %s", value)
         return value
 
     def generate_case_code(self):
-        """生成病例编号：C + 6位数字"""
-        prefix = 'C'
-        NUM_DIGITS = 6
-        last_case = Case.objects.filter(
-            case_code__startswith=prefix
-        ).order_by('-case_code').first()
-
-        next_number = 1
-        if last_case and last_case.case_code:
-            numeric_part = last_case.case_code[len(prefix):]
-            if numeric_part.isdigit():
-                next_number = int(numeric_part) + 1
-
-        return f"{prefix}{next_number:0{NUM_DIGITS}d}"
+        """生成病例编号：C + 6位数字，与批量导入共用计数器（须在事务内调用）"""
+        return reserve_case_codes(1)[0]
 
     def validate_birth_date(self, value):
         """验证出生日期的格式"""
@@ -398,7 +410,7 @@ class CaseSerializer(CaseDetailSerializer):
     def create(self, validated_data):
         from django.db import transaction
         
-        logger.info("开始创建病例，数据: %s", validated_data)
+        logger.debug("开始创建病例，数据: %s", validated_data)
         
         with transaction.atomic():
             # 获取身份证号
@@ -406,12 +418,12 @@ class CaseSerializer(CaseDetailSerializer):
             archive_codes = validated_data.pop('archive_codes', None)
             archive_ids = validated_data.pop('archives', None)
             
-            logger.info("处理档案关联 - 档案编号: %s, 档案ID: %s", archive_codes, archive_ids)
+            logger.debug("处理档案关联 - 档案编号: %s, 档案ID: %s", archive_codes, archive_ids)
 
             # 尝试获取已存在的Identity实例，如果不存在则创建新的
             try:
                 identity_instance = Identity.objects.get(identity_id=identity_id)
-                logger.info("找到已存在的患者身份: %s", identity_instance)
+                logger.debug("找到已存在的患者身份: %s", identity_instance)
                 # 更新Identity信息
                 for field in ['name', 'gender', 'birth_date']:
                     if field in validated_data:
@@ -426,17 +438,19 @@ class CaseSerializer(CaseDetailSerializer):
                     'birth_date': validated_data.get('birth_date')
                 }
                 identity_instance = Identity.objects.create(**identity_data)
-                logger.info("创建新的患者身份: %s", identity_instance)
+                logger.debug("创建新的患者身份: %s", identity_instance)
 
             # 设置Case的identity字段为Identity实例
             validated_data['identity'] = identity_instance
             # 生成病例编号
             validated_data['case_code'] = self.generate_case_code()
-            logger.info("生成病例编号: %s", validated_data['case_code'])
+            logger.debug("生成病例编号: %s", validated_data['case_code'])
 
-            # 创建Case实例
-            instance = Case.objects.create(**validated_data)
-            logger.info("创建病例实例: %s", instance)
+            # 创建Case实例，同时解析移植状态
+            instance = Case(**validated_data)
+            instance.sync_transplant_status()
+            instance.save()
+            logger.info("创建病例: %s", instance.case_code)
 
             # 处理档案关联
             archives = []
@@ -444,18 +458,18 @@ class CaseSerializer(CaseDetailSerializer):
             # 通过档案编号关联
             if archive_codes:
                 archives_by_code = Archive.objects.filter(archive_code__in=archive_codes)
-                logger.info("通过档案编号找到的档案: %s", list(archives_by_code))
                 archives.extend(archives_by_code)
+                logger.debug("通过档案编号找到的档案: %s", archives_by_code)
                 
             # 通过档案ID关联
             if archive_ids:
                 archives_by_id = Archive.objects.filter(id__in=archive_ids)
-                logger.info("通过档案ID找到的档案: %s", list(archives_by_id))
                 archives.extend(archives_by_id)
+                logger.debug("通过档案ID找到的档案: %s", archives_by_id)
                 
             # 用 set 建立多对多关系
             if archives:
-                logger.info("设置病例与档案的多对多关系: %s", archives)
+                logger.debug("设置病例与档案的多对多关系: %s", archives)
                 instance.archives.set(archives)
             else:
                 logger.warning("没有找到任何档案记录")
@@ -463,8 +477,8 @@ class CaseSerializer(CaseDetailSerializer):
             return instance
 
     def update(self, instance, validated_data):
-        logger.info(f"开始更新病例，病例编号: {instance.case_code}")
-        logger.debug(f"全部更新数据: {validated_data}")
+        logger.info("更新病例: %s", instance.case_code)
+        logger.debug("全部更新数据: %s", validated_data)
 
         # 处理身份证号
         identity_id = validated_data.pop('identity', None)
@@ -491,36 +505,37 @@ class CaseSerializer(CaseDetailSerializer):
         # 处理档案关联
         archive_codes = validated_data.pop('archive_codes', None)
         archive_ids = validated_data.pop('archives', None)
-        logger.info(f"档案编号: {archive_codes}, 档案ID: {archive_ids}")
+        logger.debug("档案编号: %s, 档案ID: %s", archive_codes, archive_ids)
 
         try:
             # 更新基本字段
             for attr, value in validated_data.items():
-                logger.debug(f"更新字段 {attr}: {value}")
+                logger.debug("更新字段 %s: %s", attr, value)
                 setattr(instance, attr, value)
+            changed = instance.sync_transplant_status()
 
-            # 确保实例保存成功
-            instance.save()
-            logger.info("基本字段更新完成")
+            # 只写回本次修改的字段，data_revision 等由其他路径维护的字段不会被旧值覆盖
+            instance.save(update_fields=[*validated_data, *changed])
+            logger.debug("基本字段更新完成")
 
             # 如果提供了档案编号或ID，更新档案关联
             archives = []
             if archive_codes:
                 archives_by_code = Archive.objects.filter(archive_code__in=archive_codes)
-                logger.info("通过档案编号找到的档案: %s", list(archives_by_code))
                 archives.extend(archives_by_code)
+                logger.debug("通过档案编号找到的档案: %s", archives_by_code)
             if archive_ids:
                 archives_by_id = Archive.objects.filter(id__in=archive_ids)
-                logger.info("通过档案ID找到的档案: %s", list(archives_by_id))
                 archives.extend(archives_by_id)
+                logger.debug("通过档案ID找到的档案: %s", archives_by_id)
             if archive_codes or archive_ids:
-                logger.info("设置病例与档案的多对多关系: %s", archives)
+                logger.debug("设置病例与档案的多对多关系: %s", archives)
                 instance.archives.set(archives)
-            logger.info("病例更新成功完成")
+            logger.debug("病例更新成功完成")
             return instance
 
         except Exception as e:
-            logger.error(f"更新病例时发生错误: {str(e)}")
+            logger.exception("更新病例时发生错误: %s", e)
             raise serializers.ValidationError(str(e))
 
 
@@ -544,14 +559,40 @@ class IdentitySerializer(serializers.ModelSerializer):
         return (today.year - born.year) - ((today.month, today.day) < (born.month, born.day))
 
 
-class PatientDetailSerializer(serializers.ModelSerializer):
-    """用于患者详情的序列化器，包含病例信息"""
-    case_list = CaseListSerializer(source='case_set', many=True, read_only=True)
+class CasePreviewMixin:
+    """
+    详情中只内嵌第一页病例，与对应的游标分页子资源第一页一致，
+    响应大小和耗时不随病例总数增长。case_relation 为实例上病例关联管理器的属性名
+    """
+    case_relation = None
+    case_preview_size = StandardCursorPagination.page_size
+
+    def _get_case_preview(self, obj):
+        if not hasattr(obj, '_case_preview'):
+            queryset = BaseCaseSerializer.setup_eager_loading(
+                getattr(obj, self.case_relation).order_by(StandardCursorPagination.ordering)
+            )
+            obj._case_preview = list(queryset[:self.case_preview_size + 1])
+        return obj._case_preview
+
+    def get_case_list(self, obj):
+        cases = self._get_case_preview(obj)[:self.case_preview_size]
+        return CaseListSerializer(cases, many=True, context=self.context).data
+
+    def get_case_has_more(self, obj):
+        return len(self._get_case_preview(obj)) > self.case_preview_size
+
+
+class PatientDetailSerializer(CasePreviewMixin, serializers.ModelSerializer):
+    """用于患者详情的序列化器，包含第一页病例信息，更多病例见 /api/patient/{identity_id}/cases/"""
+    case_list = serializers.SerializerMethodField(help_text='病例列表（第一页）')
+    case_has_more = serializers.SerializerMethodField(help_text='是否还有更多病例')
     age = serializers.SerializerMethodField(help_text='年龄')
+    case_relation = 'case_set'
 
     class Meta:
         model = Identity
-        fields = ['identity_id', 'name', 'gender', 'birth_date', 'age', 'case_list']
+        fields = ['identity_id', 'name', 'gender', 'birth_date', 'age', 'case_list', 'case_has_more']
         read_only_fields = ['id']  # 添加id为只读字段
 
     def get_age(self, obj):
@@ -656,16 +697,18 @@ class ArchiveListSerializer(serializers.ModelSerializer):
         return data
 
 
-class ArchiveDetailSerializer(serializers.ModelSerializer):
-    """用于单个档案详情的序列化器"""
+class ArchiveDetailSerializer(CasePreviewMixin, serializers.ModelSerializer):
+    """用于单个档案详情的序列化器，包含第一页病例，更多病例见 /api/archive/{archive_code}/cases/"""
     archive_code = serializers.CharField(read_only=True, help_text='档案编号（自动生成）')
     archive_name = serializers.CharField(help_text='档案名称', default='string')
     archive_description = serializers.CharField(help_text='档案描述', default='string')
-    case_list = CaseListSerializer(source='cases', many=True, read_only=True)
+    case_list = serializers.SerializerMethodField(help_text='病例列表（第一页）')
+    case_has_more = serializers.SerializerMethodField(help_text='是否还有更多病例')
+    case_relation = 'cases'
 
     class Meta:
         model = Archive
-        fields = ['id', 'archive_code', 'archive_name', 'archive_description', 'case_list']
+        fields = ['id', 'archive_code', 'archive_name', 'archive_description', 'case_list', 'case_has_more']
         ref_name = 'ArchiveDetail'
 
 
@@ -676,7 +719,8 @@ class ArchiveSerializer(ArchiveDetailSerializer):
         """生成档案编号：A + 6位数字"""
         prefix = 'A'
         NUM_DIGITS = 6
-        last_archive = Archive.objects.filter(
+        # 包含等待后台删除的档案，避免生成重复编号
+        last_archive = Archive.all_objects.filter(
             archive_code__startswith=prefix
         ).order_by('-archive_code').first()
 
@@ -698,6 +742,33 @@ class ArchiveSerializer(ArchiveDetailSerializer):
             })
 
 
+class ArchiveCaseBatchSerializer(serializers.Serializer):
+    """批量加入/移出档案病例的请求参数，case_codes 与 filter 二选一"""
+    case_codes = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        allow_empty=False,
+        help_text='病例编号列表'
+    )
+    filter = serializers.DictField(
+        required=False,
+        help_text='病例筛选条件，与病例列表的筛选参数相同，如 {"gender": "1", "diagnosis": "肾衰竭"}'
+    )
+
+    def validate_case_codes(self, value):
+        max_codes = getattr(settings, 'ARCHIVE_MEMBERSHIP_MAX_CODES', 100000)
+        if len(value) > max_codes:
+            raise serializers.ValidationError(f'单次最多提交 {max_codes} 个病例编号，请使用 filter 或分批提交')
+        return value
+
+    def validate(self, attrs):
+        if ('case_codes' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError('case_codes 与 filter 必须且只能提供一个')
+        if 'filter' in attrs and not any(attrs['filter'].get(name) for name in FILTER_PARAMS + ['search']):
+            raise serializers.ValidationError({'filter': '筛选条件不能为空'})
+        return attrs
+
+
 class DataTableBulkCreateSerializer(serializers.Serializer):
     """用于批量数据录入的序列化器"""
     case_code = serializers.CharField(help_text='病例编号')
@@ -769,6 +840,99 @@ class DataTableBulkCreateSerializer(serializers.Serializer):
         }
 
 
+CHECK_TIME_ERRORS = {'invalid': '时间格式错误，需为YYYY-MM-DD HH:MM:SS'}
+
+
+class DataTableSessionSerializer(serializers.Serializer):
+    """一次检查：病例编号 + 模板编号 + 检查时间"""
+    case_code = serializers.CharField(help_text='病例编号')
+    template_code = serializers.CharField(help_text='模板编号')
+    check_time = serializers.DateTimeField(
+        input_formats=['%Y-%m-%d %H:%M:%S'], error_messages=CHECK_TIME_ERRORS,
+        help_text='检查时间，格式YYYY-MM-DD HH:MM:SS'
+    )
+
+    def validate(self, attrs):
+        try:
+            attrs['case'] = Case.objects.get(case_code=attrs['case_code'])
+        except Case.DoesNotExist:
+            raise serializers.ValidationError({'case_code': '病例编号不存在'})
+        try:
+            attrs['template'] = DataTemplate.objects.get(template_code=attrs['template_code'])
+        except DataTemplate.DoesNotExist:
+            raise serializers.ValidationError({'template_code': '模板编号不存在'})
+        return attrs
+
+
+class DataTableSessionRetimeSerializer(DataTableSessionSerializer):
+    """修改一次检查的检查时间"""
+    new_check_time = serializers.DateTimeField(
+        input_formats=['%Y-%m-%d %H:%M:%S'], error_messages=CHECK_TIME_ERRORS,
+        help_text='新的检查时间，格式YYYY-MM-DD HH:MM:SS'
+    )
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if attrs['new_check_time'] == attrs['check_time']:
+            raise serializers.ValidationError({'new_check_time': '新的检查时间不能与原检查时间相同'})
+        return attrs
+
+
+class DataTableCopyForwardSerializer(DataTableSessionSerializer):
+    """复制上次检查的参数"""
+    source_check_time = serializers.DateTimeField(
+        required=False, input_formats=['%Y-%m-%d %H:%M:%S'], error_messages=CHECK_TIME_ERRORS,
+        help_text='被复制的检查时间，格式YYYY-MM-DD HH:MM:SS，不传则取新检查时间之前最近的一次检查'
+    )
+    check_time = serializers.DateTimeField(
+        input_formats=['%Y-%m-%d %H:%M:%S'], error_messages=CHECK_TIME_ERRORS,
+        help_text='新的检查时间，格式YYYY-MM-DD HH:MM:SS'
+    )
+    overrides = serializers.DictField(
+        child=serializers.JSONField(allow_null=True), required=False,
+        help_text='需要修改的词条 {词条编号: 值}，值为 null 表示不复制该词条'
+    )
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        word_codes = list(attrs.get('overrides', {}))
+        dictionaries = {d.word_code: d for d in Dictionary.objects.filter(word_code__in=word_codes)}
+        missing = [code for code in word_codes if code not in dictionaries]
+        if missing:
+            raise serializers.ValidationError({'overrides': f"词条编号不存在: {', '.join(missing)}"})
+        attrs['overrides'] = {dictionaries[code]: value for code, value in attrs.get('overrides', {}).items()}
+
+        if attrs.get('source_check_time') is None:
+            attrs['source_check_time'] = latest_check_time(attrs['case'], attrs['template'], before=attrs['check_time'])
+            if attrs['source_check_time'] is None:
+                raise serializers.ValidationError({'source_check_time': '该病例在此模板下没有更早的检查'})
+        if attrs['source_check_time'] == attrs['check_time']:
+            raise serializers.ValidationError({'check_time': '新的检查时间不能与被复制的检查时间相同'})
+        return attrs
+
+
+class DictionaryMergeSerializer(serializers.Serializer):
+    """词条合并参数"""
+    target = serializers.CharField(help_text='目标词条编号，源词条的数据将合并到该词条')
+    policy = serializers.ChoiceField(
+        choices=MERGE_POLICIES,
+        default=MERGE_KEEP_TARGET,
+        help_text='同一病例、模板、检查时间两个词条都有数据时的处理方式：keep_target 保留目标词条的数据，keep_source 保留源词条的数据'
+    )
+
+    def validate_target(self, value):
+        try:
+            return Dictionary.objects.get(word_code=value)
+        except Dictionary.DoesNotExist:
+            raise serializers.ValidationError('目标词条不存在')
+
+    def validate(self, attrs):
+        source = self.context['source']
+        if attrs['target'].pk == source.pk:
+            raise serializers.ValidationError({'target': '目标词条不能与源词条相同'})
+        return attrs
+
+
 class DictionaryBulkImportSerializer(serializers.Serializer):
     """用于批量导入词条的序列化器"""
     file = serializers.FileField(help_text='CSV文件')
@@ -818,6 +982,44 @@ class DictionaryBulkImportSerializer(serializers.Serializer):
         }
 
 
+class CaseBulkImportSerializer(serializers.Serializer):
+    """用于批量导入病例的序列化器"""
+    file = serializers.FileField(help_text='CSV 或 NDJSON 文件')
+    file_format = serializers.ChoiceField(
+        choices=IMPORT_FORMATS, required=False, help_text='文件格式，默认按文件扩展名判断'
+    )
+    archive_codes = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        help_text='所有病例都要关联的档案编号列表'
+    )
+
+    def validate(self, attrs):
+        if 'file_format' not in attrs:
+            extension = attrs['file'].name.rsplit('.', 1)[-1].lower()
+            if extension == 'jsonl':
+                extension = 'ndjson'
+            if extension not in IMPORT_FORMATS:
+                raise serializers.ValidationError("只支持CSV或NDJSON文件格式")
+            attrs['file_format'] = extension
+        return attrs
+
+    def validate_file(self, value):
+        if not is_utf8(value):
+            raise serializers.ValidationError("文件须为 UTF-8 编码")
+        return value
+
+    def validate_archive_codes(self, value):
+        missing = set(value) - set(Archive.objects.filter(archive_code__in=value).values_list('archive_code', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"以下档案编号不存在: {', '.join(sorted(missing))}")
+        return value
+
+    def create(self, validated_data):
+        rows = read_rows(validated_data['file'], validated_data['file_format'])
+        return import_cases(rows, archive_codes=validated_data.get('archive_codes'))
+
+
 class PatientMergedCaseSerializer(serializers.Serializer):
     identity_id = serializers.CharField()
     name = serializers.CharField()
@@ -832,6 +1034,9 @@ class PatientMergedCaseSerializer(serializers.Serializer):
     blood_type = serializers.CharField(allow_null=True)
     has_transplant_surgery = serializers.CharField(allow_null=True)
     is_in_transplant_queue = serializers.CharField(allow_null=True)
+    transplanted = serializers.BooleanField(allow_null=True)
+    transplant_date = serializers.DateField(allow_null=True)
+    in_transplant_queue = serializers.BooleanField(allow_null=True)
 
     def get_age(self, obj):
         from datetime import date
@@ -859,4 +1064,77 @@ class CaseVisualizationDataSerializer(serializers.Serializer):
     data_points = serializers.ListField(
         child=CaseVisualizationDataPointSerializer(),
         help_text="数据点列表"
-    )
\ No newline at end of file
+    )
+
+
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    """后台任务状态"""
+    percent = serializers.SerializerMethodField(help_text='完成百分比')
+
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            'id', 'job_type', 'params', 'status', 'progress', 'total', 'percent',
+            'message', 'result', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_percent(self, obj):
+        if obj.status == BackgroundJob.STATUS_SUCCEEDED:
+            return 100
+        if not obj.total:
+            return 0
+        return min(99, int(obj.progress * 100 / obj.total))
+
+
+class ExportJobSerializer(serializers.Serializer):
+    """后台导出任务参数，校验通过后的 validated_data 即任务参数"""
+    export_type = serializers.ChoiceField(choices=exports.EXPORT_TYPES, help_text='导出类型')
+    file_format = serializers.CharField(
+        required=False, help_text='文件格式：archive 为 csv / parquet，patient_case_data 为 ndjson / json，'
+                                  'dictionary 为 csv / ndjson，默认取第一个'
+    )
+    archive_code = serializers.CharField(required=False, help_text='档案编号（archive 必填）')
+    template_code = serializers.CharField(
+        required=False, help_text='archive：模板编号（必填）；patient_case_data：按模板编号筛选，多个用逗号分隔'
+    )
+    identity_id = serializers.CharField(required=False, help_text='身份证号（patient_case_data 必填）')
+    start_time = serializers.CharField(required=False, help_text='检查时间起（patient_case_data）')
+    end_time = serializers.CharField(required=False, help_text='检查时间止（patient_case_data）')
+
+    REQUIRED_FIELDS = {
+        exports.EXPORT_ARCHIVE: ['archive_code', 'template_code'],
+        exports.EXPORT_PATIENT_CASE_DATA: ['identity_id'],
+        exports.EXPORT_DICTIONARY: [],
+    }
+    ALLOWED_FIELDS = {
+        exports.EXPORT_ARCHIVE: ['archive_code', 'template_code'],
+        exports.EXPORT_PATIENT_CASE_DATA: ['identity_id', 'template_code', 'start_time', 'end_time'],
+        exports.EXPORT_DICTIONARY: [],
+    }
+
+    def validate(self, attrs):
+        export_type = attrs['export_type']
+        errors = {field: '该字段是必填项。' for field in self.REQUIRED_FIELDS[export_type] if not attrs.get(field)}
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        formats = exports.EXPORT_FILE_FORMATS[export_type]
+        file_format = attrs.get('file_format') or formats[0]
+        if file_format not in formats:
+            raise serializers.ValidationError({'file_format': f"只支持 {' / '.join(formats)}"})
+        if file_format == 'parquet' and exports.pq is None:
+            raise serializers.ValidationError({'file_format': '服务器未安装 pyarrow，不支持 Parquet 导出'})
+
+        if export_type == exports.EXPORT_ARCHIVE:
+            if not Archive.objects.filter(archive_code=attrs['archive_code']).exists():
+                raise serializers.ValidationError({'archive_code': '档案不存在'})
+            if not DataTemplate.objects.filter(template_code=attrs['template_code']).exists():
+                raise serializers.ValidationError({'template_code': '模板不存在'})
+        elif export_type == exports.EXPORT_PATIENT_CASE_DATA:
+            if not Identity.objects.filter(identity_id=attrs['identity_id']).exists():
+                raise serializers.ValidationError({'identity_id': '患者不存在'})
+            exports.filter_case_data(DataTable.objects.none(), attrs)
+
+        params = {field: attrs[field] for field in self.ALLOWED_FIELDS[export_type] if attrs.get(field)}
+        return {'export_type': export_type, 'file_format': file_format, **params}
@@ -0,0 +1,110 @@
+"""
+检查会话
+
+一次检查（会话）即同一病例、同一模板、同一检查时间下的全部 DataTable 数据。
+复制上次检查（copy_forward）在数据库内用一条 INSERT ... SELECT 把源会话的数据复制到新的检查时间，
+需要修改的词条不参与复制，改为随后一次 bulk_create 写入，客户端无需先下载再逐条提交。
+
+修改检查时间（retime_session）和删除检查（delete_session）同样按会话整体操作，各只执行一条 UPDATE / DELETE，
+与模板包含多少词条无关。修改检查时间前先检查新时间下是否已有相同词条的数据（唯一键冲突）。
+"""
+from django.db import connections, router, transaction
+
+from .models import DataTable, Dictionary
+from .versions import touch_cases
+
+
+def session_rows(case, template, check_time):
+    """某次检查的全部数据"""
+    return DataTable.objects.filter(case=case, data_template=template, check_time=check_time)
+
+
+def latest_check_time(case, template, before=None):
+    """病例在该模板下最近一次检查的时间，before 不为空时只取早于该时间的检查"""
+    queryset = DataTable.objects.filter(case=case, data_template=template)
+    if before is not None:
+        queryset = queryset.filter(check_time__lt=before)
+    return queryset.order_by('-check_time').values_list('check_time', flat=True).first()
+
+
+def _copy_rows(connection, case_id, template_id, source_time, target_time, exclude_dictionary_ids):
+    """INSERT ... SELECT 复制一次检查的数据到新的检查时间，返回复制的行数"""
+    qn = connection.ops.quote_name
+    table = qn(DataTable._meta.db_table)
+    sql = (
+        f"INSERT INTO {table} ({qn('case_id')}, {qn('data_template_id')}, {qn('dictionary_id')}, {qn('value')}, {qn('check_time')}) "
+        f"SELECT {qn('case_id')}, {qn('data_template_id')}, {qn('dictionary_id')}, {qn('value')}, %s "
+        f"FROM {table} WHERE {qn('case_id')} = %s AND {qn('data_template_id')} = %s AND {qn('check_time')} = %s"
+    )
+    check_time_field = DataTable._meta.get_field('check_time')
+    params = [
+        check_time_field.get_db_prep_value(target_time, connection),
+        case_id, template_id,
+        check_time_field.get_db_prep_value(source_time, connection),
+    ]
+    if exclude_dictionary_ids:
+        sql += f" AND {qn('dictionary_id')} NOT IN ({', '.join(['%s'] * len(exclude_dictionary_ids))})"
+        params += list(exclude_dictionary_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def copy_forward(case, template, source_time, target_time, overrides=None):
+    """
+    把一次检查的数据复制到新的检查时间
+
+    :param overrides: {词条: 值}，这些词条使用给定的值而不是源会话中的值；值为 None 表示不复制该词条
+    :return: (复制的行数, 按 overrides 写入的行数)
+    """
+    overrides = overrides or {}
+    using = router.db_for_write(DataTable)
+    with transaction.atomic(using=using):
+        copied = _copy_rows(
+            connections[using], case.id, template.id, source_time, target_time,
+            [dictionary.id for dictionary in overrides]
+        )
+        rows = [
+            DataTable(case=case, data_template=template, dictionary=dictionary, value=value, check_time=target_time)
+            for dictionary, value in overrides.items() if value is not None
+        ]
+        DataTable.objects.using(using).bulk_create(rows)
+        touch_cases([case.id])
+    return copied, len(rows)
+
+
+def conflicting_word_codes(case, template, source_time, target_time):
+    """新检查时间下已存在、且源会话中也有的词条编号（移动后会违反唯一键）"""
+    target_ids = session_rows(case, template, target_time).values_list('dictionary_id', flat=True)
+    source_ids = session_rows(case, template, source_time).filter(dictionary_id__in=list(target_ids))
+    return list(
+        Dictionary.all_objects.filter(pk__in=source_ids.values_list('dictionary_id', flat=True))
+        .order_by('word_code').values_list('word_code', flat=True)
+    )
+
+
+def retime_session(case, template, source_time, target_time):
+    """
+    把一次检查的全部数据移动到新的检查时间
+
+    :return: (移动的行数, 冲突的词条编号)；有冲突时不做任何修改
+    """
+    using = router.db_for_write(DataTable)
+    with transaction.atomic(using=using):
+        conflicts = conflicting_word_codes(case, template, source_time, target_time)
+        if conflicts:
+            return 0, conflicts
+        moved = session_rows(case, template, source_time).using(using).update(check_time=target_time)
+        if moved:
+            touch_cases([case.id])
+    return moved, []
+
+
+def delete_session(case, template, check_time):
+    """删除一次检查的全部数据，返回删除的行数"""
+    with transaction.atomic():
+        # DataTable 无级联和信号，delete() 直接执行一条 DELETE
+        deleted = session_rows(case, template, check_time).delete()[0]
+        if deleted:
+            touch_cases([case.id])
+    return deleted
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,7 +24,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-2u44@sl(12rleofhh^tdr))18@!3xk*yd8ra(ui9z$(=s4muu^'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# 生产环境设置 DJANGO_DEBUG=0（DEBUG 开启时每个请求执行的 SQL 都会保存在内存中）
+DEBUG = os.environ.get('DJANGO_DEBUG', '1').lower() not in ('0', 'false', 'no')
 
 
 # Application definition
@@ -47,11 +49,13 @@ CORS_ALLOW_ALL_ORIGINS = True
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'utils.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.db_router.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'mediCore.urls'
@@ -82,15 +86,39 @@ AUTHENTICATION_BACKENDS = [
 # 生产环境
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'utils.mysql_pool',  # 带连接池的 MySQL 后端，见 utils/mysql_pool/base.py
         'NAME': 'medical_data',
         'USER': 'mediCore',
         'PASSWORD': 'bWVkaUNvcmU=',
         'HOST': 'db',  # Docker 服务名
         'PORT': '3306',  # Docker MySQL 端口
+        # 每个进程一个连接池；进程数 × MAX_SIZE 需小于 MySQL 的 max_connections。
+        # 每个进程最多同时占用 SERVE_THREADS + CASE_QUERY_MAX_WORKERS 个连接（请求线程 + 异步查询线程池），
+        # MAX_SIZE 不应小于二者之和，否则并发查询会等待连接直至 TIMEOUT；serve 启动时检查并按需调大
+        'POOL': {
+            'MIN_SIZE': 2,
+            'MAX_SIZE': 10,
+            'MAX_LIFETIME': 1800,
+            'TIMEOUT': 10,
+            'CHECK_AFTER': 5,
+        },
     }
 }
 
+# 只读副本：设置 DB_REPLICA_HOST 后 GET 请求和只读查询接口的读操作走副本（见 utils/db_router.py）
+# 本地测试可配置两个 SQLite 别名指向同一文件，如 DATABASES['replica'] = {**DATABASES['default']}
+DATABASE_REPLICAS = []
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+    }
+    DATABASE_REPLICAS.append('replica')
+DATABASE_ROUTERS = ['utils.db_router.ReplicaRouter']
+# 异步病例查询接口（mediCore/async_views.py）并发查询的线程数，每个线程占用一个连接，计入连接池的 MAX_SIZE
+CASE_QUERY_MAX_WORKERS = 6
+
 ALLOWED_HOSTS = ['*']
 
 # # #本地开发环境
@@ -123,11 +151,89 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
+
+    # JSON 使用 orjson 编码 / 解码（未安装 orjson 时回退到标准库，见 utils/renderers.py）
+    'DEFAULT_RENDERER_CLASSES': [
+        'utils.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'utils.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     
     # 全局异常处理器
     'EXCEPTION_HANDLER': 'utils.exception_handler.custom_exception_handler',
 }
 
+# 缓存配置
+# 缓存版本号保存在 CACHE_VERSION_ALIAS 缓存中，多进程（serve 的多个 worker、run_jobs）部署时需使用各进程共享的后端，
+# 设置 DJANGO_CACHE_DIR 后使用文件缓存；推荐改为 Redis / Memcached（共享、原子更新，不会随机淘汰版本号）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mediCore',
+    }
+}
+CACHE_VERSION_ALIAS = 'default'
+if os.environ.get('DJANGO_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['DJANGO_CACHE_DIR'],
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+    # 版本号单独存放：响应缓存超过 MAX_ENTRIES 时的随机清理不会淘汰版本号（版本号只有每张表一个，远小于上限）
+    CACHES['versions'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(os.environ['DJANGO_CACHE_DIR'], 'versions'),
+    }
+    CACHE_VERSION_ALIAS = 'versions'
+
+# 响应缓存（见 utils/response_cache.py）：键中包含相关表 / 病例的版本号，数据变化即失效
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_ALIAS = 'default'  # 使用的缓存别名
+RESPONSE_CACHE_TIMEOUT = 3600  # 兜底过期时间（秒）
+CONDITIONAL_GET_ENABLED = True  # 可缓存的查询响应带 ETag（病例查询接口为 POST），If-None-Match 匹配时返回 304
+
+# 响应压缩
+# CompressionMiddleware（见 MIDDLEWARE、utils/compression.py）：zstd 需安装 zstandard，br 需安装 brotli
+COMPRESSION_ENABLED = True
+COMPRESSION_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+COMPRESSION_ENCODINGS = ['zstd', 'br', 'gzip']  # 服务端偏好顺序
+
+# 分页总数策略
+PAGINATION_COUNT_CACHE_TIMEOUT = 30  # 列表总数按 接口+过滤条件 缓存的秒数
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 100000  # 无过滤条件且表统计行数超过该值时使用估算总数
+
+# 病例/患者检索（n-gram 词元索引，见 mediCore/search.py；安装 pypinyin 后支持拼音首字母检索）
+SEARCH_RESULT_LIMIT = 500  # 检索结果最多返回的条数
+SEARCH_CANDIDATE_LIMIT = 2000  # 按 n-gram 词元命中、再逐行校验包含查询串的候选集上限
+
+CASE_FACET_CACHE_TIMEOUT = 60  # 病例分面统计按筛选条件缓存的秒数
+
+ARCHIVE_MEMBERSHIP_CHUNK_SIZE = 1000  # 批量加入/移出档案病例时每条 SQL 处理的病例数
+ARCHIVE_MEMBERSHIP_MAX_CODES = 100000  # 单次请求最多提交的病例编号数
+
+BACKGROUND_JOBS_EAGER = False  # 为 True 时提交后台任务后立即在当前进程执行（本地开发未启动 run_jobs 时使用）
+BACKGROUND_JOB_POLL_INTERVAL = 2  # run_jobs 无任务时的轮询间隔（秒）
+BACKGROUND_DELETE_CHUNK_SIZE = 1000  # 级联删除每个短事务删除的行数
+BACKGROUND_JOB_PROCESSES = 2  # run_jobs 默认启动的 worker 进程数
+BACKGROUND_JOB_HEARTBEAT_INTERVAL = 10  # 执行中任务的心跳间隔（秒）
+BACKGROUND_JOB_HEARTBEAT_TIMEOUT = 60  # 心跳超过该时间（秒）未更新的任务视为 worker 已丢失，放回队列
+
+# 生产模式（manage.py serve）
+SERVE_BIND = '0.0.0.0:8000'
+SERVE_WORKERS = int(os.environ.get('SERVE_WORKERS', 0)) or None  # 默认 CPU 核数 * 2 + 1
+SERVE_THREADS = 4  # 每个 worker 的线程数（流式导出等长响应不会独占 worker）
+SERVE_MAX_REQUESTS = 1000  # worker 处理多少请求后重启，防止内存缓慢增长
+SERVE_TIMEOUT = 120  # worker 无响应多少秒后被重启
+SERVE_GRACEFUL_TIMEOUT = 30  # 平滑重启时等待进行中请求的秒数
+
+EXPORT_ROOT = BASE_DIR / 'exports'  # 后台导出结果文件目录
+EXPORT_MAX_CONCURRENT_JOBS = 2  # 同时执行的导出任务上限，避免大量导出查询压垮数据库
+EXPORT_RETENTION_DAYS = 7  # 导出文件保留天数，由 run_jobs 定期清理
+
 # JWT 配置
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -181,6 +287,14 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 # 日志配置
+# 日志：请求线程只把记录放入队列，由后台线程写控制台和按大小轮转的 JSON 日志文件（见 utils/log.py）
+LOG_LEVEL = os.environ.get('DJANGO_LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+LOG_FILE = os.environ.get('DJANGO_LOG_FILE', 'debug.txt')
+# 热点路径 INFO 及以下日志的保留比例（WARNING 及以上不采样）
+LOG_SAMPLING = {
+    'mediCore.serializers': 0.1,
+    'utils.exception_handler': 0.1,
+}
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -189,6 +303,15 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'utils.log.JSONFormatter',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'utils.log.SamplingFilter',
+            'rates': LOG_SAMPLING,
+        },
     },
     'handlers': {
         'console': {
@@ -196,19 +319,34 @@ LOGGING = {
             'formatter': 'verbose',
         },
         'file': {
-            'class': 'logging.FileHandler',
-            'filename': 'debug.txt',
-            'formatter': 'verbose',
+            'class': 'utils.log.RotatingFileHandler',
+            'filename': LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'json',
+        },
+        'queue': {
+            '()': 'utils.log.QueuedHandler',
+            'handlers': ['console', 'file'],
+            'maxsize': 10000,
+            'filters': ['sampling'],
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
         },
         'mediCore': {  # 应用的 logger
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': True,
+        },
+        'utils': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
             'propagate': True,
         },
     },
@@ -0,0 +1,63 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    Archive, BackgroundJob, Case, CaseSearchToken, CodeSequence, DataTable, DataTemplate, DataTemplateCategory,
+    Dictionary, Identity, IdentitySearchToken
+)
+from . import search
+from .versions import bump_on_commit, touch_cases
+
+# 不参与缓存版本号的模型：任务进度频繁更新，检索词元随病例 / 患者一起变化，编号计数器不出现在响应中
+UNVERSIONED_MODELS = (BackgroundJob, CaseSearchToken, CodeSequence, IdentitySearchToken)
+# 注册 post_delete 的模型。DataTable、ArchiveCase 等级联删除的子表不注册：
+# 有删除信号时 Django 会先把要删除的行全部取出再逐条发送信号，无法直接 DELETE
+DELETE_VERSIONED_MODELS = (Archive, Case, DataTemplate, DataTemplateCategory, Dictionary, Identity)
+
+
+def _touches(update_fields, indexed_fields):
+    return update_fields is None or bool(set(update_fields) & set(indexed_fields))
+
+
+@receiver(post_save, sender=Case)
+def update_case_search_tokens(sender, instance, raw=False, update_fields=None, **kwargs):
+    """病例检索字段变化时重建其词元（删除由外键级联完成）"""
+    if raw or not _touches(update_fields, search.CASE_INDEXED_FIELDS + ['identity']):
+        return
+    search.index_cases([instance])
+
+
+@receiver(post_save, sender=Identity)
+def update_identity_search_tokens(sender, instance, raw=False, update_fields=None, **kwargs):
+    """患者检索字段变化时重建其词元（删除由外键级联完成）"""
+    if raw or not _touches(update_fields, search.IDENTITY_INDEXED_FIELDS):
+        return
+    search.index_identities([instance])
+
+
+@receiver(post_save)
+def bump_saved_model_version(sender, instance, raw=False, **kwargs):
+    """单条保存后更换该表的缓存版本号"""
+    if raw or sender._meta.app_label != 'mediCore' or issubclass(sender, UNVERSIONED_MODELS):
+        return
+    if sender is DataTable:
+        # 与保存在同一事务中递增病例的数据修订号
+        touch_cases([instance.case_id])
+        return
+    bump_on_commit(sender._meta.db_table)
+
+
+def bump_deleted_model_version(sender, instance, **kwargs):
+    bump_on_commit(sender._meta.db_table)
+
+
+for model in DELETE_VERSIONED_MODELS:
+    post_delete.connect(bump_deleted_model_version, sender=model, dispatch_uid=f'bump_version_{model.__name__}')
+
+
+@receiver(m2m_changed, sender=Case.archives.through)
+@receiver(m2m_changed, sender=DataTemplate.dictionaries.through)
+def bump_relation_version(sender, action, **kwargs):
+    """多对多关系通过 add / remove / set 修改后，更换关系表的版本号"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_on_commit(sender._meta.db_table)
@@ -0,0 +1,32 @@
+"""
+测试配置：python manage.py test mediCore --settings=mediCore.tests.settings
+
+使用 SQLite，并配置一个镜像主库的只读副本别名，读写分离的测试无需 MySQL
+"""
+from mediCore.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_REPLICAS = ['replica']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mediCore-tests',
+    }
+}
+CACHE_VERSION_ALIAS = 'default'
+RESPONSE_CACHE_ALIAS = 'default'
+
+BACKGROUND_JOBS_EAGER = True
+EXPORT_ROOT = BASE_DIR / 'exports' / 'tests'
+LOGGING = {'version': 1, 'disable_existing_loggers': False}
@@ -0,0 +1,45 @@
+from django.test import TestCase
+
+from mediCore.models import BackgroundJob, Dictionary
+
+
+class DictionaryPendingDeleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pending = Dictionary.all_objects.create(
+            word_code='TES000001', word_name='白细胞', word_class='检验', pending_delete=True
+        )
+
+    def delete(self, lookup):
+        return self.client.delete(f'/api/dictionary/{lookup}/').json()
+
+    def fail_previous_job(self):
+        return BackgroundJob.objects.create(
+            job_type='cascade_delete', params={'model': 'mediCore.Dictionary', 'pk': self.pending.pk},
+            status=BackgroundJob.STATUS_FAILED
+        )
+
+    def test_running_delete_conflicts_by_word_code_and_id(self):
+        BackgroundJob.objects.create(
+            job_type='cascade_delete', params={'model': 'mediCore.Dictionary', 'pk': self.pending.pk}
+        )
+        self.assertEqual(self.delete('TES000001')['code'], 409)
+        self.assertEqual(self.delete(self.pending.pk)['code'], 409)
+
+    def test_failed_delete_is_resumed_by_id(self):
+        previous = self.fail_previous_job()
+        response = self.delete(self.pending.pk)
+        self.assertEqual(response['code'], 200)
+        job = BackgroundJob.objects.get(pk=response['data']['job_id'])
+        self.assertNotEqual(job.pk, previous.pk)
+        self.assertEqual(job.params, previous.params)
+
+    def test_word_code_takes_precedence_over_id(self):
+        # 与 get_object 一致：word_code 恰为另一词条的 id 时，删除的是 word_code 对应的词条
+        self.fail_previous_job()
+        visible = Dictionary.objects.create(word_code=str(self.pending.pk), word_name='红细胞', word_class='检验')
+        response = self.delete(visible.word_code)
+        self.assertEqual(response['code'], 200)
+        self.assertEqual(BackgroundJob.objects.get(pk=response['data']['job_id']).params['pk'], visible.pk)
+        self.assertTrue(Dictionary.all_objects.get(pk=visible.pk).pending_delete)
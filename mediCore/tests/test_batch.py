@@ -0,0 +1,98 @@
+from datetime import date, datetime
+
+from django.test import TestCase
+
+from mediCore.batch import (
+    STATUS_DELETED, STATUS_INVALID, STATUS_NOT_FOUND, STATUS_UPDATED, bulk_delete, bulk_update_values, resolve_items
+)
+from mediCore.models import Case, DataTable, DataTemplate, DataTemplateCategory, Dictionary, Identity
+from mediCore.serializers import CaseSerializer
+
+CHECK_TIME = '2025-06-18 08:30:00'
+
+
+class BatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        identity = Identity.objects.create(
+            identity_id='110101199003071234', name='张三', gender=1, birth_date=date(1990, 3, 7)
+        )
+        cls.case = Case.objects.create(
+            case_code='C000001', identity=identity, name='张三', gender=1, birth_date=date(1990, 3, 7)
+        )
+        category = DataTemplateCategory.objects.create(name='检验')
+        cls.template = DataTemplate.objects.create(template_code='T000001', template_name='血常规', category=category)
+        cls.dictionary = Dictionary.objects.create(word_code='TES000001', word_name='白细胞', word_class='检验')
+        cls.other_dictionary = Dictionary.objects.create(word_code='TES000002', word_name='红细胞', word_class='检验')
+        for dictionary, value in ((cls.dictionary, '5.1'), (cls.other_dictionary, '4.2')):
+            DataTable.objects.create(
+                case=cls.case, data_template=cls.template, dictionary=dictionary, value=value,
+                check_time=datetime(2025, 6, 18, 8, 30)
+            )
+
+    def item(self, **kwargs):
+        return {'case_code': 'C000001', 'template_code': 'T000001', 'word_code': 'TES000001',
+                'check_time': CHECK_TIME, **kwargs}
+
+    def test_resolve_items(self):
+        valid, invalid = resolve_items([{'word_code': 'TES000002', 'check_time': CHECK_TIME}],
+                                       {'case_code': 'C000001', 'template_code': 'T000001'})
+        self.assertEqual(invalid, [])
+        self.assertEqual(len(valid), 1)
+        index, item, key = valid[0]
+        self.assertEqual(index, 0)
+        self.assertEqual(item['case_code'], 'C000001')
+        self.assertEqual(key, (self.case.id, self.template.id, self.other_dictionary.id, datetime(2025, 6, 18, 8, 30)))
+
+    def test_resolve_items_invalid(self):
+        items = [
+            'not a dict',
+            self.item(word_code=''),
+            self.item(check_time='yesterday'),
+            self.item(case_code='C999999', word_code='TES999999'),
+        ]
+        valid, invalid = resolve_items(items, {})
+        self.assertEqual(valid, [])
+        self.assertEqual([result['status'] for result in invalid],
+                         [STATUS_INVALID, STATUS_INVALID, STATUS_INVALID, STATUS_NOT_FOUND])
+        self.assertIn('word_code', invalid[1]['msg'])
+        self.assertEqual(invalid[3]['msg'], '未找到: 病例编号C999999, 词条编号TES999999')
+
+    def test_resolve_items_require_value(self):
+        _, invalid = resolve_items([self.item()], {}, require_value=True)
+        self.assertEqual(invalid[0]['msg'], '请提供value')
+
+    def test_resolve_items_query_count(self):
+        items = [self.item(word_code=code) for code in ('TES000001', 'TES000002', 'TES999999')] * 20
+        with self.assertNumQueries(3):
+            resolve_items(items, {})
+
+    def test_bulk_update_values(self):
+        revision = Case.objects.get(pk=self.case.pk).data_revision
+        results = bulk_update_values([
+            self.item(value='6.0'),
+            self.item(word_code='TES000002', check_time='2025-06-19 08:30:00', value='1'),
+        ])
+        self.assertEqual([result['status'] for result in results], [STATUS_UPDATED, STATUS_NOT_FOUND])
+        self.assertEqual(DataTable.objects.get(dictionary=self.dictionary).value, '6.0')
+        self.assertEqual(DataTable.objects.get(dictionary=self.other_dictionary).value, '4.2')
+        self.case.refresh_from_db()
+        self.assertEqual(self.case.data_revision, revision + 1)
+
+    def test_case_update_keeps_data_revision(self):
+        # 序列化器中加载的病例在数据写入后才保存，不应把旧的修订号写回
+        case = Case.objects.get(pk=self.case.pk)
+        bulk_update_values([self.item(value='6.0')])
+        revision = Case.objects.get(pk=self.case.pk).data_revision
+        serializer = CaseSerializer(case, data={'name': '张三三', 'has_transplant_surgery': '是 2020-01-02'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        case.refresh_from_db()
+        self.assertEqual((case.name, case.transplant_date, case.data_revision), ('张三三', date(2020, 1, 2), revision))
+
+    def test_bulk_delete(self):
+        results = bulk_delete([self.item(check_time='2025-06-19 08:30:00'), self.item()])
+        self.assertEqual([(result['index'], result['status']) for result in results],
+                         [(0, STATUS_NOT_FOUND), (1, STATUS_DELETED)])
+        self.assertEqual(list(DataTable.objects.values_list('dictionary_id', flat=True)), [self.other_dictionary.id])
@@ -0,0 +1,86 @@
+import gzip
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from utils.compression import CompressionMiddleware, negotiate_encoding
+
+ENCODINGS = ['zstd', 'br', 'gzip']
+
+
+class NegotiateEncodingTests(SimpleTestCase):
+
+    def test_no_header(self):
+        self.assertIsNone(negotiate_encoding('', ENCODINGS))
+        self.assertIsNone(negotiate_encoding(None, ENCODINGS))
+
+    def test_server_preference_on_equal_quality(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate, br', ENCODINGS), 'br')
+        self.assertEqual(negotiate_encoding('gzip, br, zstd', ENCODINGS), 'zstd')
+
+    def test_client_quality(self):
+        self.assertEqual(negotiate_encoding('br;q=0.5, gzip;q=1.0', ENCODINGS), 'gzip')
+        self.assertEqual(negotiate_encoding('br; q=0.8, gzip; q=0.9', ENCODINGS), 'gzip')
+
+    def test_case_insensitive(self):
+        self.assertEqual(negotiate_encoding('GZIP', ENCODINGS), 'gzip')
+
+    def test_refused(self):
+        self.assertIsNone(negotiate_encoding('gzip;q=0', ENCODINGS))
+        self.assertIsNone(negotiate_encoding('identity', ENCODINGS))
+        self.assertIsNone(negotiate_encoding('gzip;q=abc', ENCODINGS))
+
+    def test_wildcard(self):
+        self.assertEqual(negotiate_encoding('*', ENCODINGS), 'zstd')
+        self.assertEqual(negotiate_encoding('*;q=0.5, gzip', ENCODINGS), 'gzip')
+        self.assertEqual(negotiate_encoding('*, zstd;q=0', ENCODINGS), 'br')
+
+    def test_only_available_encodings(self):
+        self.assertIsNone(negotiate_encoding('deflate', ENCODINGS))
+        self.assertEqual(negotiate_encoding('br, gzip', ['gzip']), 'gzip')
+        with override_settings(COMPRESSION_ENCODINGS=['snappy', 'gzip']):
+            self.assertEqual(negotiate_encoding('*'), 'gzip')
+
+
+@override_settings(COMPRESSION_ENABLED=True, COMPRESSION_MIN_SIZE=100, COMPRESSION_ENCODINGS=['gzip'])
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"code":200,"msg":"ok","data":"' + b'x' * 1000 + b'"}'
+
+    def process(self, response, path='/api/case/', **headers):
+        request = RequestFactory().get(path, **headers)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, content=None):
+        return HttpResponse(content if content is not None else self.body, content_type='application/json')
+
+    def test_compresses(self):
+        response = self.json_response()
+        response['ETag'] = '"abc"'
+        response = self.process(response, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_without_accept_encoding(self):
+        response = self.process(self.json_response())
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_skipped_responses(self):
+        small = self.process(self.json_response(b'{}'), HTTP_ACCEPT_ENCODING='gzip')
+        binary = self.process(HttpResponse(self.body, content_type='application/octet-stream'), HTTP_ACCEPT_ENCODING='gzip')
+        token = self.process(self.json_response(), path='/api/token/', HTTP_ACCEPT_ENCODING='gzip')
+        ranged = self.json_response()
+        ranged['Accept-Ranges'] = 'bytes'
+        ranged = self.process(ranged, HTTP_ACCEPT_ENCODING='gzip')
+        for response in (small, binary, token, ranged):
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming(self):
+        response = StreamingHttpResponse((self.body for _ in range(3)), content_type='application/json')
+        response = self.process(response, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.body * 3)
@@ -0,0 +1,120 @@
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.test import TransactionTestCase, override_settings
+from django.urls import path
+from django.views import View
+from rest_framework.views import APIView
+
+from mediCore.models import Case
+from utils.db_router import use_primary
+
+
+def read_alias():
+    return Case.objects.all().db
+
+
+def read_view(request):
+    return JsonResponse({'db': read_alias()})
+
+
+def write_then_read_view(request):
+    before = read_alias()
+    Case.objects.filter(pk=0).update(name='x')
+    return JsonResponse({'before': before, 'after': read_alias()})
+
+
+def use_primary_view(request):
+    with use_primary():
+        inside = read_alias()
+    return JsonResponse({'inside': inside, 'after': read_alias()})
+
+
+def atomic_view(request):
+    with transaction.atomic():
+        return JsonResponse({'db': read_alias()})
+
+
+def streaming_view(request):
+    def content():
+        yield read_alias()
+    return StreamingHttpResponse(content())
+
+
+class ReplicaQueryView(View):
+    read_replica = True
+
+    def post(self, request):
+        return JsonResponse({'db': read_alias()})
+
+
+class PrimaryStatusView(View):
+    read_replica = False
+
+    def get(self, request):
+        return JsonResponse({'db': read_alias()})
+
+
+class ReplicaQueryAPIView(APIView):
+    authentication_classes = []
+    permission_classes = []
+    read_replica = True
+
+    def post(self, request):
+        return JsonResponse({'db': read_alias()})
+
+
+urlpatterns = [
+    path('read/', read_view),
+    path('write/', write_then_read_view),
+    path('primary-block/', use_primary_view),
+    path('atomic/', atomic_view),
+    path('stream/', streaming_view),
+    path('query/', ReplicaQueryView.as_view()),
+    path('status/', PrimaryStatusView.as_view()),
+    path('api-query/', ReplicaQueryAPIView.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF='mediCore.tests.test_db_router')
+class ReplicaRouterTests(TransactionTestCase):
+    # TestCase 把每个测试包在主库事务中，事务内的读操作总是走主库
+    databases = {'default', 'replica'}
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self.client.get('/read/').json()['db'], 'replica')
+
+    def test_post_reads_from_primary(self):
+        self.assertEqual(self.client.post('/read/').json()['db'], 'default')
+
+    def test_reads_stick_to_primary_after_write(self):
+        data = self.client.get('/write/').json()
+        self.assertEqual(data, {'before': 'replica', 'after': 'default'})
+
+    def test_primary_header(self):
+        self.assertEqual(self.client.get('/read/', HTTP_X_READ_PRIMARY='1').json()['db'], 'default')
+        self.assertEqual(self.client.get('/read/', HTTP_X_READ_PRIMARY='0').json()['db'], 'replica')
+
+    def test_use_primary(self):
+        data = self.client.get('/primary-block/').json()
+        self.assertEqual(data, {'inside': 'default', 'after': 'replica'})
+
+    def test_primary_in_atomic_block(self):
+        self.assertEqual(self.client.get('/atomic/').json()['db'], 'default')
+
+    def test_read_replica_override(self):
+        self.assertEqual(self.client.post('/query/').json()['db'], 'replica')
+        self.assertEqual(self.client.get('/status/').json()['db'], 'default')
+        self.assertEqual(self.client.post('/api-query/').json()['db'], 'replica')
+
+    def test_streaming_response_keeps_request_state(self):
+        response = self.client.get('/stream/')
+        self.assertEqual(b''.join(response.streaming_content), b'replica')
+        response = self.client.get('/stream/', HTTP_X_READ_PRIMARY='1')
+        self.assertEqual(b''.join(response.streaming_content), b'default')
+
+    def test_outside_request_uses_primary(self):
+        self.assertEqual(read_alias(), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.client.get('/read/').json()['db'], 'default')
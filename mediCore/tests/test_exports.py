@@ -0,0 +1,80 @@
+from datetime import date, datetime
+
+from django.test import TestCase
+
+from mediCore.exports import csv_stream, iter_pivot_rows, pivot_columns
+from mediCore.models import (
+    Archive, ArchiveCase, Case, DataTable, DataTemplate, DataTemplateCategory, DataTemplateDictionary, Dictionary,
+    Identity
+)
+
+
+class PivotExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = DataTemplateCategory.objects.create(name='检验')
+        cls.template = DataTemplate.objects.create(template_code='T000001', template_name='血常规', category=category)
+        cls.wbc = Dictionary.objects.create(word_code='TES000002', word_name='白细胞', word_class='检验')
+        cls.rbc = Dictionary.objects.create(word_code='TES000001', word_name='红细胞', word_class='检验')
+        cls.wbc_other = Dictionary.objects.create(word_code='TES000003', word_name='白细胞', word_class='检验')
+        # 按加入模板的顺序，而不是词条 id 或编号
+        for dictionary in (cls.wbc, cls.rbc, cls.wbc_other):
+            DataTemplateDictionary.objects.create(data_template=cls.template, dictionary=dictionary)
+
+        identity = Identity.objects.create(
+            identity_id='110101199003071234', name='张三', gender=1, birth_date=date(1990, 3, 7)
+        )
+        cls.archive = Archive.objects.create(archive_code='A000001', archive_name='肾移植档案')
+        cls.cases = [
+            Case.objects.create(case_code=code, identity=identity, name='张三', gender=1, birth_date=date(1990, 3, 7))
+            for code in ('C000001', 'C000002', 'C000003')
+        ]
+        # C000003 不在档案中
+        for case in cls.cases[:2]:
+            ArchiveCase.objects.create(archive=cls.archive, case=case)
+
+        first, second = datetime(2025, 6, 18, 8, 30), datetime(2025, 6, 19, 8, 30)
+        rows = [
+            (cls.cases[0], cls.wbc, first, '5.1'),
+            (cls.cases[0], cls.rbc, first, '4.2'),
+            (cls.cases[0], cls.wbc, second, '6.0'),
+            (cls.cases[1], cls.wbc_other, first, ['a', 'b']),
+            (cls.cases[2], cls.wbc, first, '9.9'),
+        ]
+        for case, dictionary, check_time, value in rows:
+            DataTable.objects.create(
+                case=case, data_template=cls.template, dictionary=dictionary, check_time=check_time, value=value
+            )
+
+    def test_pivot_columns(self):
+        self.assertEqual(pivot_columns(self.template), [
+            (self.wbc.id, '白细胞(TES000002)'),
+            (self.rbc.id, '红细胞'),
+            (self.wbc_other.id, '白细胞(TES000003)'),
+        ])
+
+    def test_pivot_columns_empty_template(self):
+        template = DataTemplate.objects.create(
+            template_code='T000002', template_name='空模板', category=self.template.category
+        )
+        self.assertEqual(pivot_columns(template), [])
+
+    def test_iter_pivot_rows(self):
+        columns = pivot_columns(self.template)
+        rows = list(iter_pivot_rows(self.archive, self.template, columns, case_chunk_size=1, chunk_size=1))
+        self.assertEqual(rows, [
+            ['C000001', '张三', datetime(2025, 6, 18, 8, 30), '5.1', '4.2', None],
+            ['C000001', '张三', datetime(2025, 6, 19, 8, 30), '6.0', None, None],
+            ['C000002', '张三', datetime(2025, 6, 18, 8, 30), None, None, ['a', 'b']],
+        ])
+
+    def test_csv_stream(self):
+        columns = pivot_columns(self.template)
+        content = ''.join(csv_stream(columns, iter_pivot_rows(self.archive, self.template, columns)))
+        self.assertEqual(content.splitlines(), [
+            '\ufeffcase_code,name,check_time,白细胞(TES000002),红细胞,白细胞(TES000003)',
+            'C000001,张三,2025-06-18 08:30:00,5.1,4.2,',
+            'C000001,张三,2025-06-19 08:30:00,6.0,,',
+            'C000002,张三,2025-06-18 08:30:00,,,"[""a"", ""b""]"',
+        ])
@@ -0,0 +1,134 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from utils.mysql_pool.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_pool(self, **options):
+        self.opened = []
+
+        def connect():
+            connection = FakeConnection(len(self.opened))
+            self.opened.append(connection)
+            return connection
+
+        options.setdefault('timeout', 0.1)
+        return ConnectionPool(connect, lambda connection: connection.healthy, **options)
+
+    def test_reuses_released_connection(self):
+        pool = self.make_pool()
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+        stats = pool.stats()
+        self.assertEqual((stats['created'], stats['reused'], stats['in_use'], stats['idle']), (1, 1, 1, 0))
+
+    def test_last_returned_connection_first(self):
+        pool = self.make_pool()
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        pool.release(second)
+        self.assertIs(pool.acquire(), second)
+
+    def test_timeout_when_full(self):
+        pool = self.make_pool(max_size=2)
+        pool.acquire()
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_waiter_gets_released_connection(self):
+        pool = self.make_pool(max_size=1, timeout=5)
+        connection = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+        pool.release(connection)
+        waiter.join(5)
+        self.assertEqual(acquired, [connection])
+
+    def test_expired_connection_is_replaced(self):
+        pool = self.make_pool(max_lifetime=60)
+        connection = pool.acquire()
+        pool.release(connection)
+        pool._idle[-1].created_at -= 120
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['expired'], 1)
+
+    def test_unhealthy_connection_is_replaced(self):
+        pool = self.make_pool(check_after=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.healthy = False
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['unhealthy'], 1)
+
+    def test_suspect_connection_is_checked(self):
+        pool = self.make_pool(check_after=3600)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.healthy = False
+        # 未超过 check_after 的空闲连接不检查
+        self.assertIs(pool.acquire(), connection)
+        pool.release(connection, suspect=True)
+        self.assertIsNot(pool.acquire(), connection)
+
+    def test_discard_frees_slot(self):
+        pool = self.make_pool(max_size=1)
+        connection = pool.acquire()
+        pool.release(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.acquire(), connection)
+
+    def test_failed_connect_frees_slot(self):
+        pool = self.make_pool(max_size=1)
+        connect = pool.connect
+        pool.connect = lambda: 1 / 0
+        with self.assertRaises(ZeroDivisionError):
+            pool.acquire()
+        pool.connect = connect
+        pool.acquire()
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_foreign_connection_is_ignored(self):
+        pool = self.make_pool()
+        connection = FakeConnection(-1)
+        pool.release(connection)
+        self.assertFalse(connection.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+
+    def test_fill(self):
+        pool = self.make_pool(min_size=3, max_size=2)
+        self.assertEqual(pool.fill(), 2)
+        self.assertEqual(pool.fill(), 0)
+        self.assertEqual(pool.stats()['idle'], 2)
+
+    def test_close(self):
+        pool = self.make_pool()
+        idle, in_use = pool.acquire(), pool.acquire()
+        pool.release(idle)
+        pool.close()
+        self.assertTrue(idle.closed)
+        self.assertFalse(in_use.closed)
+        pool.release(in_use)
+        self.assertTrue(in_use.closed)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
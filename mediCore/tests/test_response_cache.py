@@ -0,0 +1,131 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from django.urls import path
+from rest_framework.views import APIView
+
+from utils.cache import bump_cache_version
+from utils.enums import ResponseCode
+from utils.response import APIResponse
+from utils.response_cache import ResponseCacheMixin
+
+calls = []
+
+
+class CachedView(ResponseCacheMixin, APIView):
+    authentication_classes = []
+    cache_tables = ['dictionary']
+
+    def get(self, request):
+        calls.append(request.method)
+        if request.query_params.get('fail'):
+            return APIResponse(response_code=ResponseCode.BAD_REQUEST, data='参数错误')
+        return APIResponse(data={'value': request.query_params.get('value', '')})
+
+    def post(self, request):
+        calls.append(request.method)
+        return APIResponse(data=request.data)
+
+
+class RevisionCachedView(CachedView):
+    revision = '1'
+
+    def get_cache_revision(self, request):
+        return RevisionCachedView.revision
+
+
+urlpatterns = [
+    path('cached/', CachedView.as_view()),
+    path('revision/', RevisionCachedView.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF='mediCore.tests.test_response_cache', RESPONSE_CACHE_ENABLED=True,
+                   CONDITIONAL_GET_ENABLED=True)
+class ResponseCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        calls.clear()
+
+    def test_miss_then_hit(self):
+        first = self.client.get('/cached/?value=a')
+        second = self.client.get('/cached/?value=a')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json()['data'], {'value': 'a'})
+        self.assertEqual(calls, ['GET'])
+
+    def test_query_string_is_part_of_key(self):
+        self.client.get('/cached/?value=a')
+        response = self.client.get('/cached/?value=b')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['data'], {'value': 'b'})
+
+    def test_version_bump_invalidates(self):
+        first = self.client.get('/cached/')
+        bump_cache_version('dictionary')
+        second = self.client.get('/cached/')
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        self.assertEqual(len(calls), 2)
+
+    def test_revision_is_part_of_key(self):
+        first = self.client.get('/revision/')
+        RevisionCachedView.revision = '2'
+        try:
+            second = self.client.get('/revision/')
+        finally:
+            RevisionCachedView.revision = '1'
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_error_responses_are_not_cached(self):
+        first = self.client.get('/cached/?fail=1')
+        second = self.client.get('/cached/?fail=1')
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertFalse(first.has_header('ETag'))
+        self.assertEqual(len(calls), 2)
+
+    def test_post_is_not_cached_by_default(self):
+        response = self.client.post('/cached/', {'a': 1}, content_type='application/json')
+        self.assertFalse(response.has_header('X-Cache'))
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_etag_and_cache_control(self):
+        response = self.client.get('/cached/')
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get('/cached/')['ETag']
+        calls.clear()
+        for header in (etag, 'W/' + etag, f'"other", {etag}', '*'):
+            with self.subTest(header=header):
+                response = self.client.get('/cached/', HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+        self.assertEqual(calls, [])
+
+    def test_stale_etag_returns_200(self):
+        etag = self.client.get('/cached/')['ETag']
+        bump_cache_version('dictionary')
+        response = self.client.get('/cached/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(CONDITIONAL_GET_ENABLED=False)
+    def test_conditional_get_disabled(self):
+        response = self.client.get('/cached/')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(self.client.get('/cached/', HTTP_IF_NONE_MATCH='*').status_code, 200)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_etag_without_response_cache(self):
+        etag = self.client.get('/cached/')['ETag']
+        response = self.client.get('/cached/')
+        self.assertFalse(response.has_header('X-Cache'))
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/cached/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(len(calls), 2)
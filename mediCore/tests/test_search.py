@@ -0,0 +1,86 @@
+from datetime import date
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from mediCore.models import Archive, ArchiveCase, Case, Identity
+from mediCore.search import search_cases, search_identities, tokenize
+
+
+class TokenizeTests(SimpleTestCase):
+
+    def test_digit_bigrams_are_not_tokens(self):
+        self.assertEqual(tokenize('19900'), {'1990', '9900'})
+        self.assertEqual(tokenize('123'), set())
+
+    def test_mixed_text(self):
+        self.assertEqual(tokenize('MZ12345'), {'mz', 'z1', '1234', '2345'})
+        self.assertEqual(tokenize('0003X'), {'0003', '3x'})
+        self.assertEqual(tokenize('张三'), {'张三'})
+        self.assertEqual(tokenize('张'), set())
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        people = [
+            ('110101199003071234', '张三', 'MZ0001'),
+            ('110101199003075678', '张三丰', 'MZ0002'),
+            ('110101198512311234', '李四', 'ZY1990'),
+            ('220101197001011990', '王五', None),
+        ]
+        cls.cases = {}
+        for index, (identity_id, name, opd_id) in enumerate(people, start=1):
+            identity = Identity.objects.create(identity_id=identity_id, name=name, gender=1, birth_date=date(1990, 1, 1))
+            cls.cases[name] = Case.objects.create(
+                case_code=f'C{index:06d}', identity=identity, name=name, gender=1, birth_date=date(1990, 1, 1),
+                opd_id=opd_id
+            )
+        archive = Archive.objects.create(archive_code='A000001', archive_name='肾移植档案')
+        ArchiveCase.objects.create(archive=archive, case=cls.cases['王五'])
+
+    def codes(self, query):
+        return list(search_cases(Case.objects.all(), query).values_list('case_code', flat=True))
+
+    def test_exact_before_prefix(self):
+        self.assertEqual(self.codes('张三'), ['C000001', 'C000002'])
+
+    def test_suffix_before_contains(self):
+        # 王五的身份证号以 1990 结尾，李四的门诊号包含 1990，其余身份证号包含 1990
+        self.assertEqual(self.codes('1990'), ['C000004', 'C000001', 'C000002', 'C000003'])
+
+    def test_long_suffix(self):
+        self.assertEqual(self.codes('199003071234'), ['C000001'])
+
+    def test_short_numeric_query_matches_prefix_and_suffix_only(self):
+        # 34 出现在身份证号末尾；123 只出现在身份证号中间，不足 4 位的数字不按包含匹配
+        self.assertEqual(self.codes('34'), ['C000001', 'C000003'])
+        self.assertEqual(self.codes('123'), [])
+        self.assertEqual(self.codes('1231'), ['C000003'])
+
+    def test_contains(self):
+        self.assertEqual(self.codes('z000'), ['C000001', 'C000002'])
+        self.assertEqual(self.codes('三丰'), ['C000002'])
+
+    def test_archive_code(self):
+        self.assertEqual(self.codes('a00000'), ['C000004'])
+
+    def test_case_insensitive(self):
+        self.assertEqual(self.codes('mz0002'), ['C000002'])
+
+    def test_respects_queryset(self):
+        queryset = Case.objects.exclude(case_code='C000001')
+        self.assertEqual(list(search_cases(queryset, '张三').values_list('case_code', flat=True)), ['C000002'])
+
+    @override_settings(SEARCH_RESULT_LIMIT=2)
+    def test_limit_keeps_best_ranks(self):
+        self.assertEqual(self.codes('1990'), ['C000004', 'C000001'])
+
+    def test_no_match(self):
+        self.assertEqual(self.codes('zz'), [])
+
+    def test_search_identities(self):
+        results = list(search_identities(Identity.objects.all(), '张三').values_list('name', flat=True))
+        self.assertEqual(results, ['张三', '张三丰'])
+        results = list(search_identities(Identity.objects.all(), '5678').values_list('name', flat=True))
+        self.assertEqual(results, ['张三丰'])
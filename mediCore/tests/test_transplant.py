@@ -0,0 +1,51 @@
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from mediCore.models import parse_transplant_surgery, parse_yes_no
+
+
+class ParseYesNoTests(SimpleTestCase):
+
+    def test_yes(self):
+        for text in ('是', '有', '已移植', 'Y', 'yes', 'TRUE', '1', '(是)', ' 是 '):
+            with self.subTest(text=text):
+                self.assertIs(parse_yes_no(text), True)
+
+    def test_no(self):
+        for text in ('否', '无', '未移植', 'n', 'No', 'false', '0'):
+            with self.subTest(text=text):
+                self.assertIs(parse_yes_no(text), False)
+
+    def test_unknown(self):
+        for text in (None, '', '未填写', '未知', '不详', '-'):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_yes_no(text))
+
+    def test_ambiguous_text_is_not_matched_by_prefix(self):
+        for text in ('有待确认', '是否', '10', '01', 'n/a', 'none', 'yesterday', '已经', '未定'):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_yes_no(text))
+
+
+class ParseTransplantSurgeryTests(SimpleTestCase):
+
+    def test_yes_with_date(self):
+        for text in ('是(2025-5-27)', '是（2025年5月27日）', '是2025/05/27', '是，2025.5.27', '已移植 2025-05-27'):
+            with self.subTest(text=text):
+                self.assertEqual(parse_transplant_surgery(text), (True, date(2025, 5, 27)))
+
+    def test_date_only_means_transplanted(self):
+        self.assertEqual(parse_transplant_surgery('2025-5-27'), (True, date(2025, 5, 27)))
+
+    def test_invalid_date(self):
+        self.assertEqual(parse_transplant_surgery('是(2025-13-40)'), (True, None))
+
+    def test_no_drops_date(self):
+        self.assertEqual(parse_transplant_surgery('否(2025-5-27)'), (False, None))
+        self.assertEqual(parse_transplant_surgery('否'), (False, None))
+
+    def test_unknown_and_ambiguous(self):
+        for text in (None, '', '未填写', '有待确认', '10'):
+            with self.subTest(text=text):
+                self.assertEqual(parse_transplant_surgery(text), (None, None))
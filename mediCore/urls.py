@@ -10,7 +10,13 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from accounts.views import RegisterView, LoginView
 from .views import (
     DictionaryViewSet, DataTemplateViewSet, ArchiveViewSet, CaseViewSet,
-    IdentityViewSet, DataTableViewSet, DataTemplateCategoryViewSet, DataTableCRUDView
+    IdentityViewSet, DataTableViewSet, DataTemplateCategoryViewSet, DataTableCRUDView,
+    BackgroundJobViewSet, DataTableSessionView, DataTableSessionCopyForwardView, LivenessView, ReadinessView,
+    DatabasePoolStatsView, ResponseCacheStatsView
+)
+from .async_views import (
+    AsyncCaseTemplateSummaryView, AsyncCaseTemplateDetailView, AsyncCaseVisualizationDataView,
+    AsyncCaseVisualizationYAxisTimesView, AsyncCaseVisualizationXAxisOptionsView
 )
 from mediCore.views import PatientMergedCaseListView, CaseTemplateSummaryView, CaseTemplateDetailView, CaseVisualizationDataView, CaseVisualizationYAxisTimesView, CaseVisualizationXAxisOptionsView
 
@@ -23,6 +29,7 @@ router.register(r'archive', ArchiveViewSet, basename='archive')
 router.register(r'case', CaseViewSet, basename='case')
 router.register(r'patient', IdentityViewSet, basename='patient')
 router.register(r'data', DataTableViewSet, basename='data')
+router.register(r'job', BackgroundJobViewSet, basename='job')
 
 # Swagger文档配置
 schema_view = get_schema_view(
@@ -61,5 +68,17 @@ urlpatterns = [
     path('api/case-visualization-data/', CaseVisualizationDataView.as_view(), name='case-visualization-data'),
     path('api/case-visualization-yaxis-options/', CaseVisualizationYAxisTimesView.as_view(), name='case-visualization-yaxis-options'),
     path('api/case-visualization-xaxis-options/', CaseVisualizationXAxisOptionsView.as_view(), name='case-visualization-xaxis-options'),
+    # 病例查询接口的异步版本（参数和响应与上面的同步版本相同）
+    path('api/async/case-template-summary/', AsyncCaseTemplateSummaryView.as_view(), name='async-case-template-summary'),
+    path('api/async/case-template-detail/', AsyncCaseTemplateDetailView.as_view(), name='async-case-template-detail'),
+    path('api/async/case-visualization-data/', AsyncCaseVisualizationDataView.as_view(), name='async-case-visualization-data'),
+    path('api/async/case-visualization-yaxis-options/', AsyncCaseVisualizationYAxisTimesView.as_view(), name='async-case-visualization-yaxis-options'),
+    path('api/async/case-visualization-xaxis-options/', AsyncCaseVisualizationXAxisOptionsView.as_view(), name='async-case-visualization-xaxis-options'),
     path('api/data-table-crud/', DataTableCRUDView.as_view(), name='data-table-crud'),
+    path('api/health/live/', LivenessView.as_view(), name='health-live'),
+    path('api/health/ready/', ReadinessView.as_view(), name='health-ready'),
+    path('api/health/db-pool/', DatabasePoolStatsView.as_view(), name='health-db-pool'),
+    path('api/health/response-cache/', ResponseCacheStatsView.as_view(), name='health-response-cache'),
+    path('api/data-table-session/', DataTableSessionView.as_view(), name='data-table-session'),
+    path('api/data-table-session/copy-forward/', DataTableSessionCopyForwardView.as_view(), name='data-table-session-copy-forward'),
 ]
\ No newline at end of file
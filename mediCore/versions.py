@@ -0,0 +1,35 @@
+"""
+缓存版本号与病例数据修订号
+
+表级版本号以表名命名，表数据变化时更换为新的时间戳（bump_cache_version 写入 time.time_ns()，缓存清空后也不会与旧值重复），
+分页总数、分面统计、响应缓存的键中都包含相关表的版本号。
+病例的检查数据（DataTable）变化时，在写入的同一事务中把病例的 data_revision 加一：
+病例查询接口用它生成 ETag 和缓存键，录入其他病例的数据不会使其失效，事务回滚时修订号也一并回滚。
+
+单条保存 / 删除由 signals 中的信号处理函数调用；批量操作（bulk_create、update、QuerySet.delete）不触发信号，
+需在操作所在的事务中显式调用 touch_cases。
+"""
+from django.db import transaction
+from django.db.models import F
+
+from utils.cache import bump_cache_version
+from .models import Case
+
+# 病例查询接口（模板汇总、检查详情、可视化）依赖的表；病例的检查数据由 Case.data_revision 覆盖
+CASE_DATA_TABLES = ['case', 'data_template', 'data_template_category', 'data_template_dictionary', 'dictionary']
+
+
+def bump_on_commit(*names):
+    """当前事务提交后再更换版本号（提交前更换，并发的读请求可能把旧数据缓存到新版本号下）"""
+    transaction.on_commit(lambda: bump_cache_version(*names))
+
+
+def touch_cases(case_ids):
+    """
+    病例的检查数据变化：当前事务中各病例的 data_revision 加一，
+    提交后把 data_table 表的版本号更换为新的时间戳（time.time_ns()，见 bump_cache_version）
+    """
+    case_ids = set(case_ids)
+    if case_ids:
+        Case.all_objects.filter(pk__in=case_ids).update(data_revision=F('data_revision') + 1)
+    bump_on_commit('data_table')
@@ -1,35 +1,135 @@
 from utils.viewsets import CustomModelViewSet
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Prefetch
+from django.db.models import Prefetch
+from django.db import IntegrityError, DatabaseError, connection, transaction
 from rest_framework.viewsets import GenericViewSet
 from rest_framework import mixins, status
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 import csv
+import os
 import codecs
-from .models import Dictionary, DataTemplate, Archive, Case, Identity, DataTable, DataTemplateCategory
+from .models import Dictionary, DataTemplate, Archive, Case, Identity, DataTable, DataTemplateCategory, BackgroundJob
 from .serializers import (
     DictionarySerializer, DataTemplateSerializer,
     ArchiveListSerializer, ArchiveDetailSerializer, ArchiveSerializer,
     CaseListSerializer, CaseDetailSerializer, CaseSerializer,
     IdentitySerializer, PatientDetailSerializer, DataTableDetailSerializer,
     DataTableSerializer, DataTableBulkCreateSerializer,
-    DataTemplateCategorySerializer, DictionaryBulkImportSerializer,
+    DataTemplateCategorySerializer, DictionaryBulkImportSerializer, CaseBulkImportSerializer,
+    ArchiveCaseBatchSerializer, BackgroundJobSerializer, ExportJobSerializer, DictionaryMergeSerializer,
+    DataTableCopyForwardSerializer, DataTableSessionSerializer, DataTableSessionRetimeSerializer,
     PatientMergedCaseSerializer, CaseVisualizationOptionSerializer,
     CaseVisualizationDataSerializer, CaseVisualizationDataPointSerializer
 )
-from utils.pagination import StandardPagination
+from utils.pagination import StandardPagination, StandardCursorPagination
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import AllowAny
-from drf_yasg.utils import swagger_auto_schema
+from rest_framework.exceptions import MethodNotAllowed
+from utils.download import ranged_file_response
+from utils.mysql_pool.pool import pool_stats
+from utils.response_cache import ResponseCacheMixin, response_cache_stats
+from drf_yasg.utils import swagger_auto_schema, no_body
 from drf_yasg import openapi
 from rest_framework import serializers
 from datetime import date
 from django.utils.dateparse import parse_datetime
 from utils.response import APIResponse
 from utils.enums import ResponseCode
+from .search import search_cases, search_identities
+from .exports import (
+    filter_case_data, iter_case_data, ndjson_stream, json_array_stream,
+    PIVOT_FILE_FORMATS, EXPORT_ARCHIVE, pivot_columns, iter_pivot_rows, csv_stream, export_file_path
+)
+from .warmup import is_ready, warm_up_in_background
+from .batch import bulk_update_values, bulk_delete, STATUS_UPDATED, STATUS_DELETED
+from .sessions import session_rows, copy_forward, retime_session, delete_session
+from .versions import CASE_DATA_TABLES, touch_cases
+from .jobs import (
+    schedule_delete, schedule_merge, find_resumable_delete, find_resumable_merge, enqueue_job, cancel_job,
+    is_cancellable,
+)
+from .filters import filter_cases, filter_transplant, case_facets, TRANSPLANT_FILTER_PARAMS
+from .membership import (
+    add_archive_cases, remove_archive_cases, iter_case_code_chunks, iter_filtered_case_chunks
+)
 
-class DictionaryViewSet(CustomModelViewSet):
+CASE_FILTER_PARAMETERS = [
+    openapi.Parameter('search', openapi.IN_QUERY, description="检索档案编号、身份证号、门诊号、住院号、姓名", type=openapi.TYPE_STRING),
+    openapi.Parameter('gender', openapi.IN_QUERY, description="性别 0-女 1-男，多个用逗号分隔", type=openapi.TYPE_STRING),
+    openapi.Parameter('blood_type', openapi.IN_QUERY, description="血型，多个用逗号分隔", type=openapi.TYPE_STRING),
+    openapi.Parameter('age_min', openapi.IN_QUERY, description="最小年龄", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('age_max', openapi.IN_QUERY, description="最大年龄", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('archive_code', openapi.IN_QUERY, description="档案编号，多个用逗号分隔", type=openapi.TYPE_STRING),
+    openapi.Parameter('diagnosis', openapi.IN_QUERY, description="主要诊断关键词，多个关键词需同时包含", type=openapi.TYPE_STRING),
+]
+
+TRANSPLANT_FILTER_PARAMETERS = [
+    openapi.Parameter('transplanted', openapi.IN_QUERY, description="是否行移植手术 0-否 1-是", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('transplant_date_from', openapi.IN_QUERY, description="移植手术日期起（YYYY-MM-DD）", type=openapi.TYPE_STRING),
+    openapi.Parameter('transplant_date_to', openapi.IN_QUERY, description="移植手术日期止（YYYY-MM-DD）", type=openapi.TYPE_STRING),
+    openapi.Parameter('in_transplant_queue', openapi.IN_QUERY, description="是否在移植排队 0-否 1-是", type=openapi.TYPE_INTEGER),
+]
+CASE_FILTER_PARAMETERS += TRANSPLANT_FILTER_PARAMETERS
+
+CASE_DATA_FILTER_PARAMETERS = [
+    openapi.Parameter('start_time', openapi.IN_QUERY, description="检查时间起（YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS）", type=openapi.TYPE_STRING),
+    openapi.Parameter('end_time', openapi.IN_QUERY, description="检查时间止（YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS）", type=openapi.TYPE_STRING),
+    openapi.Parameter('template_code', openapi.IN_QUERY, description="模板编号，多个用逗号分隔", type=openapi.TYPE_STRING),
+]
+
+
+class BackgroundDestroyMixin:
+    """
+    删除时只把对象标记为 pending_delete（立即对所有接口隐藏）并提交后台级联删除任务，
+    接口耗时与关联数据量无关；删除进度通过 GET /api/job/{job_id}/ 查询。
+    删除任务失败后对同一对象再次调用删除接口即重新提交任务
+    """
+
+    def get_pending_delete_lookups(self):
+        """
+        按顺序尝试的查找条件，需与 get_object 的查找规则一致；第一个命中的对象即 URL 指向的对象
+        （含已提交删除的对象）。默认只按 lookup_field 查找
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return [{self.lookup_field: self.kwargs[lookup_url_kwarg]}]
+
+    def pending_delete_response(self):
+        """
+        对象已提交删除（已隐藏）时的响应：上次的删除任务失败则重新提交，从剩余数据继续；
+        任务仍在执行或对象正在合并时返回 409。对象未提交删除时返回 None
+        """
+        model = self.get_queryset().model
+        instance = None
+        for lookup in self.get_pending_delete_lookups():
+            instance = model.all_objects.filter(**lookup).first()
+            if instance is not None:
+                break
+        if instance is None or not instance.pending_delete:
+            return None
+        previous = find_resumable_delete(instance)
+        if previous is None:
+            return APIResponse(response_code=ResponseCode.CONFLICT, data='正在删除或合并中，请通过后台任务查询进度')
+        job = enqueue_job('cascade_delete', previous.params)
+        return APIResponse(response_code=ResponseCode.SUCCESS, data={"job_id": job.id, "status": job.status})
+
+    def destroy(self, request, *args, **kwargs):
+        pending = self.pending_delete_response()
+        if pending is not None:
+            return pending
+        try:
+            instance = self.get_object()
+            job = schedule_delete(instance)
+            return APIResponse(
+                response_code=ResponseCode.SUCCESS,
+                data={"job_id": job.id, "status": job.status}
+            )
+        except Exception as e:
+            return APIResponse(response_code=ResponseCode.INTERNAL_ERROR, data=str(e))
+
+
+class DictionaryViewSet(BackgroundDestroyMixin, CustomModelViewSet):
     """
     API endpoint for 系统词条 (System Dictionary).
 
@@ -47,8 +147,11 @@ class DictionaryViewSet(CustomModelViewSet):
     - **Update**: PUT /api/dictionary/{word_code or id}/ (all fields except word_code)
     - **Partial Update**: PATCH /api/dictionary/{word_code or id}/ (specified fields except word_code)
     - **Delete**: DELETE /api/dictionary/{word_code or id}/
+    - **Merge**: POST /api/dictionary/{word_code}/merge/
+      - 把该词条的数据合并到 target 词条后删除该词条，冲突策略 policy: keep_target / keep_source
     """
     queryset = Dictionary.objects.all().order_by('word_code')
+    cache_tables = ['dictionary']
     serializer_class = DictionarySerializer
     lookup_field = 'word_code'
     pagination_class = StandardPagination
@@ -69,10 +172,63 @@ class DictionaryViewSet(CustomModelViewSet):
                     pass
         self.does_not_exist()
 
+    def get_pending_delete_lookups(self):
+        # 与 get_object 相同：优先按 word_code，参数为纯数字时再按 id
+        lookup_value = str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        lookups = [{'word_code': lookup_value}]
+        if lookup_value.isdigit():
+            lookups.append({'id': int(lookup_value)})
+        return lookups
+
     def does_not_exist(self):
         from rest_framework.exceptions import NotFound
         raise NotFound('未找到对应的词条（word_code 或 id）')
 
+    @swagger_auto_schema(
+        operation_description="合并重复词条：把当前词条（源）的全部数据按块合并到目标词条，完成后删除源词条。"
+                              "源词条立即隐藏，合并由后台任务执行，进度通过 GET /api/job/{job_id}/ 查询。"
+                              "任务失败或取消后，对同一源词条再次提交即从剩余数据继续。",
+        request_body=DictionaryMergeSerializer,
+        responses={
+            200: openapi.Response(
+                description="已提交合并任务",
+                examples={
+                    "application/json": {
+                        "code": 200,
+                        "msg": "操作成功",
+                        "data": {"job_id": 15, "status": "pending", "source": "TES000012", "target": "TES000003"}
+                    }
+                }
+            )
+        }
+    )
+    @action(detail=True, methods=['post'], url_path='merge')
+    def merge(self, request, word_code=None):
+        """合并词条"""
+        source = Dictionary.all_objects.filter(word_code=word_code).first()
+        if source is not None and source.pending_delete:
+            # 源词条已隐藏：只能继续上次失败或取消的合并任务
+            previous = find_resumable_merge(source)
+            if previous is None:
+                return APIResponse(response_code=ResponseCode.BAD_REQUEST, data='词条已删除或正在合并')
+            # 目标词条在此期间可能已被删除或合并，先确认再提交任务
+            target = Dictionary.objects.filter(pk=previous.params['target_id']).first()
+            if target is None:
+                return APIResponse(response_code=ResponseCode.BAD_REQUEST, data='合并目标词条已删除，无法继续合并')
+            job = enqueue_job('merge_dictionary', previous.params)
+        else:
+            source = self.get_object()
+            serializer = DictionaryMergeSerializer(data=request.data, context={'source': source})
+            serializer.is_valid(raise_exception=True)
+            target = serializer.validated_data['target']
+            job = schedule_merge(source, target, serializer.validated_data['policy'])
+        return APIResponse(data={
+            "job_id": job.id,
+            "status": job.status,
+            "source": source.word_code,
+            "target": target.word_code
+        })
+
     @swagger_auto_schema(
         operation_description="""
         创建或更新词条：
@@ -287,7 +443,7 @@ class DictionaryViewSet(CustomModelViewSet):
         # 否则走原有分页逻辑
         return super().list(request, *args, **kwargs)
 
-class DataTemplateViewSet(CustomModelViewSet):
+class DataTemplateViewSet(BackgroundDestroyMixin, CustomModelViewSet):
     """
     API endpoint for 临床模板管理.
 
@@ -308,11 +464,12 @@ class DataTemplateViewSet(CustomModelViewSet):
     - **Delete**: DELETE /api/data-template/{template_code}/
     """
     queryset = DataTemplate.objects.all().order_by('template_code')
+    cache_tables = ['data_template', 'data_template_category', 'data_template_dictionary', 'dictionary']
     serializer_class = DataTemplateSerializer
     lookup_field = 'template_code'
     pagination_class = StandardPagination
 
-class ArchiveViewSet(CustomModelViewSet):
+class ArchiveViewSet(BackgroundDestroyMixin, CustomModelViewSet):
     """
     API endpoint for 专病档案管理.
 
@@ -377,7 +534,7 @@ class ArchiveViewSet(CustomModelViewSet):
       ```
     
     - **Retrieve**: GET /api/archive/{archive_code}/
-      - 返回档案详细信息
+      - 返回档案详细信息，case_list 只包含第一页病例，case_has_more 表示是否还有更多
 
       响应示例:
       ```json
@@ -389,17 +546,29 @@ class ArchiveViewSet(CustomModelViewSet):
               "archive_name": "肾移植档案",
               "archive_description": "收集肾移植患者的术前术后检查数据",
               "created_at": "2025-05-27T10:00:00",
-              "cases": [
+              "case_list": [
                   {
                       "case_code": "C000001",
                       "name": "张三",
                       "gender": "男",
                       "age": 45
                   }
-              ]
+              ],
+              "case_has_more": true
           }
       }
       ```
+
+    - **Cases**: GET /api/archive/{archive_code}/cases/
+      - 档案下的全部病例，游标分页: ?page_size=10，通过返回的 next/previous 链接翻页
+
+    - **Add Cases**: POST /api/archive/{archive_code}/cases/add/
+    - **Remove Cases**: POST /api/archive/{archive_code}/cases/remove/
+      - 批量加入/移出病例，请求体为 {"case_codes": [...]} 或 {"filter": {"gender": "1", ...}}
+
+    - **Export**: GET /api/archive/{archive_code}/export/?template_code=T000001&file_format=csv
+      - 按模板导出宽表：每个 (病例, 检查时间) 一行、每个词条一列，file_format 为 csv（默认）或 parquet
+      - parquet 提交为后台导出任务，返回 job_id，完成后通过 /api/job/{job_id}/download/ 下载
     
     - **Update**: PUT /api/archive/{archive_code}/
       - 可更新：archive_name, archive_description
@@ -449,6 +618,7 @@ class ArchiveViewSet(CustomModelViewSet):
     }
     """
     queryset = Archive.objects.all().order_by('archive_code')
+    cache_tables = ['archive', 'archive_case', 'case', 'identity']
     serializer_class = ArchiveSerializer
     lookup_field = 'archive_code'
     pagination_class = StandardPagination
@@ -461,7 +631,127 @@ class ArchiveViewSet(CustomModelViewSet):
             return ArchiveDetailSerializer
         return ArchiveSerializer
 
-class CaseViewSet(CustomModelViewSet):
+    @swagger_auto_schema(
+        operation_description="获取档案下的病例列表（游标分页，通过 next/previous 链接翻页）",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="分页游标", type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="每页数量", type=openapi.TYPE_INTEGER),
+        ]
+    )
+    @action(detail=True, methods=['get'], url_path='cases')
+    def cases(self, request, archive_code=None):
+        """档案下的病例列表（游标分页）"""
+        archive = self.get_object()
+        queryset = CaseListSerializer.setup_eager_loading(archive.cases.all())
+        paginator = StandardCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = CaseListSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    def _apply_case_batch(self, request, operation):
+        archive = self.get_object()
+        serializer = ArchiveCaseBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        not_found = []
+        if 'case_codes' in serializer.validated_data:
+            chunks = iter_case_code_chunks(serializer.validated_data['case_codes'], not_found)
+        else:
+            chunks = iter_filtered_case_chunks(serializer.validated_data['filter'])
+        changed = operation(archive, chunks)
+        return archive, changed, not_found
+
+    @swagger_auto_schema(
+        operation_description="批量把病例加入档案：提交病例编号列表或病例筛选条件（二选一），"
+                              "按块插入关联，已在档案中的病例自动忽略。",
+        request_body=ArchiveCaseBatchSerializer,
+        responses={
+            200: openapi.Response(
+                description="操作成功",
+                examples={
+                    "application/json": {
+                        "code": 200,
+                        "msg": "成功加入2个病例",
+                        "data": {"archive_code": "A000001", "added": 2, "not_found": ["C999999"]}
+                    }
+                }
+            )
+        }
+    )
+    @action(detail=True, methods=['post'], url_path='cases/add')
+    def add_cases(self, request, archive_code=None):
+        """批量把病例加入档案"""
+        archive, added, not_found = self._apply_case_batch(request, add_archive_cases)
+        return APIResponse(
+            data={'archive_code': archive.archive_code, 'added': added, 'not_found': not_found},
+            msg=f'成功加入{added}个病例'
+        )
+
+    @swagger_auto_schema(
+        operation_description="批量把病例移出档案：提交病例编号列表或病例筛选条件（二选一），按块删除关联。",
+        request_body=ArchiveCaseBatchSerializer,
+        responses={
+            200: openapi.Response(
+                description="操作成功",
+                examples={
+                    "application/json": {
+                        "code": 200,
+                        "msg": "成功移出2个病例",
+                        "data": {"archive_code": "A000001", "removed": 2, "not_found": []}
+                    }
+                }
+            )
+        }
+    )
+    @action(detail=True, methods=['post'], url_path='cases/remove')
+    def remove_cases(self, request, archive_code=None):
+        """批量把病例移出档案"""
+        archive, removed, not_found = self._apply_case_batch(request, remove_archive_cases)
+        return APIResponse(
+            data={'archive_code': archive.archive_code, 'removed': removed, 'not_found': not_found},
+            msg=f'成功移出{removed}个病例'
+        )
+
+    @swagger_auto_schema(
+        operation_description="按模板导出档案数据宽表：每个 (病例, 检查时间) 一行，"
+                              "列为 case_code、name、check_time 及模板的各词条（按加入模板的顺序）。"
+                              "csv 边查询边输出；parquet 提交为后台导出任务（返回 job_id），"
+                              "完成后通过 GET /api/job/{job_id}/download/ 下载。",
+        manual_parameters=[
+            openapi.Parameter('template_code', openapi.IN_QUERY, description="模板编号", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('file_format', openapi.IN_QUERY, description="文件格式 csv / parquet", type=openapi.TYPE_STRING),
+        ]
+    )
+    @action(detail=True, methods=['get'], url_path='export')
+    def export(self, request, archive_code=None):
+        """按模板导出档案数据宽表"""
+        archive = self.get_object()
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in PIVOT_FILE_FORMATS:
+            return APIResponse(response_code=ResponseCode.BAD_REQUEST, data={'file_format': '只支持 csv 或 parquet'})
+        template_code = request.query_params.get('template_code')
+        template = DataTemplate.objects.filter(template_code=template_code).first() if template_code else None
+        if template is None:
+            return APIResponse(response_code=ResponseCode.BAD_REQUEST, data={'template_code': '请提供有效的模板编号'})
+
+        if file_format == 'parquet':
+            # Parquet 需写完整个文件才能下载，交给后台导出任务，不占用请求线程
+            serializer = ExportJobSerializer(data={
+                'export_type': EXPORT_ARCHIVE, 'file_format': file_format,
+                'archive_code': archive.archive_code, 'template_code': template.template_code,
+            })
+            if not serializer.is_valid():
+                return APIResponse(response_code=ResponseCode.BAD_REQUEST, data=serializer.errors)
+            job = enqueue_job('export', serializer.validated_data)
+            return APIResponse(data={'job_id': job.id, 'status': job.status}, msg='导出任务已提交')
+
+        columns = pivot_columns(template)
+        records = iter_pivot_rows(archive, template, columns)
+        filename = f'{archive.archive_code}_{template.template_code}.{file_format}'
+        response = StreamingHttpResponse(csv_stream(columns, records), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class CaseViewSet(BackgroundDestroyMixin, CustomModelViewSet):
     """
     API endpoint for 病例管理.
 
@@ -473,7 +763,9 @@ class CaseViewSet(CustomModelViewSet):
     
     - **List**: GET /api/case/
       - 支持分页: ?page=1&page_size=10
-      - 支持模糊搜索: ?search=xxx（可模糊搜索档案编号、身份证号、门诊号、住院号、姓名）
+      - 支持筛选: ?gender=1&blood_type=A型,O型&age_min=18&age_max=60&archive_code=A000001&diagnosis=肾衰竭
+      - 移植筛选: ?transplanted=1&transplant_date_from=2024-01-01&transplant_date_to=2024-12-31&in_transplant_queue=0
+      - 支持检索: ?search=xxx（档案编号、身份证号、门诊号、住院号、姓名及其拼音首字母，按相关度排序）
     
     - **Retrieve**: GET /api/case/{case_code}/
       - 返回病例详细信息，包括关联的档案
@@ -487,8 +779,15 @@ class CaseViewSet(CustomModelViewSet):
     
     - **Identity Cases**: GET /api/case/identity/{identity_id}/
       - 获取指定身份证号的所有病例
+
+    - **Facets**: GET /api/case/facets/
+      - 与列表相同的筛选参数，返回各维度的病例数
+
+    - **Import**: POST /api/case/import/
+      - 上传 CSV/NDJSON 文件批量导入病例，返回逐行错误
     """
     queryset = Case.objects.all().order_by('case_code')
+    cache_tables = ['case', 'identity', 'archive_case', 'archive']
     serializer_class = CaseSerializer
     lookup_field = 'case_code'
     pagination_class = StandardPagination
@@ -501,24 +800,95 @@ class CaseViewSet(CustomModelViewSet):
         return CaseSerializer
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = CaseListSerializer.setup_eager_loading(super().get_queryset())
+        if self.action == 'list':
+            queryset = filter_cases(queryset, self.request.query_params)
         search = self.request.query_params.get('search', None)
         if search:
-            # 支持搜索档案编号、身份证号、门诊号、住院号、姓名
-            return queryset.filter(
-                Q(archives__archive_code__icontains=search) |
-                Q(identity__identity_id__icontains=search) |
-                Q(opd_id__icontains=search) |
-                Q(inhospital_id__icontains=search) |
-                Q(name__icontains=search)
-            ).distinct()
+            # 支持搜索档案编号、身份证号、门诊号、住院号、姓名（含拼音首字母），按相关度排序
+            return search_cases(queryset, search)
         return queryset
 
+    @swagger_auto_schema(manual_parameters=CASE_FILTER_PARAMETERS + [
+        openapi.Parameter('page', openapi.IN_QUERY, description="页码", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('page_size', openapi.IN_QUERY, description="每页数量", type=openapi.TYPE_INTEGER),
+    ])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @swagger_auto_schema(
-        operation_description="删除病例。如果删除的病例是该患者的最后一个病例，则同时删除患者信息。",
+        operation_description="批量导入病例：上传 UTF-8 编码的 CSV 或 NDJSON 文件，列名与病例字段一致（identity、name、gender、"
+                              "opd_id、inhospital_id、blood_type、main_diagnosis、archive_codes 等），"
+                              "患者按身份证号批量新增或更新，逐行返回校验错误。",
+        request_body=CaseBulkImportSerializer,
         responses={
             200: openapi.Response(
-                description="成功删除病例",
+                description="导入完成",
+                examples={
+                    "application/json": {
+                        "code": 200,
+                        "msg": "成功导入2条病例，失败1条",
+                        "data": {
+                            "success_count": 2,
+                            "error_count": 1,
+                            "errors": [{"line": 3, "errors": ["请提供有效的18位身份证号"]}],
+                            "case_codes": ["C000101", "C000102"]
+                        }
+                    }
+                }
+            )
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """批量导入病例"""
+        serializer = CaseBulkImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return APIResponse(response_code=ResponseCode.BAD_REQUEST, data=serializer.errors)
+        result = serializer.save()
+        return APIResponse(
+            data=result,
+            msg=f"成功导入{result['success_count']}条病例，失败{result['error_count']}条"
+        )
+
+    @swagger_auto_schema(
+        operation_description="病例分面统计：按当前筛选条件返回各性别、血型、年龄段、档案的病例数。"
+                              "每个维度统计时不应用该维度自身的筛选条件。",
+        manual_parameters=CASE_FILTER_PARAMETERS,
+        responses={
+            200: openapi.Response(
+                description="成功返回分面统计",
+                examples={
+                    "application/json": {
+                        "code": 200,
+                        "msg": "操作成功",
+                        "data": {
+                            "total": 120,
+                            "gender": [{"value": 1, "count": 70}, {"value": 0, "count": 50}],
+                            "blood_type": [{"value": "O型", "count": 60}],
+                            "age_group": [{"value": "40-59", "count": 80}],
+                            "archive": [{"value": "A000001", "name": "肾移植档案", "count": 120}]
+                        }
+                    }
+                }
+            )
+        }
+    )
+    @action(detail=False, methods=['get'], url_path='facets')
+    def facets(self, request):
+        """病例分面统计"""
+        queryset = Case.objects.all()
+        search = request.query_params.get('search')
+        if search:
+            queryset = search_cases(queryset, search)
+        return APIResponse(data=case_facets(queryset, request.query_params))
+
+    @swagger_auto_schema(
+        operation_description="删除病例。如果删除的病例是该患者的最后一个病例，则同时删除患者信息。"
+                              "病例立即隐藏，关联数据由后台任务分块删除，进度通过 GET /api/job/{job_id}/ 查询。",
+        responses={
+            200: openapi.Response(
+                description="已提交删除",
                 examples={
                     "application/json": {
                         "code": 200,
@@ -526,7 +896,8 @@ class CaseViewSet(CustomModelViewSet):
                         "data": {
                             "deleted_case_code": "C000031",
                             "deleted_patient": True,
-                            "patient_identity_id": "XXXXXXXXXXXXXX"
+                            "patient_identity_id": "XXXXXXXXXXXXXX",
+                            "job_id": 12
                         }
                     }
                 }
@@ -539,28 +910,34 @@ class CaseViewSet(CustomModelViewSet):
         """
         删除病例，如果删除的病例是该患者的最后一个病例，则同时删除患者信息
         """
+        pending = self.pending_delete_response()
+        if pending is not None:
+            return pending
         try:
             instance = self.get_object()
             
             # 获取患者信息
             patient = instance.identity
             patient_identity_id = patient.identity_id
-            
-            # 删除病例（这会级联删除相关的DataTable、ArchiveCase、Images等）
-            self.perform_destroy(instance)
-            
-            # 删除病例后，重新检查该患者是否还有其他病例
-            remaining_cases = Case.objects.filter(identity=patient)
-            
-            # 如果删除后该患者没有其他病例了，则删除患者信息
-            if not remaining_cases.exists():
-                patient.delete()
+
+            # 删除后该患者还剩下的病例（pending_delete 的病例已被默认管理器排除）
+            remaining_cases_count = Case.objects.filter(identity=patient).exclude(pk=instance.pk).count()
+
+            # 隐藏病例并提交后台任务，分块删除相关的DataTable、ArchiveCase、Images等；
+            # 如果是该患者的最后一个病例，任务最后一并删除患者信息
+            job = schedule_delete(
+                instance,
+                orphan_identity_id=patient_identity_id if not remaining_cases_count else None
+            )
+
+            if not remaining_cases_count:
                 return APIResponse(
                     response_code=ResponseCode.SUCCESS,
                     data={
                         "deleted_case_code": instance.case_code,
                         "deleted_patient": True,
                         "patient_identity_id": patient_identity_id,
+                        "job_id": job.id,
                         "message": f"已删除病例 {instance.case_code} 和患者 {patient_identity_id}（该患者的最后一个病例）"
                     }
                 )
@@ -571,8 +948,9 @@ class CaseViewSet(CustomModelViewSet):
                         "deleted_case_code": instance.case_code,
                         "deleted_patient": False,
                         "patient_identity_id": patient_identity_id,
-                        "remaining_cases_count": remaining_cases.count(),
-                        "message": f"已删除病例 {instance.case_code}，患者 {patient_identity_id} 还有其他 {remaining_cases.count()} 个病例"
+                        "remaining_cases_count": remaining_cases_count,
+                        "job_id": job.id,
+                        "message": f"已删除病例 {instance.case_code}，患者 {patient_identity_id} 还有其他 {remaining_cases_count} 个病例"
                     }
                 )
                 
@@ -582,7 +960,9 @@ class CaseViewSet(CustomModelViewSet):
     @action(detail=False, url_path='identity/(?P<identity_id>[^/.]+)')
     def identity_cases(self, request, identity_id=None):
         """获取指定身份证号的所有病例"""
-        cases = Case.objects.filter(identity__identity_id=identity_id)
+        cases = CaseListSerializer.setup_eager_loading(
+            Case.objects.filter(identity__identity_id=identity_id).order_by('case_code')
+        )
         page = self.paginate_queryset(cases)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -591,7 +971,8 @@ class CaseViewSet(CustomModelViewSet):
         serializer = self.get_serializer(cases, many=True)
         return Response(serializer.data)
 
-class IdentityViewSet(mixins.RetrieveModelMixin,
+class IdentityViewSet(ResponseCacheMixin,
+                     mixins.RetrieveModelMixin,
                      mixins.UpdateModelMixin,
                      mixins.ListModelMixin,
                      GenericViewSet):
@@ -602,16 +983,25 @@ class IdentityViewSet(mixins.RetrieveModelMixin,
     患者信息会在创建病例时自动创建或更新。
 
     - **List**: GET /api/patient/
-      - 支持分页和模糊搜索：?search=xxx（可模糊搜索身份证号、姓名）
+      - 支持分页和检索：?search=xxx（身份证号、姓名及其拼音首字母，按相关度排序）
     
     - **Retrieve**: GET /api/patient/{identity_id}/
-      - 返回患者详情及其所有病例
+      - 返回患者详情及其第一页病例（case_has_more 表示是否还有更多）
+
+    - **Cases**: GET /api/patient/{identity_id}/cases/
+      - 患者的全部病例，游标分页
+
+    - **Case Data**: GET /api/patient/{identity_id}/case-data/
+      - 患者所有病例的数据，支持筛选: ?start_time=2025-01-01&end_time=2025-06-30&template_code=T000001
+    - **Case Data Stream**: GET /api/patient/{identity_id}/case-data/stream/
+      - 同上，流式输出 NDJSON（?output=json 输出 JSON 数组），内存占用与数据量无关
     
     - **Update**: PUT /api/patient/{identity_id}/
       - 可更新患者的基本信息
     """
     queryset = Identity.objects.all()
     serializer_class = IdentitySerializer
+    cache_tables = ['identity', 'case', 'archive_case', 'archive']
     lookup_field = 'identity_id'
     pagination_class = StandardPagination
 
@@ -636,9 +1026,27 @@ class IdentityViewSet(mixins.RetrieveModelMixin,
             return PatientDetailSerializer
         return IdentitySerializer
 
+    @swagger_auto_schema(
+        operation_description="获取患者的病例列表（游标分页，通过 next/previous 链接翻页）",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="分页游标", type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="每页数量", type=openapi.TYPE_INTEGER),
+        ]
+    )
+    @action(detail=True, methods=['get'], url_path='cases')
+    def cases(self, request, identity_id=None):
+        """患者的病例列表（游标分页）"""
+        identity = self.get_object()
+        queryset = CaseListSerializer.setup_eager_loading(identity.case_set.all())
+        paginator = StandardCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = CaseListSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(manual_parameters=CASE_DATA_FILTER_PARAMETERS)
     @action(detail=True, url_path='case-data')
     def case_data(self, request, identity_id=None):
-        """获取患者所有病例的数据"""
+        """获取患者所有病例的数据（数据量大时请使用 case-data/stream）"""
         identity = self.get_object()
         cases = Case.objects.filter(identity=identity)
         
@@ -646,9 +1054,9 @@ class IdentityViewSet(mixins.RetrieveModelMixin,
         case_ids = list(cases.values_list('id', flat=True))
         
         # 查询所有相关数据
-        data_tables = DataTable.objects.filter(
+        data_tables = filter_case_data(DataTable.objects.filter(
             case_id__in=case_ids
-        ).select_related(
+        ), request.query_params).select_related(
             'case',
             'data_template',
             'data_template__category',
@@ -659,14 +1067,35 @@ class IdentityViewSet(mixins.RetrieveModelMixin,
         serializer = DataTableDetailSerializer(data_tables, many=True)
         return Response(serializer.data)
 
+    @swagger_auto_schema(
+        operation_description="流式获取患者所有病例的数据，字段与 case-data 相同。"
+                              "按病例、检查时间顺序分批读取并边读边输出，适合数据量很大的患者。"
+                              "output=ndjson（默认，每行一个 JSON 对象）或 json（JSON 数组）。",
+        manual_parameters=CASE_DATA_FILTER_PARAMETERS + [
+            openapi.Parameter('output', openapi.IN_QUERY, description="输出格式 ndjson / json", type=openapi.TYPE_STRING),
+        ]
+    )
+    @action(detail=True, url_path='case-data/stream')
+    def case_data_stream(self, request, identity_id=None):
+        """流式获取患者所有病例的数据"""
+        identity = self.get_object()
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ('ndjson', 'json'):
+            return APIResponse(response_code=ResponseCode.BAD_REQUEST, data={'output': '只支持 ndjson 或 json'})
+        # 提前校验筛选参数，流式输出开始后无法再返回错误响应
+        filter_case_data(DataTable.objects.none(), request.query_params)
+
+        case_ids = list(Case.objects.filter(identity=identity).values_list('id', flat=True))
+        rows = iter_case_data(case_ids, request.query_params)
+        if output == 'json':
+            return StreamingHttpResponse(json_array_stream(rows), content_type='application/json; charset=utf-8')
+        return StreamingHttpResponse(ndjson_stream(rows), content_type='application/x-ndjson; charset=utf-8')
+
     def get_queryset(self):
         queryset = super().get_queryset()
         search = self.request.query_params.get('search', None)
         if search:
-            return queryset.filter(
-                Q(identity_id__icontains=search) |
-                Q(name__icontains=search)
-            )
+            return search_identities(queryset, search)
         return queryset
 
 class DataTableViewSet(CustomModelViewSet):
@@ -782,6 +1211,7 @@ class DataTableViewSet(CustomModelViewSet):
     """
     queryset = DataTable.objects.all()
     pagination_class = StandardPagination
+    cache_tables = ['data_table', 'case', 'data_template', 'data_template_category', 'dictionary']
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -798,6 +1228,12 @@ class DataTableViewSet(CustomModelViewSet):
             queryset = queryset.filter(case__case_code=case_code)
         return queryset.select_related('case', 'data_template', 'dictionary')
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            # DataTable 没有删除信号（保留级联删除时的直接 DELETE），需显式递增病例的数据修订号
+            touch_cases([instance.case_id])
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -819,7 +1255,7 @@ class DataTableViewSet(CustomModelViewSet):
             'data': detail_serializer.data
         })
 
-class DataTemplateCategoryViewSet(CustomModelViewSet):
+class DataTemplateCategoryViewSet(BackgroundDestroyMixin, CustomModelViewSet):
     """
     API endpoint for 数据模板分类管理.
 
@@ -839,6 +1275,7 @@ class DataTemplateCategoryViewSet(CustomModelViewSet):
     - **Delete**: DELETE /api/template-category/{id}/
     """
     queryset = DataTemplateCategory.objects.all().order_by('id')
+    cache_tables = ['data_template_category', 'data_template']
     serializer_class = DataTemplateCategorySerializer
     pagination_class = StandardPagination
 
@@ -876,10 +1313,107 @@ def bulk_import(self, request):
         'data': serializer.errors
     }, status=status.HTTP_400_BAD_REQUEST)
 
+class BackgroundJobViewSet(CustomModelViewSet):
+    """
+    API endpoint for 后台任务.
+
+    - **List**: GET /api/job/
+      - 支持分页: ?page=1&page_size=10，支持筛选: ?status=running&job_type=cascade_delete
+
+    - **Retrieve**: GET /api/job/{id}/
+      - 返回任务状态和进度（progress / total / percent）
+
+    - **Export**: POST /api/job/export/
+      - 提交后台导出任务，返回任务 id，通过 Retrieve 查询进度
+
+      请求示例:
+      ```json
+      {"export_type": "archive", "archive_code": "A000001", "template_code": "T000001", "file_format": "csv"}
+      ```
+
+    - **Cancel**: POST /api/job/{id}/cancel/
+      - 取消待执行或执行中的任务（导出、词条合并；级联删除不能取消）
+
+    - **Download**: GET /api/job/{id}/download/
+      - 下载已完成导出任务的结果文件，支持 Range 断点续传
+    """
+    queryset = BackgroundJob.objects.all().order_by('-id')
+    serializer_class = BackgroundJobSerializer
+    pagination_class = StandardPagination
+    http_method_names = ['get', 'post', 'head', 'options']
+    # 提交后立即轮询进度、下载结果，副本的复制延迟可能导致读到旧状态
+    read_replica = False
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for field in ('status', 'job_type'):
+            value = self.request.query_params.get(field)
+            if value:
+                queryset = queryset.filter(**{field: value})
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        # 任务只能通过具体的业务接口（如 export）提交
+        raise MethodNotAllowed(request.method)
+
+    @swagger_auto_schema(
+        operation_description="提交后台导出任务。导出由 run_jobs 的 worker 执行并写入文件，"
+                              "完成后通过 download 接口下载；同时执行的导出任务数有上限，超出的任务排队等待。",
+        request_body=ExportJobSerializer,
+        responses={
+            200: openapi.Response(
+                description="已提交",
+                examples={"application/json": {"code": 200, "msg": "导出任务已提交", "data": {"job_id": 1, "status": "pending"}}}
+            )
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='export')
+    def export(self, request):
+        """提交后台导出任务"""
+        serializer = ExportJobSerializer(data=request.data)
+        if not serializer.is_valid():
+            return APIResponse(response_code=ResponseCode.BAD_REQUEST, data=serializer.errors)
+        job = enqueue_job('export', serializer.validated_data)
+        return APIResponse(data={'job_id': job.id, 'status': job.status}, msg='导出任务已提交')
+
+    @swagger_auto_schema(
+        operation_description="取消待执行或执行中的任务，执行中的任务在下一次汇报进度时停止。"
+                              "只能取消导出和词条合并任务（被取消的合并任务可重新提交继续），级联删除任务不能取消。",
+        request_body=no_body
+    )
+    @action(detail=True, methods=['post'], url_path='cancel')
+    def cancel(self, request, pk=None):
+        """取消任务"""
+        job = self.get_object()
+        if not is_cancellable(job):
+            return APIResponse(response_code=ResponseCode.BAD_REQUEST, msg='该类型的任务不能取消')
+        if not cancel_job(job):
+            return APIResponse(
+                response_code=ResponseCode.BAD_REQUEST, msg=f'任务已结束（{job.get_status_display()}），无法取消'
+            )
+        job.refresh_from_db()
+        return APIResponse(data=BackgroundJobSerializer(job).data, msg='任务已取消')
+
+    @swagger_auto_schema(
+        operation_description="下载已完成导出任务的结果文件。支持 Range 请求头断点续传（返回 206），"
+                              "可配合 If-Range 校验文件是否变化。"
+    )
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        """下载导出结果文件"""
+        job = self.get_object()
+        if job.job_type != 'export' or job.status != BackgroundJob.STATUS_SUCCEEDED:
+            return APIResponse(response_code=ResponseCode.BAD_REQUEST, msg='任务未完成或不是导出任务')
+        path = export_file_path(job)
+        if path is None:
+            return APIResponse(response_code=ResponseCode.NOT_FOUND, msg='导出文件不存在或已过期，请重新导出')
+        return ranged_file_response(request, path, job.result['filename'], job.result['content_type'])
+
+
 class PatientMergedCaseListView(APIView):
     """
     获取患者列表（每个患者只展示一行，字段为所有病例中最新非空值，仅支持分页，不支持搜索）
-    支持通过档案编号筛选
+    支持通过档案编号、移植状态（transplanted / transplant_date_from / transplant_date_to / in_transplant_queue）筛选
     """
     pagination_class = StandardPagination
 
@@ -919,7 +1453,7 @@ class PatientMergedCaseListView(APIView):
                 type=openapi.TYPE_STRING,
                 required=False
             )
-        ],
+        ] + TRANSPLANT_FILTER_PARAMETERS,
         responses={
             200: openapi.Response(
                 description="成功返回患者列表数据",
@@ -941,7 +1475,10 @@ class PatientMergedCaseListView(APIView):
                                     "home_address": "福建省厦门市XXXXXXXXXXXXX",
                                     "blood_type": "O型",
                                     "has_transplant_surgery": "是(2024-XX-XX)",
-                                    "is_in_transplant_queue": "否"
+                                    "is_in_transplant_queue": "否",
+                                    "transplanted": True,
+                                    "transplant_date": "2024-XX-XX",
+                                    "in_transplant_queue": False
                                 }
                             ],
                             "total": 1,
@@ -989,11 +1526,16 @@ class PatientMergedCaseListView(APIView):
                     'data': None
                 })
 
-        # 如果提供了search参数，进行姓名或身份证号模糊查询
+        # 按移植状态筛选：存在符合条件病例的患者
+        if any(request.query_params.get(name) for name in TRANSPLANT_FILTER_PARAMS):
+            transplant_cases = filter_transplant(Case.objects.all(), request.query_params)
+            if archive_code:
+                transplant_cases = transplant_cases.filter(archives__archive_code=archive_code)
+            queryset = queryset.filter(identity_id__in=transplant_cases.values('identity_id'))
+
+        # 如果提供了search参数，进行姓名或身份证号检索
         if search:
-            queryset = queryset.filter(
-                Q(identity_id__icontains=search) | Q(name__icontains=search)
-            )
+            queryset = search_identities(queryset, search)
 
         # 获取所有符合条件的患者
         patients = []
@@ -1026,7 +1568,10 @@ class PatientMergedCaseListView(APIView):
                 'home_address': latest_case.home_address,
                 'blood_type': latest_case.blood_type,
                 'has_transplant_surgery': latest_case.has_transplant_surgery,
-                'is_in_transplant_queue': latest_case.is_in_transplant_queue
+                'is_in_transplant_queue': latest_case.is_in_transplant_queue,
+                'transplanted': latest_case.transplanted,
+                'transplant_date': latest_case.transplant_date,
+                'in_transplant_queue': latest_case.in_transplant_queue
             }
             patients.append(patient_data)
 
@@ -1047,7 +1592,27 @@ class PatientMergedCaseListView(APIView):
             }
         })
 
-class CaseTemplateSummaryView(APIView):
+class CaseResponseCacheMixin(ResponseCacheMixin):
+    """
+    病例查询接口（POST 仅用于传递参数）的响应缓存和条件请求：
+    ETag 和缓存键由模板、词条等表的版本号加所查病例的 data_revision 组成（按病例编号一次查询），
+    录入其他病例的数据不会使其失效；If-None-Match 匹配时返回 304
+    """
+    cache_tables = CASE_DATA_TABLES
+    cache_methods = ('post',)
+    conditional_methods = ('post',)
+
+    def get_cache_revision(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        case_codes = data.get('case_codes') or [data.get('case_code')]
+        if not isinstance(case_codes, list):
+            case_codes = [case_codes]
+        case_codes = sorted({case_code for case_code in case_codes if isinstance(case_code, str)})
+        revisions = dict(Case.objects.filter(case_code__in=case_codes).values_list('case_code', 'data_revision'))
+        return ','.join(f'{case_code}@{revisions.get(case_code)}' for case_code in case_codes)
+
+
+class CaseTemplateSummaryView(CaseResponseCacheMixin, APIView):
     """
     接收一个或多个case_code，返回这些病例的所有数据模板下的数据，
     包含模板分类、模板名称、模板编号、检查时间。
@@ -1056,6 +1621,8 @@ class CaseTemplateSummaryView(APIView):
     检查时间精确到时分秒（YYYY-MM-DD HH:MM:SS）。
     """
     permission_classes = [AllowAny]
+    # 只读查询（POST 仅用于传递参数），读操作可走只读副本
+    read_replica = True
 
     @swagger_auto_schema(
         operation_description="传入一个或多个病例编号（case_code），返回这些病例的所有数据模板下的数据，包含模板分类、模板名称、模板编号、检查时间。\n\n注意：同一模板下不同的检查时间会分别返回，每个（模板，检查时间）组合为一条数据。\n\n检查时间精确到时分秒（YYYY-MM-DD HH:MM:SS）。",
@@ -1181,7 +1748,7 @@ class CaseTemplateSummaryView(APIView):
             'data': data
         })
 
-class CaseTemplateDetailView(APIView):
+class CaseTemplateDetailView(CaseResponseCacheMixin, APIView):
     """
     查询某病例下某模板某次检查的所有词条及其值（详情）。
     
@@ -1189,6 +1756,8 @@ class CaseTemplateDetailView(APIView):
     检查时间精确到时分秒（YYYY-MM-DD HH:MM:SS）。
     """
     permission_classes = [AllowAny]
+    # 只读查询（POST 仅用于传递参数），读操作可走只读副本
+    read_replica = True
 
     @swagger_auto_schema(
         operation_description="传入病例编号、模板编号和检查时间，返回该病例下该模板该次检查的所有词条及其值、检查时间、模板名称。\n\n注意：check_time为必填，精确到时分秒。",
@@ -1284,13 +1853,15 @@ class CaseTemplateDetailView(APIView):
             }
         })
 
-class CaseVisualizationDataView(APIView):
+class CaseVisualizationDataView(CaseResponseCacheMixin, APIView):
     """
     根据选择的X轴（时间）和Y轴（词条编号），返回对应的数据值。
     X轴数据来源：从data表获取所有数据，取出这些数据的检查时间。
     Y轴数据来源：从data表获取所有数据，根据dictionary_id找出这些词条名称，过滤条件是该词条的data_type为数值类型。
     """
     permission_classes = [AllowAny]
+    # 只读查询（POST 仅用于传递参数），读操作可走只读副本
+    read_replica = True
 
     @swagger_auto_schema(
         operation_description="根据选择的X轴（时间）和Y轴（词条编号），返回对应的数据值。",
@@ -1412,11 +1983,13 @@ class CaseVisualizationDataView(APIView):
             'data': CaseVisualizationDataSerializer(result_data, many=True).data
         })
 
-class CaseVisualizationYAxisTimesView(APIView):
+class CaseVisualizationYAxisTimesView(CaseResponseCacheMixin, APIView):
     """
     根据病例编号查询Y轴选项（所有数值型词条），按模板分组返回
     """
     permission_classes = [AllowAny]
+    # 只读查询（POST 仅用于传递参数），读操作可走只读副本
+    read_replica = True
 
     @swagger_auto_schema(
         operation_description="根据病例编号查询Y轴选项（所有数值型词条），按模板分组返回",
@@ -1521,11 +2094,13 @@ class CaseVisualizationYAxisTimesView(APIView):
             'data': result_data
         })
 
-class CaseVisualizationXAxisOptionsView(APIView):
+class CaseVisualizationXAxisOptionsView(CaseResponseCacheMixin, APIView):
     """
     根据病例编号查询X轴选项（所有有数据的时间点，精确到秒）。
     """
     permission_classes = [AllowAny]
+    # 只读查询（POST 仅用于传递参数），读操作可走只读副本
+    read_replica = True
 
     @swagger_auto_schema(
         operation_description="根据病例编号查询X轴选项（所有有数据的时间点，精确到秒）",
@@ -1594,12 +2169,46 @@ class CaseVisualizationXAxisOptionsView(APIView):
             }
         })
 
+DATA_LIST_SCHEMA = openapi.Schema(
+    type=openapi.TYPE_ARRAY,
+    items=openapi.Items(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'case_code': openapi.Schema(type=openapi.TYPE_STRING, description='病例编号（可选，默认外层 case_code）'),
+            'template_code': openapi.Schema(type=openapi.TYPE_STRING, description='模板编号（可选，默认外层 template_code）'),
+            'word_code': openapi.Schema(type=openapi.TYPE_STRING, description='词条编号'),
+            'check_time': openapi.Schema(type=openapi.TYPE_STRING, description='检查时间'),
+            'value': openapi.Schema(type=openapi.TYPE_STRING, description='数据值（修改时必填）'),
+        }
+    ),
+    description='批量数据列表（批量时必填）'
+)
+
+
 class DataTableCRUDView(APIView):
     """
     数据表的增删改查接口，根据病例编号、模板编号、词条编号、检查时间共同确定一条数据。
     """
     permission_classes = [AllowAny]
 
+    def _batch_response(self, request, operation, verb):
+        """批量修改/删除，返回每项的处理结果"""
+        data_list = request.data.get('data_list')
+        if not isinstance(data_list, list):
+            return Response({'code': 400, 'msg': 'data_list 必须是列表', 'data': None}, status=400)
+        defaults = {field: request.data[field] for field in ('case_code', 'template_code') if request.data.get(field)}
+        results = operation(data_list, defaults)
+        success_count = sum(1 for result in results if result['status'] in (STATUS_UPDATED, STATUS_DELETED))
+        return Response({
+            'code': 200,
+            'msg': f'成功{verb}{success_count}条，失败{len(results) - success_count}条',
+            'data': {
+                'success_count': success_count,
+                'error_count': len(results) - success_count,
+                'results': results
+            }
+        })
+
     @swagger_auto_schema(
         operation_description="根据病例编号、词条编号、检查时间查询数据。\n\n如果不传template_code，则返回所有相关数据（即所有匹配病例编号、词条编号的数据，check_time不是必填项），返回格式为 {\"list\": [...]}。\n\n- case_code: 必填，病例编号\n- word_code: 必填，词条编号\n- template_code: 可选，模板编号。如果不传，则不作为过滤条件。\n- check_time: 可选，检查时间。\n\n返回格式为 {list: [...]}。\n\n【注意】template_code 现在是可选参数，不传时会返回所有匹配病例编号和词条编号的数据。",
         manual_parameters=[
@@ -1895,16 +2504,22 @@ class DataTableCRUDView(APIView):
         })
 
     @swagger_auto_schema(
-        operation_description="更新数据",
+        operation_description="""
+        更新数据，支持单条和批量（data_list）。
+
+        - 批量时每项包含 word_code、check_time、value，可单独指定 case_code / template_code（默认使用外层的值），
+          所有数据一次查询、一条 UPDATE 完成，返回每项的处理结果（updated / not_found / invalid）
+        """,
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
-            required=['case_code', 'template_code', 'word_code', 'check_time', 'value'],
+            required=['case_code', 'template_code'],
             properties={
                 'case_code': openapi.Schema(type=openapi.TYPE_STRING, description='病例编号'),
                 'template_code': openapi.Schema(type=openapi.TYPE_STRING, description='模板编号'),
-                'word_code': openapi.Schema(type=openapi.TYPE_STRING, description='词条编号'),
-                'check_time': openapi.Schema(type=openapi.TYPE_STRING, description='检查时间，格式YYYY-MM-DD HH:MM:SS'),
-                'value': openapi.Schema(type=openapi.TYPE_STRING, description='新的数据值'),
+                'word_code': openapi.Schema(type=openapi.TYPE_STRING, description='词条编号（单条时必填）'),
+                'check_time': openapi.Schema(type=openapi.TYPE_STRING, description='检查时间，格式YYYY-MM-DD HH:MM:SS（单条时必填）'),
+                'value': openapi.Schema(type=openapi.TYPE_STRING, description='新的数据值（单条时必填）'),
+                'data_list': DATA_LIST_SCHEMA,
             },
             example={
                 'case_code': 'C000001',
@@ -1938,7 +2553,9 @@ class DataTableCRUDView(APIView):
         }
     )
     def put(self, request):
-        """更新数据"""
+        """更新数据，支持单条和批量（data_list）"""
+        if request.data.get('data_list'):
+            return self._batch_response(request, bulk_update_values, '更新')
         case_code = request.data.get('case_code')
         template_code = request.data.get('template_code')
         word_code = request.data.get('word_code')
@@ -2002,15 +2619,21 @@ class DataTableCRUDView(APIView):
         })
 
     @swagger_auto_schema(
-        operation_description="删除数据",
+        operation_description="""
+        删除数据，支持单条和批量（data_list）。
+
+        - 批量时每项包含 word_code、check_time，可单独指定 case_code / template_code（默认使用外层的值），
+          所有数据一次查询、一条 DELETE 完成，返回每项的处理结果（deleted / not_found / invalid）
+        """,
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
-            required=['case_code', 'template_code', 'word_code', 'check_time'],
+            required=['case_code', 'template_code'],
             properties={
                 'case_code': openapi.Schema(type=openapi.TYPE_STRING, description='病例编号'),
                 'template_code': openapi.Schema(type=openapi.TYPE_STRING, description='模板编号'),
-                'word_code': openapi.Schema(type=openapi.TYPE_STRING, description='词条编号'),
-                'check_time': openapi.Schema(type=openapi.TYPE_STRING, description='检查时间，格式YYYY-MM-DD HH:MM:SS'),
+                'word_code': openapi.Schema(type=openapi.TYPE_STRING, description='词条编号（单条时必填）'),
+                'check_time': openapi.Schema(type=openapi.TYPE_STRING, description='检查时间，格式YYYY-MM-DD HH:MM:SS（单条时必填）'),
+                'data_list': DATA_LIST_SCHEMA,
             },
             example={
                 'case_code': 'C000001',
@@ -2035,7 +2658,9 @@ class DataTableCRUDView(APIView):
         }
     )
     def delete(self, request):
-        """删除数据"""
+        """删除数据，支持单条和批量（data_list）"""
+        if request.data.get('data_list'):
+            return self._batch_response(request, bulk_delete, '删除')
         case_code = request.data.get('case_code')
         template_code = request.data.get('template_code')
         word_code = request.data.get('word_code')
@@ -2080,10 +2705,222 @@ class DataTableCRUDView(APIView):
             }, status=404)
 
         # 删除数据
-        data_table.delete()
+        with transaction.atomic():
+            data_table.delete()
+            touch_cases([case.id])
 
         return Response({
             'code': 200,
             'msg': '删除成功',
             'data': None
-        })
\ No newline at end of file
+        })
+
+
+class DataTableSessionView(APIView):
+    """
+    按检查（病例编号 + 模板编号 + 检查时间）整体修改检查时间或删除，
+    各只执行一条 UPDATE / DELETE，与模板包含的词条数量无关。
+    """
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_description="把一次检查的全部数据移动到新的检查时间（一条 UPDATE）。\n\n"
+                              "新的检查时间下已有相同词条的数据时返回 409，并列出冲突的词条编号，不做任何修改。",
+        request_body=DataTableSessionRetimeSerializer,
+        responses={
+            200: openapi.Response(
+                description="修改成功",
+                examples={
+                    "application/json": {
+                        "code": 200,
+                        "msg": "修改成功",
+                        "data": {
+                            "case_code": "C000001",
+                            "template_code": "T000001",
+                            "check_time": "2025-06-18 04:36:00",
+                            "new_check_time": "2025-06-18 08:00:00",
+                            "moved": 24
+                        }
+                    }
+                }
+            ),
+            400: '参数错误',
+            404: '未找到相关数据',
+            409: '新的检查时间下已有相同词条的数据'
+        }
+    )
+    def put(self, request):
+        """修改一次检查的检查时间"""
+        serializer = DataTableSessionRetimeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'code': 400, 'msg': '请求参数错误', 'data': serializer.errors}, status=400)
+        data = serializer.validated_data
+        try:
+            moved, conflicts = retime_session(data['case'], data['template'], data['check_time'], data['new_check_time'])
+        except IntegrityError:
+            # 检查之后有并发请求写入了新检查时间下的相同词条
+            return Response({'code': 409, 'msg': '新的检查时间下已有相同词条的数据', 'data': {'conflicts': []}}, status=409)
+        if conflicts:
+            return Response({
+                'code': 409,
+                'msg': '新的检查时间下已有相同词条的数据',
+                'data': {'conflicts': conflicts}
+            }, status=409)
+        if not moved:
+            return Response({'code': 404, 'msg': '未找到相关数据', 'data': None}, status=404)
+        return Response({
+            'code': 200,
+            'msg': '修改成功',
+            'data': {
+                'case_code': data['case_code'],
+                'template_code': data['template_code'],
+                'check_time': data['check_time'].strftime('%Y-%m-%d %H:%M:%S'),
+                'new_check_time': data['new_check_time'].strftime('%Y-%m-%d %H:%M:%S'),
+                'moved': moved
+            }
+        })
+
+    @swagger_auto_schema(
+        operation_description="删除一次检查的全部数据（一条 DELETE）",
+        request_body=DataTableSessionSerializer,
+        responses={
+            200: openapi.Response(
+                description="删除成功",
+                examples={"application/json": {"code": 200, "msg": "删除成功", "data": {"deleted": 24}}}
+            ),
+            400: '参数错误',
+            404: '未找到相关数据'
+        }
+    )
+    def delete(self, request):
+        """删除一次检查"""
+        serializer = DataTableSessionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'code': 400, 'msg': '请求参数错误', 'data': serializer.errors}, status=400)
+        data = serializer.validated_data
+        deleted = delete_session(data['case'], data['template'], data['check_time'])
+        if not deleted:
+            return Response({'code': 404, 'msg': '未找到相关数据', 'data': None}, status=404)
+        return Response({'code': 200, 'msg': '删除成功', 'data': {'deleted': deleted}})
+
+
+class DataTableSessionCopyForwardView(APIView):
+    """
+    复制上次检查：把某病例某模板一次检查的全部数据复制到新的检查时间，
+    在数据库内一条 INSERT ... SELECT 完成，可同时修改部分词条的值。
+    """
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_description="复制某病例某模板一次检查的全部数据到新的检查时间（服务端 INSERT ... SELECT）。\n\n"
+                              "- source_check_time 不传时取 check_time 之前最近的一次检查\n"
+                              "- overrides 中的词条使用给定值（值为 null 表示不复制该词条），在同一事务中写入\n"
+                              "- 新的检查时间已有数据时返回 409",
+        request_body=DataTableCopyForwardSerializer,
+        responses={
+            200: openapi.Response(
+                description="复制成功",
+                examples={
+                    "application/json": {
+                        "code": 200,
+                        "msg": "复制成功",
+                        "data": {
+                            "case_code": "C000001",
+                            "template_code": "T000001",
+                            "source_check_time": "2025-06-18 04:36:00",
+                            "check_time": "2025-07-18 09:00:00",
+                            "copied": 24,
+                            "overridden": 2
+                        }
+                    }
+                }
+            ),
+            400: '参数错误',
+            404: '未找到被复制的检查',
+            409: '新的检查时间已有数据'
+        }
+    )
+    def post(self, request):
+        serializer = DataTableCopyForwardSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'code': 400, 'msg': '请求参数错误', 'data': serializer.errors}, status=400)
+        data = serializer.validated_data
+        case, template = data['case'], data['template']
+        source_time, target_time = data['source_check_time'], data['check_time']
+
+        if not session_rows(case, template, source_time).exists():
+            return Response({'code': 404, 'msg': '未找到被复制的检查', 'data': None}, status=404)
+        if session_rows(case, template, target_time).exists():
+            return Response({'code': 409, 'msg': '新的检查时间已有数据', 'data': None}, status=409)
+        try:
+            copied, overridden = copy_forward(case, template, source_time, target_time, data.get('overrides'))
+        except IntegrityError:
+            # 并发写入了同一检查时间
+            return Response({'code': 409, 'msg': '新的检查时间已有数据', 'data': None}, status=409)
+
+        return Response({
+            'code': 200,
+            'msg': '复制成功',
+            'data': {
+                'case_code': case.case_code,
+                'template_code': template.template_code,
+                'source_check_time': source_time.strftime('%Y-%m-%d %H:%M:%S'),
+                'check_time': target_time.strftime('%Y-%m-%d %H:%M:%S'),
+                'copied': copied,
+                'overridden': overridden
+            }
+        })
+
+
+class LivenessView(APIView):
+    """存活探针：进程能处理请求即返回 200"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @swagger_auto_schema(operation_description="存活探针")
+    def get(self, request):
+        return APIResponse(data={'status': 'alive'})
+
+
+class ReadinessView(APIView):
+    """就绪探针：预热完成且数据库可用时返回 200，否则返回 503"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @swagger_auto_schema(operation_description="就绪探针：预热完成且数据库可用时返回 200，否则返回 503")
+    def get(self, request):
+        if not is_ready():
+            warm_up_in_background()
+            return APIResponse(
+                response_code=ResponseCode.SERVICE_UNAVAILABLE, data={'status': 'warming_up'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError as e:
+            return APIResponse(
+                response_code=ResponseCode.SERVICE_UNAVAILABLE, data={'status': 'database_unavailable', 'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return APIResponse(data={'status': 'ready'})
+
+
+class DatabasePoolStatsView(APIView):
+    """当前 worker 进程的数据库连接池统计（每个进程各自统计，多次请求可能落到不同 worker）"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @swagger_auto_schema(operation_description="当前 worker 进程的数据库连接池统计：连接数、空闲数、使用中、等待线程数、新建/复用次数等")
+    def get(self, request):
+        return APIResponse(data={'pid': os.getpid(), 'pools': pool_stats()})
+
+
+class ResponseCacheStatsView(APIView):
+    """当前 worker 进程的响应缓存命中统计（每个进程各自统计）"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @swagger_auto_schema(operation_description="当前 worker 进程各视图的响应缓存命中、未命中和写入次数")
+    def get(self, request):
+        return APIResponse(data={'pid': os.getpid(), 'views': response_cache_stats()})
@@ -0,0 +1,87 @@
+"""
+服务预热与就绪状态
+
+生产模式（manage.py serve）在主进程 fork worker 之前调用 warm_up：加载全部 URL 和视图、
+构建各视图集的序列化器、加载拼音词典并确认数据库可用，随后 gc.freeze()，
+worker 继承已预热的内存（写时复制），不会在处理第一批请求时才加载。
+
+就绪探针（/api/health/ready/）在预热完成前返回 503；未经 serve 启动（如 runserver）时，
+第一次探测会在后台线程中触发预热。
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.urls import get_resolver
+
+from utils.cache import get_cache_versions
+from . import search
+
+logger = logging.getLogger(__name__)
+
+_ready = threading.Event()
+_started = threading.Lock()
+
+
+def _warm_urls():
+    """加载 URL 配置并导入全部视图"""
+    # 访问 reverse_dict 会解析全部 URL 模式并缓存
+    return len(get_resolver().reverse_dict)
+
+
+def _warm_serializers():
+    """为路由中的每个视图集构建一次序列化器字段"""
+    from .urls import router
+    serializer_classes = [
+        viewset.serializer_class for _, viewset, _ in router.registry
+        if getattr(viewset, 'serializer_class', None) is not None
+    ]
+    for serializer_class in serializer_classes:
+        # 构建字段会读取模型元数据并生成校验器
+        serializer_class().fields
+    return len(serializer_classes)
+
+
+def warm_up():
+    """预热当前进程，完成后标记为就绪；重复调用直接返回"""
+    if _ready.is_set():
+        return
+    with _started:
+        if _ready.is_set():
+            return
+        started = time.monotonic()
+        _warm_urls()
+        serializers = _warm_serializers()
+        # 首次调用会加载拼音词典
+        search.build_tokens(['warmup'], name='预热')
+        for alias in connections:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+        get_cache_versions('case', 'data_table')
+        cache.get('warmup')
+        # fork 前关闭连接，worker 各自建立新连接
+        connections.close_all()
+        _ready.set()
+        logger.info("预热完成（%d 个序列化器），耗时 %.2fs", serializers, time.monotonic() - started)
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def warm_up_in_background():
+    """未预热时在后台线程中预热（供就绪探针使用）"""
+    if _ready.is_set() or _started.locked():
+        return
+    threading.Thread(target=_warm_up_quietly, daemon=True).start()
+
+
+def _warm_up_quietly():
+    try:
+        warm_up()
+    except Exception:
+        logger.exception("预热失败")
+    finally:
+        connections.close_all()
@@ -19,7 +19,23 @@ for i in {1..30}; do
       exit(1)
   " && break || sleep 2
 done
-# 执行迁移并启动服务器
-poetry run python manage.py makemigrations --noinput
-poetry run python manage.py migrate --noinput
-poetry run python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+# 启动方式由第一个参数决定：
+#   migrate  执行数据库迁移后退出（部署时单独运行一次）
+#   serve    生产模式：gunicorn 多进程，预加载并预热应用（默认）
+#   dev      本地开发：执行迁移后以 runserver 启动（自动重载）
+case "${1:-serve}" in
+  migrate)
+    exec poetry run python manage.py migrate --noinput
+    ;;
+  serve)
+    exec poetry run python manage.py serve
+    ;;
+  dev)
+    poetry run python manage.py migrate --noinput
+    exec poetry run python manage.py runserver 0.0.0.0:8000
+    ;;
+  *)
+    echo "未知的启动方式: $1（可选 migrate / serve / dev）"
+    exit 1
+    ;;
+esac
@@ -0,0 +1,54 @@
+"""
+缓存版本号
+
+按名称（通常为表名）维护一个版本号，并将其拼入缓存键。
+数据批量变更后调用 bump_cache_version 使相关缓存整体失效，无需逐个删除缓存键。
+
+版本号只需与之前用过的值不同，取当前时间的纳秒数：
+- 版本号被缓存淘汰（如文件缓存超过 MAX_ENTRIES 时随机清理）后重新生成的值不会与旧值重复，旧缓存不会重新生效
+- 更新版本号只需一次写入，文件缓存等 incr 非原子的后端上并发更新也不会丢失
+
+版本号保存在 CACHE_VERSION_ALIAS 指定的缓存中（默认 default），建议使用 Redis / Memcached 等共享且不会
+按容量淘汰这几个键的后端；使用文件缓存时 settings 中为版本号单独配置了一个缓存目录。
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+VERSION_KEY_PREFIX = 'cache_version:'
+
+
+def version_cache():
+    return caches[getattr(settings, 'CACHE_VERSION_ALIAS', 'default')]
+
+
+def is_process_local(alias='default'):
+    """缓存是否只在当前进程内有效（多进程部署时各进程看到的版本号和缓存内容不一致）"""
+    return isinstance(caches[alias], LocMemCache)
+
+
+def get_cache_versions(*names):
+    """读取多个版本号，未设置（或已被淘汰）的生成新版本号"""
+    cache = version_cache()
+    keys = [VERSION_KEY_PREFIX + name for name in names]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        for key in missing:
+            # 多个进程同时生成时以先写入的为准
+            cache.add(key, time.time_ns(), None)
+        values.update(cache.get_many(missing))
+    return [values.get(key, 0) for key in keys]
+
+
+def bump_cache_version(*names):
+    """更换版本号，使拼入该版本号的缓存键全部失效"""
+    version_cache().set_many({VERSION_KEY_PREFIX + name: time.time_ns() for name in names}, None)
+
+
+def versioned_key(prefix, names, *parts):
+    """生成带版本号的缓存键：prefix:v1.v2:part..."""
+    versions = '.'.join(str(version) for version in get_cache_versions(*names))
+    return ':'.join([prefix, versions] + [str(part) for part in parts])
@@ -0,0 +1,208 @@
+"""
+响应压缩
+
+按请求头 Accept-Encoding 在 zstd / br / gzip 中协商（服务端偏好顺序见 COMPRESSION_ENCODINGS，未安装的编码自动忽略）：
+
+- 小于 COMPRESSION_MIN_SIZE 的响应、非文本类型（图片、Parquet 等）、已压缩的响应不压缩
+- 支持 Range 的文件下载（utils/download.py）不压缩，否则字节区间对不上
+- 流式响应（导出等）边生成边压缩
+- 响应缓存命中的快照（ResponseCacheMixin 设置 compression_cache_key）用较高的压缩级别压缩一次，
+  压缩结果按编码存入响应缓存，之后命中直接使用，不再重复压缩；缓存键含版本号，数据变化后自然失效
+- 返回令牌的认证接口不压缩（避免 BREACH 类攻击通过压缩后长度推测令牌）
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时不支持 br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # 未安装 zstandard 时不支持 zstd
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+DEFAULT_EXCLUDED_PATHS = ('/api/login/', '/api/register/', '/api/token/')
+
+# (按请求压缩的级别, 缓存快照的级别)：快照只压缩一次，使用更高的级别
+LEVELS = {
+    'zstd': (3, 12),
+    'br': (4, 9),
+    'gzip': (6, 9),
+}
+
+
+class _StreamCompressor:
+    __slots__ = ('compress', 'finish')
+
+    def __init__(self, compress, finish):
+        self.compress = compress
+        self.finish = finish
+
+
+def _gzip_stream(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return _StreamCompressor(compressor.compress, compressor.flush)
+
+
+def _brotli_stream(level):
+    compressor = brotli.Compressor(quality=level)
+    return _StreamCompressor(compressor.process, compressor.finish)
+
+
+def _zstd_stream(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return _StreamCompressor(compressor.compress, compressor.flush)
+
+
+def _gzip(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# 编码名: (压缩整段内容, 流式压缩器)
+ENCODERS = {'gzip': (_gzip, _gzip_stream)}
+if brotli is not None:
+    ENCODERS['br'] = (_brotli, _brotli_stream)
+if zstandard is not None:
+    ENCODERS['zstd'] = (_zstd, _zstd_stream)
+
+
+def available_encodings():
+    """按服务端偏好排序的可用编码"""
+    preferred = getattr(settings, 'COMPRESSION_ENCODINGS', ['zstd', 'br', 'gzip'])
+    return [encoding for encoding in preferred if encoding in ENCODERS]
+
+
+def _parse_accept_encoding(header):
+    qualities = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    return qualities
+
+
+def negotiate_encoding(header, encodings=None):
+    """从 Accept-Encoding 中选择权重最高的可用编码，权重相同时按服务端偏好；无可用编码时返回 None"""
+    if not header:
+        return None
+    qualities = _parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in encodings if encodings is not None else available_encodings():
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_bytes(data, encoding, cached=False):
+    compress, _ = ENCODERS[encoding]
+    return compress(data, LEVELS[encoding][1 if cached else 0])
+
+
+def compress_stream(chunks, encoding):
+    _, stream = ENCODERS[encoding]
+    compressor = stream(LEVELS[encoding][0])
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def compress_async_stream(chunks, encoding):
+    _, stream = ENCODERS[encoding]
+    compressor = stream(LEVELS[encoding][0])
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _compressible(request, response):
+    if not getattr(settings, 'COMPRESSION_ENABLED', True):
+        return False
+    if response.has_header('Content-Encoding') or response.status_code == 206 or response.has_header('Accept-Ranges'):
+        return False
+    if request.path in getattr(settings, 'COMPRESSION_EXCLUDED_PATHS', DEFAULT_EXCLUDED_PATHS):
+        return False
+    content_type = response.get('Content-Type', '').lower()
+    if not content_type.startswith(COMPRESSIBLE_TYPES):
+        return False
+    return response.streaming or len(response.content) >= getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+
+def _compressed_content(response, encoding):
+    cache_key = getattr(response, 'compression_cache_key', None)
+    if cache_key is None:
+        return compress_bytes(response.content, encoding)
+    from utils.response_cache import response_cache
+
+    backend = response_cache()
+    key = f'{cache_key}:{encoding}'
+    content = backend.get(key)
+    if content is None:
+        content = compress_bytes(response.content, encoding, cached=True)
+        backend.set(key, content, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 3600))
+    return content
+
+
+class CompressionMiddleware:
+    """压缩响应内容；需放在会读取或修改响应内容的中间件之前（MIDDLEWARE 中靠前的位置）"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not _compressible(request, response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            # 压缩后的长度要生成完才知道
+            del response.headers['Content-Length']
+        else:
+            content = _compressed_content(response, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        # 压缩后内容不同，强 ETag 改为弱 ETag（条件请求使用弱比较，仍可匹配）
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,133 @@
+"""
+读写分离
+
+配置了只读副本（DATABASE_REPLICAS）时，按请求决定读操作使用哪个数据库：
+
+- GET / HEAD / OPTIONS 请求的读操作走副本；视图类设置 read_replica = True 时其他方法（只读的 POST 查询接口）也走副本，
+  设置 read_replica = False 时始终使用主库（如需要读到刚提交结果的任务状态轮询）
+- 同一请求中发生过写操作，或处于主库事务中时，之后的读操作都使用主库（读己之写）
+- 请求头 X-Read-Primary: 1 强制本次请求使用主库；代码中可用 use_primary() 临时切换到主库
+- 请求之外（后台任务、管理命令）始终使用主库
+
+副本之间按请求随机选择一个，同一请求内固定。状态保存在 contextvar 中，线程和 ASGI 协程之间互不影响。
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import FileResponse
+
+PRIMARY_HEADER = 'X-Read-Primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _RoutingState:
+    __slots__ = ('use_replica', 'replica', 'stuck')
+
+    def __init__(self):
+        self.use_replica = False
+        self.replica = None
+        # 本请求已写过主库
+        self.stuck = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if alias in connections.settings]
+
+
+@contextmanager
+def use_primary():
+    """代码块内的读操作使用主库"""
+    token = _state.set(_RoutingState())
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def _read_alias():
+    state = _state.get()
+    if state is None or not state.use_replica or state.stuck:
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        # 主库事务中读副本可能读不到事务内的修改
+        return DEFAULT_DB_ALIAS
+    if state.replica is None:
+        replicas = replica_aliases()
+        state.replica = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+    return state.replica
+
+
+class ReplicaRouter:
+    """写操作和迁移只在主库执行，读操作按请求状态选择主库或副本"""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.stuck = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构由主库复制而来
+        return db not in replica_aliases()
+
+
+def _view_allows_replica(request, view_func):
+    if request.headers.get(PRIMARY_HEADER, '').lower() in ('1', 'true', 'yes'):
+        return False
+    # DRF 视图为 view_func.cls，Django 的类视图为 view_func.view_class
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    read_replica = getattr(view_class, 'read_replica', None)
+    if read_replica is not None:
+        return read_replica
+    return request.method in SAFE_METHODS
+
+
+class ReplicaRoutingMiddleware:
+    """为每个请求建立读写分离状态，视图确定后决定读操作是否走副本"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            # 流式响应在中间件返回后才生成内容，生成期间沿用本请求的状态
+            response.streaming_content = _iterate_with_state(state, response.streaming_content)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.get().use_replica = bool(replica_aliases()) and _view_allows_replica(request, view_func)
+
+
+def _iterate_with_state(state, content):
+    # 每生成一块单独设置和恢复（ASGI 下每块可能在不同的上下文中生成）
+    iterator = iter(content)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
@@ -8,6 +8,7 @@ class ResponseCode(Enum):
     FORBIDDEN = (403, "禁止访问")
     NOT_FOUND = (404, "资源不存在")
     METHOD_NOT_ALLOWED = (405, "方法不允许")
+    CONFLICT = (409, "数据冲突")
     
     INTERNAL_ERROR = (500, "服务器内部错误")
     SERVICE_UNAVAILABLE = (503, "服务不可用")
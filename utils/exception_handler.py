@@ -1,3 +1,4 @@
+from django.db import IntegrityError
 from rest_framework.views import exception_handler
 from utils.response import APIResponse
 from utils.enums import ResponseCode
@@ -5,6 +6,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# 唯一键冲突时返回给客户端的说明
+INTEGRITY_CONFLICT_DETAIL = "数据与已有记录冲突（编号等唯一字段重复或仍被正在删除的数据占用），请稍后重试"
+
 def custom_exception_handler(exc, context):
     """
     自定义异常处理器，处理不同类型的异常并返回统一的响应格式
@@ -12,23 +16,39 @@ def custom_exception_handler(exc, context):
     :param context: 异常上下文
     :return: Response对象
     """
-    # 记录异常信息
-    logger.error(f"异常类型: {type(exc).__name__}")
-    logger.error(f"异常信息: {str(exc)}")
-    logger.error(f"异常上下文: {context}")
+    request = context.get('request')
+    view = context.get('view')
 
     # 处理分页相关异常
     if "Page" in str(exc):
+        logger.info(
+            "%s %s -> 404 %s: %s", getattr(request, 'method', ''), getattr(request, 'path', ''), type(exc).__name__, exc
+        )
         return APIResponse(
             response_code=ResponseCode.NOT_FOUND,
             data={"detail": str(exc)}
         )
 
+    # 唯一键冲突：如编号仍被等待后台删除的对象占用、并发请求生成了相同的编号
+    if isinstance(exc, IntegrityError):
+        logger.info(
+            "%s %s -> 409 %s: %s", getattr(request, 'method', ''), getattr(request, 'path', ''), type(exc).__name__, exc
+        )
+        return APIResponse(
+            response_code=ResponseCode.CONFLICT,
+            data={"detail": INTEGRITY_CONFLICT_DETAIL}
+        )
+
     # 获取原始的DRF异常响应
     response = exception_handler(exc, context)
     
     if response is not None:
         status_code = response.status_code
+        # 客户端错误（参数错误、404 等）是正常的业务分支，只简要记录
+        logger.info(
+            "%s %s -> %s %s: %s", getattr(request, 'method', ''), getattr(request, 'path', ''),
+            status_code, type(exc).__name__, exc
+        )
         response_code = None
         
         if status_code == 400:
@@ -41,6 +61,8 @@ def custom_exception_handler(exc, context):
             response_code = ResponseCode.NOT_FOUND
         elif status_code == 405:
             response_code = ResponseCode.METHOD_NOT_ALLOWED
+        elif status_code == 409:
+            response_code = ResponseCode.CONFLICT
         else:
             response_code = ResponseCode.BAD_REQUEST
 
@@ -52,7 +74,10 @@ def custom_exception_handler(exc, context):
     
     # 处理未捕获的异常
     error_detail = str(exc) if str(exc) else "服务器内部错误"
-    logger.error(f"未处理的异常: {error_detail}", exc_info=True)
+    logger.error(
+        "未处理的异常 %s %s (%s): %s", getattr(request, 'method', ''), getattr(request, 'path', ''),
+        type(view).__name__, error_detail, exc_info=exc
+    )
     
     return APIResponse(
         response_code=ResponseCode.INTERNAL_ERROR,
@@ -0,0 +1,40 @@
+"""
+键集（keyset）遍历
+
+MySQL 驱动不支持服务端游标流式读取（QuerySet.iterator() 仍会把整个结果集读入内存），
+大结果集改为按排序字段键集翻页：每次 WHERE (排序字段) > (上一批最后一行) LIMIT chunk_size，
+配合 values_list 元组，内存占用与总行数无关，且每批查询都能走索引，不会因 OFFSET 变慢。
+"""
+from django.db.models import Q
+
+
+def _after(ordering, values):
+    """构造“排在 values 之后”的条件：(a, b, c) > (x, y, z)"""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        step = Q(**{f'{field}__gt': values[i]})
+        for j in range(i):
+            step &= Q(**{ordering[j]: values[j]})
+        condition |= step
+    return condition
+
+
+def iter_keyset(queryset, fields, ordering=('pk',), chunk_size=2000):
+    """
+    按 ordering（仅支持升序、非空字段，最后一个字段需唯一，通常为 pk）分批遍历查询集，
+    逐行产出 fields 对应的元组
+    """
+    ordering = list(ordering)
+    fields = list(fields)
+    select = fields + [field for field in ordering if field not in fields]
+    positions = [select.index(field) for field in ordering]
+    queryset = queryset.order_by(*ordering).values_list(*select)
+
+    batch = list(queryset[:chunk_size])
+    while batch:
+        for row in batch:
+            yield row[:len(fields)]
+        if len(batch) < chunk_size:
+            return
+        last = batch[-1]
+        batch = list(queryset.filter(_after(ordering, [last[i] for i in positions]))[:chunk_size])
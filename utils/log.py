@@ -0,0 +1,237 @@
+"""
+日志
+
+请求线程只把日志记录放入内存队列（QueuedHandler），格式化和写文件 / 控制台都在后台监听线程中进行，
+请求不会等待磁盘 I/O；队列满时丢弃新记录并在之后补记一条丢弃数量的警告，而不是阻塞请求。
+
+- SamplingFilter：按 logger 对 INFO 及以下的记录按比例采样（热点路径的调试日志），WARNING 及以上全部保留
+- JSONFormatter：每条记录一行 JSON（时间、级别、logger、消息、异常及 extra 字段）
+- RotatingFileHandler：按大小轮转；多个进程（serve 的多个 worker）写同一文件时用文件锁保证只轮转一次
+
+配置见 settings 中的 LOGGING。
+"""
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+
+try:
+    import fcntl
+except ImportError:  # Windows 下无文件锁，多进程写同一文件时轮转可能冲突
+    fcntl = None
+
+# LogRecord 自带的属性，其余属性来自 extra
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+_exception_formatter = logging.Formatter()
+
+
+# fork 前等待各监听线程写完当前记录，避免子进程继承被锁住的文件 / 控制台缓冲区
+_queued_handlers = weakref.WeakSet()
+
+
+def _before_fork():
+    for handler in list(_queued_handlers):
+        handler.io_lock.acquire()
+
+
+def _after_fork_in_parent():
+    for handler in list(_queued_handlers):
+        handler.io_lock.release()
+
+
+def _after_fork_in_child():
+    for handler in list(_queued_handlers):
+        handler.io_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(
+        before=_before_fork, after_in_parent=_after_fork_in_parent, after_in_child=_after_fork_in_child
+    )
+
+
+class _Listener(logging.handlers.QueueListener):
+    def __init__(self, queue, handler):
+        super().__init__(queue, *handler.targets, respect_handler_level=True)
+        self.owner = handler
+
+    def handle(self, record):
+        with self.owner.io_lock:
+            super().handle(record)
+
+
+def _get_handler(name):
+    get_handler = getattr(logging, 'getHandlerByName', None)  # Python 3.12+
+    return get_handler(name) if get_handler else logging._handlers.get(name)
+
+
+class QueuedHandler(logging.handlers.QueueHandler):
+    """
+    把记录交给后台线程，由 handlers（LOGGING 中其他 handler 的名称）输出
+
+    dictConfig 按名称顺序配置 handler，handlers 中的名称需排在本 handler 之前。
+    监听线程在本进程第一次输出日志时启动：serve 预加载时主进程配置的日志，fork 出的 worker 中会重新启动自己的线程。
+    """
+
+    def __init__(self, handlers, maxsize=10000):
+        super().__init__(None)
+        # 未挂到 logger 上的 handler 只有弱引用，这里保留引用
+        self.targets = []
+        for name in handlers:
+            handler = _get_handler(name)
+            if handler is None:
+                raise ValueError(f'日志 handler {name!r} 未配置（需排在队列 handler 之前）')
+            self.targets.append(handler)
+        self.maxsize = maxsize
+        self.listener = None
+        self.dropped = 0
+        self._dropped_reported_at = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        _queued_handlers.add(self)
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self.listener = _Listener(self.queue, self)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        super().emit(record)
+
+    def prepare(self, record):
+        # 请求线程中只生成消息文本（参数对象之后可能被修改），格式化在监听线程中进行
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        # 丢弃数量每秒最多补记一次，避免警告本身占满队列
+        if self.dropped and time.monotonic() - self._dropped_reported_at >= 1:
+            self._dropped_reported_at = time.monotonic()
+            dropped, self.dropped = self.dropped, 0
+            warning = logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': '日志队列已满，丢弃了 %d 条日志', 'args': (dropped,),
+            })
+            try:
+                self.queue.put_nowait(self.prepare(warning))
+            except queue.Full:
+                self.dropped += dropped
+
+    def close(self):
+        # 进程退出时（logging.shutdown）先写完队列中剩余的记录
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+
+class SamplingFilter(logging.Filter):
+    """rates 为 {logger 名称: 保留比例}，按名称前缀匹配，只采样 INFO 及以下的记录"""
+
+    def __init__(self, rates=None):
+        super().__init__()
+        # 较长的名称优先匹配
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _rate(self, name):
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + '.'):
+                return rate
+        return 1
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    """每条记录一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'line': record.lineno,
+            'process': record.process,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+    def formatTime(self, record, datefmt=None):
+        return super().formatTime(record, datefmt or '%Y-%m-%dT%H:%M:%S') + '.%03d' % record.msecs
+
+
+class RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """多进程共用同一日志文件的按大小轮转：轮转时加文件锁，其他进程已轮转过时只重新打开文件"""
+    # 检查文件是否已被其他进程轮转的间隔（秒）
+    check_interval = 1
+    _next_check = 0
+
+    def _rotated_elsewhere(self):
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self.stream.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def _reopen(self):
+        self.stream.close()
+        self.stream = self._open()
+
+    def shouldRollover(self, record):
+        if self.stream is not None and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.check_interval
+            if self._rotated_elsewhere():
+                self._reopen()
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        if fcntl is None:
+            return super().doRollover()
+        with open(self.baseFilename + '.lock', 'a') as lock_file:
+            # lockf 的锁属于进程，fork 出的子进程不会继承（flock 会随文件描述符一起被继承）
+            fcntl.lockf(lock_file, fcntl.LOCK_EX)
+            # 等待文件锁期间其他进程可能已经轮转
+            if self.stream is not None and self._rotated_elsewhere():
+                self._reopen()
+            else:
+                super().doRollover()
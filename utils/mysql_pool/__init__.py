@@ -0,0 +1 @@
+"""带连接池的 MySQL 数据库后端（ENGINE: utils.mysql_pool）"""
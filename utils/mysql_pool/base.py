@@ -0,0 +1,70 @@
+"""
+带连接池的 MySQL 数据库后端
+
+用法：DATABASES 中 ENGINE 设为 'utils.mysql_pool'，并通过 POOL 配置连接池（均可省略）：
+
+    'POOL': {
+        'MIN_SIZE': 2,        # worker 启动后预先打开的连接数
+        'MAX_SIZE': 10,       # 每个进程最多打开的连接数，应不小于线程数
+        'MAX_LIFETIME': 1800, # 连接最长使用时间（秒），需小于 MySQL 的 wait_timeout
+        'TIMEOUT': 10,        # 池满时等待其他线程归还连接的秒数
+        'CHECK_AFTER': 0,     # 空闲超过多少秒的连接在取出时先 ping 检查
+    }
+
+CONN_MAX_AGE 保持为 0：请求结束时 Django 关闭连接，实际是归还到连接池。
+"""
+from functools import partial
+
+from django.db.backends.mysql import base as mysql_base
+
+from .pool import ConnectionPool, PoolTimeout, get_pool
+
+Database = mysql_base.Database
+
+
+def _ping(connection):
+    connection.ping()
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+
+    def pool_options(self):
+        options = self.settings_dict.get('POOL') or {}
+        return {
+            'min_size': options.get('MIN_SIZE', 0),
+            'max_size': options.get('MAX_SIZE', 10),
+            'max_lifetime': options.get('MAX_LIFETIME', 1800),
+            'timeout': options.get('TIMEOUT', 10),
+            'check_after': options.get('CHECK_AFTER', 0),
+        }
+
+    def get_pool(self):
+        def create_pool():
+            connect = partial(super(DatabaseWrapper, self).get_new_connection, self.get_connection_params())
+            return ConnectionPool(connect, _ping, **self.pool_options())
+        return get_pool(self.alias, create_pool)
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.get_pool().acquire()
+        except PoolTimeout as e:
+            raise Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is None:
+            return
+        discard = self.in_atomic_block
+        if not discard and not self.autocommit:
+            # 手动关闭了自动提交：回滚未提交的修改，不把事务带给下一个使用者
+            try:
+                self.connection.rollback()
+            except Database.Error:
+                discard = True
+        pool = get_pool(self.alias)
+        if pool is None:
+            with self.wrap_database_errors:
+                return self.connection.close()
+        pool.release(self.connection, discard=discard, suspect=self.errors_occurred)
+
+    def fill_pool(self):
+        return self.get_pool().fill()
@@ -0,0 +1,249 @@
+"""
+数据库连接池
+
+每个进程每个数据库别名一个连接池，进程内所有线程共享。
+Django 每个线程持有自己的 DatabaseWrapper，请求结束时 close() 把连接归还到池中而不是断开，
+下一个请求（任意线程）直接取出空闲连接，省去 TCP 连接和认证握手。
+
+- 取出时：超过 max_lifetime 的连接直接关闭重建；空闲超过 check_after 秒（或上次使用出过错）的连接先 ping 检查
+- 池满（max_size）时等待其他线程归还，超过 timeout 秒抛出 PoolTimeout
+- fork 后子进程不使用、也不关闭继承自父进程的连接（关闭会断开父进程的会话），而是新建连接池
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+# 继承自父进程的连接池：保留引用，避免被垃圾回收时关闭父进程的连接
+_inherited = []
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Entry:
+    __slots__ = ('connection', 'created_at', 'returned_at', 'suspect')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = self.returned_at = time.monotonic()
+        self.suspect = False
+
+
+class ConnectionPool:
+    """
+    线程安全的连接池
+
+    :param connect: 新建连接的函数
+    :param check: 检查连接是否可用的函数，返回 False 或抛出异常表示不可用
+    """
+
+    def __init__(self, connect, check, min_size=0, max_size=10, max_lifetime=1800, timeout=10, check_after=0):
+        self.connect = connect
+        self.check = check
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_after = check_after
+        self.pid = os.getpid()
+        self.closed = False
+        self._idle = deque()
+        self._in_use = {}
+        # 已打开（含空闲、使用中和正在新建）的连接数
+        self._size = 0
+        self._waiting = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {'created': 0, 'reused': 0, 'expired': 0, 'unhealthy': 0, 'timeouts': 0, 'max_wait': 0.0}
+
+    def _expired(self, entry, now):
+        return bool(self.max_lifetime) and now - entry.created_at > self.max_lifetime
+
+    def _take(self):
+        """取出一个空闲连接；没有空闲连接且未满时返回 None（已为调用方预留名额）"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while True:
+                if self.closed:
+                    raise PoolTimeout('连接池已关闭')
+                if self._idle:
+                    # 后进先出：优先使用最近归还的连接，多余的连接自然老化
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'等待数据库连接超时（{self.timeout}s，连接池上限 {self.max_size}）')
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._stats['max_wait'] = max(self._stats['max_wait'], time.monotonic() - started)
+            return entry
+
+    def _open(self):
+        """新建连接（名额已由 _take 预留）"""
+        try:
+            entry = _Entry(self.connect())
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['created'] += 1
+        return entry
+
+    def _usable(self, entry):
+        try:
+            return self.check(entry.connection) is not False
+        except Exception:
+            return False
+
+    def _discard(self, entry, reason=None):
+        with self._cond:
+            self._size -= 1
+            if reason:
+                self._stats[reason] += 1
+            self._cond.notify()
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """取出一个可用连接"""
+        while True:
+            entry = self._take()
+            if entry is None:
+                entry = self._open()
+                break
+            now = time.monotonic()
+            if self._expired(entry, now):
+                self._discard(entry, 'expired')
+                continue
+            if (entry.suspect or now - entry.returned_at >= self.check_after) and not self._usable(entry):
+                self._discard(entry, 'unhealthy')
+                continue
+            with self._cond:
+                self._stats['reused'] += 1
+            break
+        entry.suspect = False
+        with self._cond:
+            self._in_use[id(entry.connection)] = entry
+        return entry.connection
+
+    def release(self, connection, discard=False, suspect=False):
+        """
+        归还连接
+
+        :param discard: 关闭连接而不是放回池中（如事务状态未知）
+        :param suspect: 使用中出过错，下次取出时先检查是否可用
+        """
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            # 不是本连接池取出的连接（如继承自父进程），不做处理
+            return
+        if discard or self.closed or os.getpid() != self.pid or self._expired(entry, time.monotonic()):
+            self._discard(entry)
+            return
+        entry.returned_at = time.monotonic()
+        entry.suspect = suspect
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def fill(self):
+        """预先打开连接直到达到 min_size"""
+        opened = []
+        try:
+            while True:
+                with self._cond:
+                    if self.closed or self._size >= min(self.min_size, self.max_size):
+                        break
+                    self._size += 1
+                opened.append(self._open())
+        finally:
+            with self._cond:
+                self._idle.extend(opened)
+                self._cond.notify_all()
+        return len(opened)
+
+    def close(self):
+        """关闭空闲连接，使用中的连接在归还时关闭"""
+        with self._cond:
+            self.closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pid': self.pid,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                **self._stats,
+                'max_wait': round(self._stats['max_wait'], 3),
+            }
+
+
+def get_pool(alias, factory=None):
+    """当前进程中某个数据库别名的连接池，不存在时用 factory 创建（factory 为空时返回 None）"""
+    global _pools_pid
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            _inherited.extend(_pools.values())
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(alias)
+        if pool is None and factory is not None:
+            pool = _pools[alias] = factory()
+        return pool
+
+
+def pool_stats():
+    """当前进程全部连接池的统计信息 {别名: 统计}"""
+    with _pools_lock:
+        pools = dict(_pools) if os.getpid() == _pools_pid else {}
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def close_pools():
+    """关闭当前进程的全部连接池（fork 前调用，避免子进程继承空闲连接）"""
+    with _pools_lock:
+        pools = list(_pools.values()) if os.getpid() == _pools_pid else []
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def fill_pools():
+    """为使用连接池的数据库预先打开 min_size 个连接（worker 启动后调用）"""
+    from django.db import connections
+    for alias in connections:
+        connection = connections[alias]
+        if hasattr(connection, 'fill_pool'):
+            try:
+                connection.fill_pool()
+            except Exception:
+                logger.exception("预先打开数据库连接失败：%s", alias)
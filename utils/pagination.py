@@ -1,14 +1,138 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from utils.cache import versioned_key
 from utils.response import APIResponse
 from utils.enums import ResponseCode
 
+
+def estimate_table_rows(model, using='default'):
+    """读取 MySQL 表统计信息中的估算行数，非 MySQL 或查询失败时返回 None"""
+    connection = connections[using]
+    if connection.vendor != 'mysql':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+    except Exception:
+        return None
+    return row[0] if row else None
+
+
+def get_queryset_count(queryset):
+    """
+    获取查询集总数：
+    - 先按 SQL 语句（即 接口+过滤条件）及所涉及表的缓存版本号查短期缓存
+    - 无过滤条件且表统计行数超过阈值时直接使用估算值，避免全表 COUNT(*)
+    - 否则执行 COUNT(*) 并写入缓存
+    """
+    timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 30)
+    threshold = getattr(settings, 'PAGINATION_COUNT_ESTIMATE_THRESHOLD', 100000)
+    query = queryset.query
+    try:
+        sql, params = query.sql_with_params()
+    except Exception:
+        # 空查询集（EmptyResultSet）等情况直接计数
+        return queryset.count()
+    # 键中包含查询涉及的各表的缓存版本号，批量变更后通过 bump_cache_version 失效
+    connection = connections[queryset.db]
+    tables = sorted(
+        model._meta.db_table for model in apps.get_models()
+        if connection.ops.quote_name(model._meta.db_table) in sql
+    )
+    cache_key = versioned_key('pagination_count', tables, hashlib.md5(
+        f'{queryset.db}:{sql}:{params!r}'.encode('utf-8')
+    ).hexdigest())
+    count = cache.get(cache_key)
+    if count is not None:
+        return count
+
+    if not query.where and not query.distinct:
+        estimate = estimate_table_rows(queryset.model, queryset.db)
+        if estimate is not None and estimate > threshold:
+            cache.set(cache_key, estimate, timeout)
+            return estimate
+
+    count = queryset.count()
+    cache.set(cache_key, count, timeout)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """总数使用缓存或表统计估算值的分页器"""
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return get_queryset_count(self.object_list)
+        return super().count
+
+
 class StandardPagination(PageNumberPagination):
+    """
+    标准分页，返回 list/total/page/page_size：
+    - 默认页码分页：?page=1&page_size=10
+    - 游标分页：?pagination=cursor 或携带 ?cursor=xxx，避免深分页的大 OFFSET，
+      额外返回 next/previous 链接，page 为 null
+    total 来自短期缓存或表统计估算值，超大表上可能是近似值
+    """
     page_size = 10
     page_query_param = 'page'
     page_size_query_param = 'page_size'
     max_page_size = 1000
+    django_paginator_class = CachedCountPaginator
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    cursor_pagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+        if self.is_cursor_mode(request):
+            self.cursor_pagination = StandardCursorPagination()
+            self.cursor_pagination.page_size = self.page_size
+            self.cursor_pagination.ordering = self.get_cursor_ordering(queryset)
+            self.cursor_queryset = queryset
+            return self.cursor_pagination.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def get_cursor_ordering(self, queryset):
+        """游标分页沿用查询集自身的排序，未排序时按主键"""
+        ordering = [
+            field for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str) and '__' not in field
+        ]
+        return tuple(ordering) if ordering else ('pk',)
 
     def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return APIResponse(
+                response_code=ResponseCode.SUCCESS,
+                data={
+                    "list": data if data is not None else [],
+                    "total": get_queryset_count(self.cursor_queryset),
+                    "page": None,
+                    "page_size": self.cursor_pagination.page_size,
+                    "next": self.cursor_pagination.get_next_link(),
+                    "previous": self.cursor_pagination.get_previous_link()
+                }
+            )
         return APIResponse(
             response_code=ResponseCode.SUCCESS,
             data={
@@ -17,4 +141,25 @@ class StandardPagination(PageNumberPagination):
                 "page": self.page.number,
                 "page_size": self.page.paginator.per_page
             }
-        )
\ No newline at end of file
+        )
+
+
+class StandardCursorPagination(CursorPagination):
+    """
+    游标分页，不执行 COUNT(*)，翻页代价与数据量无关，用于嵌套子资源等大列表
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'id'
+
+    def get_paginated_response(self, data):
+        return APIResponse(
+            response_code=ResponseCode.SUCCESS,
+            data={
+                "list": data if data is not None else [],
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "page_size": self.page_size
+            }
+        )
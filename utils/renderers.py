@@ -0,0 +1,159 @@
+"""
+JSON 渲染器与解析器
+
+安装了 orjson 时用 orjson 编码 / 解码（比标准库 json 快一个数量级），输出与 DRF 的 JSONRenderer 一致：
+紧凑格式、不转义中文、日期时间按 DRF 的格式（ISO 8601，UTC 为 Z）、Decimal 为数字、UUID 为字符串。
+未安装 orjson、需要缩进（可浏览 API）或 orjson 无法编码（如超出 64 位的整数）时回退到标准库 json。
+
+已序列化的 JSON（RawJSON，如缓存的响应）不再解码后重新编码：
+响应数据本身或统一响应格式的顶层字段（如 APIResponse 的 data）为 RawJSON 时直接拼接到输出中。
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时使用标准库 json
+    orjson = None
+
+
+class RawJSON:
+    """已序列化的 JSON（UTF-8 字节串），渲染时原样输出"""
+    __slots__ = ('content',)
+
+    def __init__(self, content):
+        self.content = content.encode('utf-8') if isinstance(content, str) else bytes(content)
+
+    def __getstate__(self):
+        return self.content
+
+    def __setstate__(self, state):
+        self.content = state
+
+    def __repr__(self):
+        return f'RawJSON({len(self.content)} bytes)'
+
+    def decode(self):
+        return json.loads(self.content)
+
+
+def _default(obj):
+    # 与 rest_framework.utils.encoders.JSONEncoder 的处理一致
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.datetime):
+        representation = obj.isoformat()
+        return representation[:-6] + 'Z' if representation.endswith('+00:00') else representation
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, datetime.time):
+        if obj.utcoffset() is not None:
+            raise ValueError('JSON can\'t represent timezone-aware times.')
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, RawJSON):
+        # 嵌套的 RawJSON 只能解码后重新编码
+        return obj.decode()
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__'):
+        try:
+            return list(obj) if isinstance(obj, (list, tuple)) else dict(obj)
+        except Exception:
+            pass
+    if hasattr(obj, '__iter__'):
+        return tuple(obj)
+    raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def _stdlib_dumps(data):
+    return json.dumps(
+        data, cls=encoders.JSONEncoder, ensure_ascii=not api_settings.UNICODE_JSON,
+        allow_nan=not api_settings.STRICT_JSON, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def _dumps(data):
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+        except (TypeError, orjson.JSONEncodeError):
+            pass
+    return _stdlib_dumps(data)
+
+
+def dumps(data):
+    """编码为 JSON 字节串（RawJSON 原样拼接）"""
+    if isinstance(data, RawJSON):
+        return data.content
+    if isinstance(data, dict) and any(isinstance(value, RawJSON) for value in data.values()):
+        # 统一响应格式 {code, msg, data}：逐个字段编码，RawJSON 字段直接拼接
+        return b'{' + b','.join(
+            _dumps(str(key)) + b':' + (value.content if isinstance(value, RawJSON) else _dumps(value))
+            for key, value in data.items()
+        ) + b'}'
+    return _dumps(data)
+
+
+def loads(content):
+    """解码 JSON（str 或字节串）"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _decode_raw(data):
+    if isinstance(data, RawJSON):
+        return data.decode()
+    if isinstance(data, dict) and any(isinstance(value, RawJSON) for value in data.values()):
+        return {key: value.decode() if isinstance(value, RawJSON) else value for key, value in data.items()}
+    return data
+
+
+class FastJSONRenderer(JSONRenderer):
+    """orjson 渲染器，支持拼接 RawJSON；需要缩进时使用 DRF 的实现"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) or not self.compact \
+                or self.ensure_ascii or not self.strict:
+            return super().render(_decode_raw(data), accepted_media_type, renderer_context)
+        # 与 DRF 一致：转义 U+2028 / U+2029，输出可直接嵌入 JavaScript
+        return dumps(data).replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    """orjson 解析器（请求体为 UTF-8 时）"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except (orjson.JSONDecodeError, ValueError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -1,19 +1,22 @@
 from rest_framework.response import Response
 from rest_framework import status
 from .enums import ResponseCode
+from .renderers import RawJSON
 
 class APIResponse(Response):
     def __init__(self, response_code=ResponseCode.SUCCESS, data=None, status=status.HTTP_200_OK, **kwargs):
         """
         统一的API响应格式
         :param response_code: ResponseCode枚举类型，包含code和msg
-        :param data: 响应数据
+        :param data: 响应数据；已序列化的 JSON（bytes 或 RawJSON）直接拼接到响应中，不再解码后重新编码
         :param status: HTTP状态码，默认200
         :param kwargs: 其他参数
         """
         if not isinstance(response_code, ResponseCode):
             response_code = ResponseCode.SUCCESS
-            
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = RawJSON(data)
+
         resp_data = {
             'code': response_code.code,
             'msg': response_code.msg,
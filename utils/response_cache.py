@@ -0,0 +1,196 @@
+"""
+响应缓存
+
+视图设置 cache_tables（响应依赖的表）后，成功的查询响应按 视图 + 请求 + 各表缓存版本号 缓存：
+
+- 表数据变化时由 post_save / post_delete 信号或批量操作调用 bump_cache_version 更换版本号，旧缓存自然失效，
+  无需按 TTL 猜测过期时间（RESPONSE_CACHE_TIMEOUT 只是兜底）
+- 视图可重写 get_cache_names 追加版本号，或重写 get_cache_revision 把数据修订号（如病例的 data_revision）拼入缓存键
+- 命中时在认证、权限检查之后直接返回缓存的数据，不再查询数据库；响应头 X-Cache 为 HIT / MISS。
+  JSON 响应缓存的是编码后的内容（RawJSON），命中时也不再编码；压缩后的内容也按同一缓存键缓存（见 utils/compression.py）
+- 未命中时查询走主库（见 utils/db_router.py 的 use_primary）：缓存键中的版本号已是最新，从复制延迟的副本读到的旧数据
+  会以新版本号缓存，直到下一次数据变化；命中时不查询数据库，副本只承担不缓存的查询
+- conditional_methods（默认 GET）的响应带强 ETag（由同一缓存键计算），请求头 If-None-Match 匹配时直接返回 304，
+  不读缓存也不执行查询；Cache-Control: private, no-cache 要求客户端每次使用前都带 ETag 验证
+
+缓存后端由 RESPONSE_CACHE_ALIAS 指定（CACHES 中的别名，可为 locmem、文件或共享缓存）。
+版本号保存在默认缓存中，多进程部署时默认缓存需为各进程共享的后端（见 settings 中的 DJANGO_CACHE_DIR）；
+manage.py serve 检测到进程内缓存（locmem）时关闭响应缓存和 ETag。
+"""
+import hashlib
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import parse_etags, patch_cache_control, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from utils.cache import versioned_key
+from utils.db_router import use_primary
+from utils.renderers import FastJSONRenderer, RawJSON, dumps
+
+CACHE_HEADER = 'X-Cache'
+
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'stores': 0, 'not_modified': 0})
+_stats_lock = threading.Lock()
+
+
+def _count(view_name, field):
+    with _stats_lock:
+        _stats[view_name][field] += 1
+
+
+def response_cache_stats():
+    """当前进程各视图的命中统计 {视图: {hits, misses, stores, not_modified, hit_rate}}"""
+    with _stats_lock:
+        stats = {name: dict(counts) for name, counts in _stats.items()}
+    for counts in stats.values():
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / lookups, 3) if lookups else None
+    return stats
+
+
+def response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+class ResponseCacheMixin:
+    """
+    缓存视图的查询响应
+
+    cache_tables 为空时不缓存；cache_methods 为可缓存的请求方法，
+    视图集另外只缓存 cache_actions 中的操作。
+    """
+    cache_tables = None
+    cache_methods = ('get',)
+    cache_actions = ('list', 'retrieve')
+    conditional_methods = ('get', 'head')
+
+    def get_cache_names(self, request):
+        """缓存键依赖的版本号名称"""
+        return list(self.cache_tables)
+
+    def get_cache_revision(self, request):
+        """拼入缓存键的数据修订号，默认无"""
+        return ''
+
+    def _cache_enabled(self, request):
+        if not self.cache_tables:
+            return False
+        if request.method.lower() not in self.cache_methods:
+            return False
+        action = getattr(self, 'action', None)
+        return action is None or action in self.cache_actions
+
+    def _cache_key(self, request):
+        body = ''
+        if request.method not in ('GET', 'HEAD'):
+            body = json.dumps(request.data, sort_keys=True, default=str, ensure_ascii=False)
+        query = sorted(request.query_params.lists())
+        digest = hashlib.md5(
+            f'{request.path}:{query!r}:{body}:{request.accepted_renderer.format}'.encode('utf-8')
+        ).hexdigest()
+        return versioned_key(
+            'response', sorted(set(self.get_cache_names(request))),
+            type(self).__name__, hashlib.md5(self.get_cache_revision(request).encode('utf-8')).hexdigest(), digest
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not self._cache_enabled(request):
+            return
+        key = self._cache_key(request)
+        etag = None
+        if request.method.lower() in self.conditional_methods and getattr(settings, 'CONDITIONAL_GET_ENABLED', True):
+            etag = quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+        # 认证、权限检查已通过，用带缓存的处理函数替换本次请求的处理函数
+        method = request.method.lower()
+        if etag is not None and self._etag_matches(request, etag):
+            setattr(self, method, self._not_modified_handler(etag))
+        elif getattr(settings, 'RESPONSE_CACHE_ENABLED', True):
+            setattr(self, method, self._cached_handler(getattr(self, method), key, etag))
+        elif etag is not None:
+            setattr(self, method, self._etag_handler(getattr(self, method), etag))
+
+    @staticmethod
+    def _etag_matches(request, etag):
+        header = request.headers.get('If-None-Match')
+        if not header:
+            return False
+        etags = parse_etags(header)
+        # If-None-Match 使用弱比较
+        return '*' in etags or etag.removeprefix('W/') in [value.removeprefix('W/') for value in etags]
+
+    @staticmethod
+    def _set_validators(response, etag):
+        if etag is not None:
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+
+    def _not_modified_handler(self, etag):
+        view_name = type(self).__name__
+
+        def not_modified(request, *args, **kwargs):
+            _count(view_name, 'not_modified')
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            self._set_validators(response, etag)
+            return response
+
+        return not_modified
+
+    def _etag_handler(self, handler, etag):
+        def with_etag(request, *args, **kwargs):
+            response = handler(request, *args, **kwargs)
+            if self._cacheable_response(response):
+                self._set_validators(response, etag)
+            return response
+
+        return with_etag
+
+    def _cached_handler(self, handler, key, etag=None):
+        view_name = type(self).__name__
+        backend = response_cache()
+
+        def cached(request, *args, **kwargs):
+            cached_response = backend.get(key)
+            if cached_response is not None:
+                _count(view_name, 'hits')
+                status_code, data = cached_response
+                response = Response(data, status=status_code)
+                response[CACHE_HEADER] = 'HIT'
+                self._set_validators(response, etag)
+                self._set_compression_key(response, key)
+                return response
+            _count(view_name, 'misses')
+            # 要缓存的响应从主库读取：副本的复制延迟可能使新版本号下缓存旧数据，直到下一次数据变化
+            with use_primary():
+                response = handler(request, *args, **kwargs)
+            if self._cacheable_response(response):
+                if isinstance(request.accepted_renderer, FastJSONRenderer):
+                    # 缓存编码后的 JSON，本次和命中时的响应都直接输出，不再重复编码
+                    response.data = RawJSON(dumps(response.data))
+                backend.set(key, (response.status_code, response.data), getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 3600))
+                _count(view_name, 'stores')
+                self._set_validators(response, etag)
+                self._set_compression_key(response, key)
+            response[CACHE_HEADER] = 'MISS'
+            return response
+
+        return cached
+
+    @staticmethod
+    def _set_compression_key(response, key):
+        # 编码后的 JSON 快照内容固定，压缩中间件按此键缓存压缩结果（HTML 等按请求渲染的内容不缓存）
+        if isinstance(response.data, RawJSON):
+            response.compression_cache_key = key
+
+    @staticmethod
+    def _cacheable_response(response):
+        if not isinstance(response, Response) or response.status_code != status.HTTP_200_OK:
+            return False
+        data = response.data
+        # 统一响应格式中 code 不为 200 的（如业务错误）不缓存
+        return not (isinstance(data, dict) and data.get('code', 200) != 200)
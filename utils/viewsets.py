@@ -1,10 +1,14 @@
+from django.db import IntegrityError
 from rest_framework import viewsets
 from utils.response import APIResponse
 from utils.enums import ResponseCode
+from utils.exception_handler import INTEGRITY_CONFLICT_DETAIL
+from utils.response_cache import ResponseCacheMixin
 
-class CustomModelViewSet(viewsets.ModelViewSet):
+class CustomModelViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     """
     自定义视图集基类，统一处理响应格式，使用ResponseCode枚举管理响应状态
+    子类设置 cache_tables（响应依赖的表）后缓存 list / retrieve 的响应，见 utils/response_cache.py
     """
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
@@ -25,6 +29,8 @@ class CustomModelViewSet(viewsets.ModelViewSet):
         try:
             self.perform_create(serializer)
             return APIResponse(response_code=ResponseCode.SUCCESS, data=serializer.data)
+        except IntegrityError:
+            return APIResponse(response_code=ResponseCode.CONFLICT, data=INTEGRITY_CONFLICT_DETAIL)
         except Exception as e:
             return APIResponse(response_code=ResponseCode.INTERNAL_ERROR, data=str(e))
 
@@ -45,6 +51,8 @@ class CustomModelViewSet(viewsets.ModelViewSet):
                 return APIResponse(response_code=ResponseCode.BAD_REQUEST, data=serializer.errors)
             self.perform_update(serializer)
             return APIResponse(response_code=ResponseCode.SUCCESS, data=serializer.data)
+        except IntegrityError:
+            return APIResponse(response_code=ResponseCode.CONFLICT, data=INTEGRITY_CONFLICT_DETAIL)
         except Exception as e:
             return APIResponse(response_code=ResponseCode.INTERNAL_ERROR, data=str(e))
 